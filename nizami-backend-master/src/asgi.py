@@ -18,3 +18,10 @@ load_env()
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.settings')
 
 application = get_asgi_application()
+
+# Compile the chat graphs once per worker process instead of on the first message
+from src.chats.async_flow import chat_graph_async  # noqa: E402
+from src.chats.flow import chat_graph  # noqa: E402
+
+chat_graph.get()
+chat_graph_async.get()
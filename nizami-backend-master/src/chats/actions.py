@@ -10,6 +10,7 @@ from django.core.files.base import ContentFile
 from django.db import models, transaction
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from src.chats.log_payloads import pack
 from src.chats.models import Message, MessageFile, MessageLog
 from src.chats.utils import get_random_unclear_request_message, aspose_word_replace_json, create_document_review_llm, \
     create_legal_advice_llm, extract_used_styles, extract_doc_data
@@ -92,9 +93,11 @@ class UpdateCurrentFile:
                     for result in results:
                         answers += result
 
+                response_data, response_zstd = pack(answers)
                 MessageLog.logs_objects.create(
                     message=self.user_message,
-                    response=answers,
+                    response_data=response_data,
+                    response_zstd=response_zstd,
                 )
 
                 if len(answers) == 0:
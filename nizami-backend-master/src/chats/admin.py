@@ -1,9 +1,11 @@
+import json
+
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render
 from django.utils.safestring import mark_safe
-from .models import Chat, Message, MessageFile, MessageLog, MessageStepLog
+from .models import AnswerCacheEntry, Chat, Message, MessageFile, MessageLog, MessageStepLog, MessageTrace
 
 
 class MessageFileInline(admin.TabularInline):
@@ -53,15 +55,33 @@ class MessageInline(admin.TabularInline):
         return qs.order_by('created_at')
 
 
+def _payload_html(value, limit=None):
+    """Pretty-printed log payload (src/chats/log_payloads.py), optionally cut to limit characters"""
+    if value is None:
+        return '-'
+    text = json.dumps(value, ensure_ascii=False, indent=2)
+    if limit is not None and len(text) > limit:
+        text = text[:limit] + ' …'
+    return format_html('<pre style="white-space: pre-wrap; max-width: 900px;">{}</pre>', text)
+
+
 class MessageStepLogInline(admin.TabularInline):
     """Inline admin for MessageStepLog within Message"""
     model = MessageStepLog
     extra = 0
-    readonly_fields = ['id', 'step_name', 'time_sec', 'created_at']
-    fields = ['id', 'step_name', 'time_sec', 'input', 'output', 'created_at']
+    readonly_fields = ['id', 'step_name', 'time_sec', 'input_preview', 'output_preview', 'created_at']
+    fields = ['id', 'step_name', 'time_sec', 'input_preview', 'output_preview', 'created_at']
     can_delete = False
     classes = ['collapse']
 
+    def input_preview(self, obj):
+        return _payload_html(obj.input_json(), limit=500)
+    input_preview.short_description = 'Input'
+
+    def output_preview(self, obj):
+        return _payload_html(obj.output_json(), limit=500)
+    output_preview.short_description = 'Output'
+
 
 @admin.register(Chat)
 class ChatAdmin(admin.ModelAdmin):
@@ -374,8 +394,8 @@ class MessageLogAdmin(admin.ModelAdmin):
     """
     list_display = ['id', 'message', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['message__uuid', 'response']
-    readonly_fields = ['id', 'created_at']
+    search_fields = ['message__uuid']
+    readonly_fields = ['id', 'created_at', 'response_view']
     raw_id_fields = ['message']
     
     fieldsets = (
@@ -383,7 +403,7 @@ class MessageLogAdmin(admin.ModelAdmin):
             'fields': ('id', 'message')
         }),
         ('Response', {
-            'fields': ('response',)
+            'fields': ('response_view',)
         }),
         ('Timestamps', {
             'fields': ('created_at',),
@@ -391,6 +411,17 @@ class MessageLogAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        """The change list shows no payloads, so they are not loaded"""
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            qs = qs.defer('response', 'response_data', 'response_zstd')
+        return qs
+
+    def response_view(self, obj):
+        return _payload_html(obj.response_json())
+    response_view.short_description = 'Response'
+
 
 @admin.register(MessageStepLog)
 class MessageStepLogAdmin(admin.ModelAdmin):
@@ -399,8 +430,8 @@ class MessageStepLogAdmin(admin.ModelAdmin):
     """
     list_display = ['id', 'step_name', 'message', 'time_sec', 'created_at']
     list_filter = ['step_name', 'created_at']
-    search_fields = ['step_name', 'message__uuid', 'input', 'output']
-    readonly_fields = ['id', 'created_at']
+    search_fields = ['step_name', 'message__uuid']
+    readonly_fields = ['id', 'created_at', 'input_view', 'output_view']
     raw_id_fields = ['message']
     
     fieldsets = (
@@ -408,7 +439,7 @@ class MessageStepLogAdmin(admin.ModelAdmin):
             'fields': ('id', 'step_name', 'message', 'time_sec')
         }),
         ('Data', {
-            'fields': ('input', 'output')
+            'fields': ('input_view', 'output_view')
         }),
         ('Timestamps', {
             'fields': ('created_at',),
@@ -416,3 +447,85 @@ class MessageStepLogAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        """The change list shows no payloads, so they are not loaded"""
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            qs = qs.defer('input', 'output', 'input_data', 'output_data', 'input_zstd', 'output_zstd')
+        return qs
+
+    def input_view(self, obj):
+        return _payload_html(obj.input_json())
+    input_view.short_description = 'Input'
+
+    def output_view(self, obj):
+        return _payload_html(obj.output_json())
+    output_view.short_description = 'Output'
+
+
+@admin.register(MessageTrace)
+class MessageTraceAdmin(admin.ModelAdmin):
+    """
+    Per-message resource traces of the chat graph: wall time, DB, LLM tokens/cost and embedding calls per node.
+    """
+    list_display = ['id', 'message', 'wall_sec', 'db_queries', 'llm_calls', 'prompt_tokens', 'completion_tokens',
+                    'cost_usd', 'embedding_calls', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['message__uuid']
+    raw_id_fields = ['message']
+    exclude = ['nodes']
+    readonly_fields = ['id', 'message', 'wall_sec', 'db_queries', 'db_time_sec', 'llm_calls', 'prompt_tokens',
+                       'completion_tokens', 'cost_usd', 'embedding_calls', 'created_at', 'nodes_table']
+    ordering = ['-created_at']
+
+    def get_queryset(self, request):
+        """The change list shows no per-node data, so it is not loaded"""
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            qs = qs.defer('nodes')
+        return qs
+
+    def nodes_table(self, obj):
+        """Node runs in start order with their share of the run"""
+        columns = ['node', 'start_sec', 'wall_sec', 'db_queries', 'db_time_sec', 'llm_calls', 'prompt_tokens',
+                   'completion_tokens', 'cost_usd', 'embedding_calls', 'error']
+        header = ''.join(format_html('<th>{}</th>', column) for column in columns)
+        rows = ''.join(
+            '<tr>' + ''.join(format_html('<td>{}</td>', '' if node.get(c) is None else node.get(c)) for c in columns)
+            + '</tr>'
+            for node in sorted(obj.nodes, key=lambda node: node.get('start_sec') or 0)
+        )
+        return mark_safe(f'<table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>')
+    nodes_table.short_description = 'Nodes'
+
+
+@admin.register(AnswerCacheEntry)
+class AnswerCacheEntryAdmin(admin.ModelAdmin):
+    """
+    Semantic answer cache entries, with the lookup hit rate over the last 7 days above the list.
+    Deleting entries is safe; they are rebuilt on the next miss.
+    """
+    list_display = ['id', 'query_preview', 'language', 'rag_source', 'hit_count', 'last_used_at', 'expires_at']
+    list_filter = ['language', 'rag_source', 'created_at']
+    search_fields = ['query', 'answer']
+    readonly_fields = ['id', 'context_key', 'rag_source', 'document_ids', 'language', 'query', 'answer',
+                       'hit_count', 'created_at', 'last_used_at']
+    exclude = ['query_embedding']
+    ordering = ['-last_used_at']
+
+    def changelist_view(self, request, extra_context=None):
+        """Add hit rate statistics"""
+        from .answer_cache import hit_rate
+
+        extra_context = extra_context or {}
+        stats = hit_rate(days=7)
+        stats['hit_rate_percent'] = round(stats['hit_rate'] * 100, 1)
+        extra_context['answer_cache_stats'] = stats
+        return super().changelist_view(request, extra_context)
+
+    def has_add_permission(self, request):
+        return False
+
+    def query_preview(self, obj):
+        return obj.query[:80] + '...' if len(obj.query) > 80 else obj.query
+    query_preview.short_description = 'Query'
@@ -0,0 +1,234 @@
+"""
+Semantic answer cache for answer_legal_question (ANSWER_CACHE_ENABLED).
+
+A LEGAL_ADVICE completion is stored with the embedding of the rephrased query it answered, the answer language
+and a context key: sha256 of the RAG source, the documents the retrieved chunks came from and the LEGAL_ADVICE
+template. A later question with the same context key and language, whose query embedding is at least
+ANSWER_CACHE_SIMILARITY similar, reuses the stored completion and skips the LLM call. The key covers the document
+set, not the exact chunks: a near-identical question that retrieved other chunks of the same documents gets the
+stored answer.
+
+Only standalone questions (no summary, history or uploaded documents in the chat) are looked up or stored:
+those answers depend on nothing but the question and the retrieved sources.
+
+Entries expire after ANSWER_CACHE_TTL_SEC; beyond ANSWER_CACHE_MAX_ENTRIES the least recently used ones are
+evicted. Saving or deleting a ReferenceDocument / RagSourceDocument drops the entries built from it
+(receivers in chats.models). Hits and misses are logged as `answer_cache_hit` / `answer_cache_miss` steps,
+which the AnswerCacheEntry admin turns into a hit rate.
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from langchain_core.messages import AIMessage
+from pgvector.django import CosineDistance
+
+from src.chats.models import AnswerCacheEntry, MessageStepLog
+from src.chats.step_logs import record_step
+from src.common.retrievers import embed_query_cached
+from src.prompts.enums import PromptType
+from src.prompts.utils import get_prompt_value_by_name
+
+logger = logging.getLogger(__name__)
+
+HIT_STEP = 'answer_cache_hit'
+MISS_STEP = 'answer_cache_miss'
+
+# Evicting needs a count + delete, so it runs every TRIM_EVERY stores rather than on each one
+TRIM_EVERY = 50
+# Stores in this process; next() on a count is atomic, so concurrent requests each get their own number
+_store_counter = itertools.count(1)
+
+
+def is_enabled() -> bool:
+    from src.settings import ANSWER_CACHE_ENABLED
+    return ANSWER_CACHE_ENABLED
+
+
+def is_cacheable(state) -> bool:
+    from src.chats.flow import _has_history_context
+
+    return is_enabled() and not _has_history_context(state)
+
+
+def source_document_ids(source_documents):
+    """
+    (rag_source, sorted ids) of the documents the retrieved chunks belong to.
+    """
+    from src.settings import RAG_SOURCE
+
+    key = 'rag_source_document_id' if RAG_SOURCE == 'new' else 'reference_document_id'
+    ids = set()
+    for doc in source_documents:
+        try:
+            ids.add(int(doc.metadata[key]))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return RAG_SOURCE, sorted(ids)
+
+
+def context_key(rag_source, document_ids, template) -> str:
+    raw = json.dumps([rag_source, document_ids, template], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _context(response):
+    rag_source, document_ids = source_document_ids(response['source_documents'])
+    if not document_ids:
+        return None
+    # Not the formatted system prompt: it embeds the retrieved chunk text. The answer language instruction in it
+    # follows the message language, which lookup() filters on
+    template = get_prompt_value_by_name(PromptType.LEGAL_ADVICE)
+    return rag_source, document_ids, context_key(rag_source, document_ids, template)
+
+
+def lookup(state, response):
+    """
+    Return the cached completion (an AIMessage) for this question and retrieval, or None.
+    """
+    if not is_cacheable(state):
+        return None
+
+    from src.settings import ANSWER_CACHE_SIMILARITY
+
+    t1 = time.time()
+    message = state['message']
+    entry = None
+    try:
+        context = _context(response)
+        if context is not None:
+            _, _, key = context
+            embedding = embed_query_cached(state['query'])
+            entry = (
+                AnswerCacheEntry.objects
+                .filter(context_key=key, language=message.language, expires_at__gt=timezone.now())
+                .annotate(distance=CosineDistance('query_embedding', embedding))
+                .filter(distance__lte=1 - ANSWER_CACHE_SIMILARITY)
+                .order_by('distance')
+                .only('id', 'answer', 'query')
+                .first()
+            )
+        if entry is not None:
+            AnswerCacheEntry.objects.filter(id=entry.id).update(
+                hit_count=F('hit_count') + 1,
+                last_used_at=timezone.now(),
+            )
+    except Exception as e:
+        logger.warning('Answer cache lookup failed: %s', e, exc_info=True)
+        return None
+
+    t2 = time.time()
+    record_step(
+        step_name=HIT_STEP if entry is not None else MISS_STEP,
+        message=message,
+        time_sec=t2 - t1,
+        input={
+            'query': state['query'],
+        },
+        output={
+            'entry_id': entry.id if entry is not None else None,
+            'cached_query': entry.query if entry is not None else None,
+            'similarity': 1 - entry.distance if entry is not None else None,
+        }
+    )
+
+    if entry is None:
+        return None
+    response['answer_cache_entry_id'] = entry.id
+    return AIMessage(content=entry.answer)
+
+
+def store(state, response):
+    """
+    Cache the completion in response['response'] for later near-identical questions.
+    """
+    if not is_cacheable(state) or response.get('answer_cache_entry_id'):
+        return
+
+    from src.settings import ANSWER_CACHE_TTL_SEC
+
+    try:
+        context = _context(response)
+        if context is None:
+            return
+        rag_source, document_ids, key = context
+
+        now = timezone.now()
+        AnswerCacheEntry.objects.create(
+            context_key=key,
+            rag_source=rag_source,
+            document_ids=document_ids,
+            language=state['message'].language or '',
+            query=state['query'],
+            query_embedding=embed_query_cached(state['query']),
+            answer=response['response'].content,
+            last_used_at=now,
+            expires_at=now + timedelta(seconds=ANSWER_CACHE_TTL_SEC),
+        )
+
+        if next(_store_counter) % TRIM_EVERY == 0:
+            trim()
+    except Exception as e:
+        logger.warning('Answer cache store failed: %s', e, exc_info=True)
+
+
+def trim():
+    """
+    Drop expired entries, then the least recently used ones beyond ANSWER_CACHE_MAX_ENTRIES.
+    """
+    from src.settings import ANSWER_CACHE_MAX_ENTRIES
+
+    AnswerCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    stale_ids = list(
+        AnswerCacheEntry.objects
+        .order_by('-last_used_at')
+        .values_list('id', flat=True)[ANSWER_CACHE_MAX_ENTRIES:]
+    )
+    if stale_ids:
+        AnswerCacheEntry.objects.filter(id__in=stale_ids).delete()
+
+
+def invalidate(rag_source, document_id):
+    """
+    Drop cached answers built from a document that was re-embedded, edited or deleted.
+    """
+    if connection.vendor != 'postgresql':
+        return
+
+    try:
+        # Savepoint: document saves often run inside a request transaction that must survive a failure here
+        with transaction.atomic():
+            deleted, _ = AnswerCacheEntry.objects.filter(
+                rag_source=rag_source,
+                document_ids__contains=[document_id],
+            ).delete()
+        if deleted:
+            logger.info('Answer cache: dropped %s entries for %s document %s', deleted, rag_source, document_id)
+    except Exception as e:
+        logger.warning('Answer cache invalidation failed: %s', e)
+
+
+def hit_rate(days=7) -> dict:
+    counts = dict(
+        MessageStepLog.objects
+        .filter(step_name__in=[HIT_STEP, MISS_STEP], created_at__gte=timezone.now() - timedelta(days=days))
+        .values_list('step_name')
+        .annotate(count=Count('id'))
+    )
+    hits = counts.get(HIT_STEP, 0)
+    lookups = hits + counts.get(MISS_STEP, 0)
+    return {
+        'days': days,
+        'lookups': lookups,
+        'hits': hits,
+        'misses': lookups - hits,
+        'hit_rate': hits / lookups if lookups else 0.0,
+    }
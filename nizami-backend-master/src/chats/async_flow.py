@@ -0,0 +1,470 @@
+"""
+Async variants of the LLM-bound chat graph nodes (CHAT_ASYNC_PIPELINE).
+
+Under ASGI the SSE view drives `chat_graph_async.get().astream(...)` on the event loop, so each LLM
+round trip is awaited (ainvoke/astream) instead of parking a worker thread for its whole duration.
+DB writes use the async ORM or sync_to_async. Nodes without an async variant are short DB steps; build_graph wraps
+them with sync_node, so they run thread-sensitively (on the request's sync thread under ASGI, like
+_prepare_legal_answer) with stale connections closed around them, instead of in LangGraph's executor threads, which
+would each keep a connection that Django never closes or health-checks. astream_graph closes that thread's
+connections when the run ends.
+"""
+
+import functools
+import logging
+import time
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connections
+from langchain_core.messages import SystemMessage, HumanMessage
+
+from src.chats import answer_cache
+from src.chats.domain import (
+    arephrase_user_input_using_history,
+    arephrase_user_input_using_summary,
+    atranslate_question,
+)
+from src.chats.flow import (
+    State,
+    Route,
+    InputRelevance,
+    QueryUnderstanding,
+    build_graph,
+    _emit_cached_answer,
+    _has_history_context,
+    _input_relevance_messages,
+    _log_legal_answer,
+    _prepare_legal_answer,
+    _query_understanding_messages,
+    _resolve_understood_query,
+)
+from src.chats.graph_registry import CompiledGraphRegistry
+from src.chats.step_logs import arecord_step
+from src.chats.streaming import AnswerTokenExtractor, emit_event
+from src.chats.utils import create_legal_advice_llm, create_llm
+from src.prompts.enums import PromptType
+from src.prompts.registry import prompt_registry
+from src.prompts.utils import get_prompt_value_by_name
+
+logger = logging.getLogger(__name__)
+
+
+async def arouter(state: State):
+    t1 = time.time()
+    message = state.get('message')
+
+    try:
+        input_text = state.get('input')
+
+        if message is None:
+            raise ValueError("Message is None in state")
+
+        if input_text is None:
+            raise ValueError("Input is None in state")
+
+        llm = create_llm('gpt-5-nano', reasoning_effort="minimal")
+        router_llm = llm.with_structured_output(Route)
+        template = await sync_to_async(get_prompt_value_by_name)(PromptType.ROUTER)
+
+        decision = await router_llm.ainvoke([
+            SystemMessage(content=template),
+            HumanMessage(content=input_text),
+        ])
+
+        t2 = time.time()
+        await arecord_step(
+            step_name='router',
+            message_id=message.id,
+            time_sec=t2 - t1,
+            input=None,
+            output={
+                'decision': decision.step,
+            }
+        )
+
+        return {
+            'decision': decision.step,
+        }
+    except Exception as e:
+        logger.error(f"Error in router: {str(e)}", exc_info=True)
+        t2 = time.time()
+        if message:
+            try:
+                await arecord_step(
+                    step_name='router',
+                    message_id=message.id,
+                    time_sec=t2 - t1,
+                    input={'error': str(e)},
+                    output={
+                        'decision': 'legal_question',
+                        'error': True,
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error in router: {str(e)}", exc_info=True)
+        # Default to legal_question to continue processing
+        return {
+            'decision': 'legal_question',
+        }
+
+
+async def acheck_input_relevance(state: State):
+    t1 = time.time()
+    message = state.get('message')
+    input_text = state.get('input')
+
+    try:
+        if message is None:
+            raise ValueError("Message is None in state")
+
+        if input_text is None:
+            raise ValueError("Input is None in state")
+
+        history = state.get('history', [])
+
+        # If no summary, no history, no uploaded docs, it's definitely a new question
+        if not _has_history_context(state):
+            t2 = time.time()
+            await arecord_step(
+                step_name='check_input_relevance',
+                message_id=message.id,
+                time_sec=t2 - t1,
+                input={
+                    'input': input_text,
+                    'history_count': 0,
+                },
+                output={
+                    'is_related_to_history': False,
+                    'reason': 'no_history',
+                }
+            )
+            return {
+                'is_related_to_history': False,
+            }
+
+        llm = create_llm('gpt-5-nano', reasoning_effort="minimal")
+        relevance_llm = llm.with_structured_output(InputRelevance)
+
+        decision = await relevance_llm.ainvoke(_input_relevance_messages(state, input_text))
+
+        t2 = time.time()
+        await arecord_step(
+            step_name='check_input_relevance',
+            message_id=message.id,
+            time_sec=t2 - t1,
+            input={
+                'input': input_text,
+                'history_count': len(history),
+                'has_summary': bool(state.get('summary', '')),
+            },
+            output={
+                'is_related_to_history': decision.is_related_to_history,
+            }
+        )
+
+        return {
+            'is_related_to_history': decision.is_related_to_history,
+        }
+    except Exception as e:
+        logger.error(f"Error in check_input_relevance: {str(e)}", exc_info=True)
+        t2 = time.time()
+        if message:
+            try:
+                await arecord_step(
+                    step_name='check_input_relevance',
+                    message_id=message.id,
+                    time_sec=t2 - t1,
+                    input={
+                        'input': input_text or '',
+                        'error': str(e),
+                    },
+                    output={
+                        'is_related_to_history': False,
+                        'error': True,
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error in check_input_relevance: {str(e)}", exc_info=True)
+        return {
+            'is_related_to_history': False,
+        }
+
+
+async def arephrase_user_input(state: State):
+    t1 = time.time()
+    user_message = state.get('message')
+
+    try:
+        if user_message is None:
+            raise ValueError("Message is None in state")
+
+        query = user_message.text or state.get('input', '')
+
+        summary = state.get('summary', '')
+        attached_docs_context = (state.get('attached_docs_context') or '').strip()
+        # Include uploaded doc context so follow-ups like "give me more details" are rephrased with document topic
+        rephrase_context = summary or ''
+        if attached_docs_context:
+            rephrase_context += (
+                f"\n\nUploaded documents in this chat (user may ask for more details or refer to these):\n"
+                f"{attached_docs_context[:3000]}{'...' if len(attached_docs_context) > 3000 else ''}"
+            )
+
+        if rephrase_context.strip():
+            query = await arephrase_user_input_using_summary(query, rephrase_context)
+            user_message.used_query = query
+            await user_message.asave()
+        else:
+            history = state.get('history', [])
+            used_queries = list(filter(None, [msg.used_query if msg.role != 'ai' else None for msg in history]))
+            if len(used_queries) > 0:
+                query = await arephrase_user_input_using_history(query, used_queries)
+                user_message.used_query = query
+                await user_message.asave()
+
+        t2 = time.time()
+        await arecord_step(
+            step_name='rephrase_user_input',
+            message=user_message,
+            time_sec=t2 - t1,
+            input=None,
+            output={
+                'query': query,
+                'used_summary': bool(summary),
+            }
+        )
+
+        return {
+            'query': query,
+        }
+    except Exception as e:
+        logger.error(f"Error in rephrase_user_input: {str(e)}", exc_info=True)
+        t2 = time.time()
+        # Use original input as fallback
+        fallback_query = state.get('input', state.get('query', ''))
+
+        if user_message:
+            try:
+                await arecord_step(
+                    step_name='rephrase_user_input',
+                    message=user_message,
+                    time_sec=t2 - t1,
+                    input={'error': str(e)},
+                    output={
+                        'query': fallback_query,
+                        'used_summary': False,
+                        'error': True,
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error in rephrase_user_input: {str(e)}", exc_info=True)
+
+        return {
+            'query': fallback_query,
+        }
+
+
+async def atranslate_user_input(state: State):
+    t1 = time.time()
+    user_message = state.get('message')
+
+    try:
+        if user_message is None:
+            raise ValueError("Message is None in state")
+
+        input_translation = ''
+        if user_message.text:
+            input_translation = await atranslate_question(user_message.text, user_message.language)
+
+        t2 = time.time()
+        await arecord_step(
+            step_name='translate_user_input',
+            message=user_message,
+            time_sec=t2 - t1,
+            input=None,
+            output={
+                'input_translation': input_translation,
+            }
+        )
+
+        return {
+            'input_translation': input_translation,
+        }
+    except Exception as e:
+        logger.error(f"Error in translate_user_input: {str(e)}", exc_info=True)
+        t2 = time.time()
+
+        if user_message:
+            try:
+                await arecord_step(
+                    step_name='translate_user_input',
+                    message=user_message,
+                    time_sec=t2 - t1,
+                    input={'error': str(e)},
+                    output={
+                        'input_translation': '',
+                        'error': True,
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error in translate_user_input: {str(e)}", exc_info=True)
+
+        # Return empty translation as fallback
+        return {
+            'input_translation': '',
+        }
+
+
+async def aunderstand_query(state: State):
+    t1 = time.time()
+    user_message = state.get('message')
+    input_text = state.get('input')
+
+    try:
+        if user_message is None:
+            raise ValueError("Message is None in state")
+
+        if input_text is None:
+            raise ValueError("Input is None in state")
+
+        from src.settings import CHAT_QUERY_UNDERSTANDING_MODEL
+        llm = create_llm(CHAT_QUERY_UNDERSTANDING_MODEL, temperature=0)
+        understanding_llm = llm.with_structured_output(QueryUnderstanding)
+        routing_instructions = await sync_to_async(get_prompt_value_by_name)(PromptType.ROUTER)
+
+        result = await understanding_llm.ainvoke(_query_understanding_messages(
+            state, input_text, routing_instructions,
+        ))
+
+        query, is_related, changed = _resolve_understood_query(state, user_message, input_text, result)
+        if changed:
+            await user_message.asave()
+
+        t2 = time.time()
+        await arecord_step(
+            step_name='understand_query',
+            message_id=user_message.id,
+            time_sec=t2 - t1,
+            input={
+                'input': input_text,
+                'history_count': len(state.get('history', [])),
+                'has_summary': bool(state.get('summary')),
+            },
+            output={
+                'decision': result.step,
+                'is_related_to_history': is_related,
+                'query': query,
+                'input_translation': result.translated_query,
+                'language': result.language,
+            }
+        )
+
+        return {
+            'decision': result.step,
+            'is_related_to_history': is_related,
+            'query': query,
+            'input_translation': result.translated_query,
+        }
+    except Exception as e:
+        logger.error(f"Error in understand_query: {str(e)}", exc_info=True)
+        t2 = time.time()
+        fallback_query = input_text or ''
+        if user_message:
+            try:
+                await arecord_step(
+                    step_name='understand_query',
+                    message_id=user_message.id,
+                    time_sec=t2 - t1,
+                    input={'error': str(e)},
+                    output={
+                        'decision': 'legal_question',
+                        'query': fallback_query,
+                        'error': True,
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error in understand_query: {str(e)}", exc_info=True)
+        return {
+            'decision': 'legal_question',
+            'is_related_to_history': False,
+            'query': fallback_query,
+            'input_translation': '',
+        }
+
+
+async def _astream_legal_answer(llm, prompt_messages):
+    """
+    Async counterpart of flow._stream_legal_answer.
+    """
+    emit_event('status', {'step': 'generating'})
+
+    extractor = AnswerTokenExtractor()
+    response = None
+    async for chunk in llm.astream(prompt_messages):
+        response = chunk if response is None else response + chunk
+        text = extractor.feed(chunk.content)
+        if text:
+            emit_event('token', {'text': text})
+
+    return response
+
+
+async def aanswer_legal_question(state: State):
+    t1 = time.time()
+
+    emit_event('status', {'step': 'retrieving'})
+
+    # Retrieval (embedding + pgvector SQL) and logging stay sync; only the completion is awaited natively
+    response, search_kwargs, used_prefetched = await sync_to_async(_prepare_legal_answer)(state, logger)
+
+    cached = await sync_to_async(answer_cache.lookup)(state, response)
+    if cached is not None:
+        response['response'] = _emit_cached_answer(cached)
+    else:
+        response['response'] = await _astream_legal_answer(create_legal_advice_llm(), response['prompt'])
+        await sync_to_async(answer_cache.store)(state, response)
+
+    await sync_to_async(_log_legal_answer)(state, response, search_kwargs, used_prefetched, t1)
+
+    return {
+        'rag_response': response,
+    }
+
+
+def sync_node(func):
+    """Run a sync node through sync_to_async (thread-sensitive), closing unusable or expired connections around it."""
+    def run(state, *args, **kwargs):
+        close_old_connections()
+        try:
+            return func(state, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+    @functools.wraps(func)
+    async def node(state, *args, **kwargs):
+        return await sync_to_async(run, thread_sensitive=True)(state, *args, **kwargs)
+    return node
+
+
+async def astream_graph(graph, graph_input, **kwargs):
+    """graph.astream(...), then close the connections the sync nodes opened on their thread."""
+    try:
+        async for item in graph.astream(graph_input, **kwargs):
+            yield item
+    finally:
+        await sync_to_async(connections.close_all, thread_sensitive=True)()
+
+
+ASYNC_NODES = {
+    'router': arouter,
+    'check_input_relevance': acheck_input_relevance,
+    'rephrase_user_input': arephrase_user_input,
+    'translate_user_input': atranslate_user_input,
+    'understand_query': aunderstand_query,
+    'answer_legal_question': aanswer_legal_question,
+}
+
+# Compiled once per process like flow.chat_graph; use with ainvoke/astream only
+chat_graph_async = CompiledGraphRegistry(partial(build_graph, use_async=True), name='chat_async')
+prompt_registry.add_listener(chat_graph_async.reload)
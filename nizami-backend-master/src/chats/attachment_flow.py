@@ -15,6 +15,7 @@ from django_q.tasks import async_task
 
 from src.prompts.enums import PendingDocIntentIntentType
 from src.uploads.models import File, FileExtraction, FileSummary
+from src.uploads.notifications import extraction_events, extraction_listener
 from src.uploads.storage import download_text_from_s3
 from src.uploads.tasks import extract_file
 
@@ -67,35 +68,48 @@ def _run_extraction_sync(*, file_ids: List[str], user_id: int) -> None:
             logger.warning("Sync extraction failed for file %s: %s", fid, e)
 
 
-def _poll_extraction_statuses(*, file_ids: List[str], user_id: int) -> Tuple[str, dict]:
+def _extraction_statuses(*, file_ids: List[str], user_id: int) -> Tuple[str, dict]:
     """
-    Poll extraction status until all files are READY/FAILED, or timeout.
+    One query for the extraction status of every file.
+    Returns (overall_status, status_by_file_id) where overall is READY | PREVIEW_READY | PROCESSING.
+    """
+    found = {
+        str(file_id): status
+        for file_id, status in FileExtraction.objects.filter(
+            file_id__in=file_ids, file__tenant_id=user_id,
+        ).values_list("file_id", "status")
+    }
+    statuses = {fid: found.get(str(fid), "PROCESSING") for fid in file_ids}
+    done = (FileExtraction.Status.READY, FileExtraction.Status.FAILED)
+    if all(status in done for status in statuses.values()):
+        return "READY", statuses
+    if any(status in (FileExtraction.Status.PREVIEW_READY, FileExtraction.Status.READY) for status in statuses.values()):
+        return "PREVIEW_READY", statuses
+    return "PROCESSING", statuses
+
+
+def _wait_for_extraction_statuses(*, file_ids: List[str], user_id: int) -> Tuple[str, dict]:
+    """
+    Wait until all files are READY/FAILED, any has a preview, or timeout.
     When the user sends a message we wait (up to ATTACHMENT_EXTRACTION_WAIT_TIMEOUT_SEC) so that
     even with a busy queue we give extraction time to complete before returning preliminary/processing.
+    extract_file announces each status change (src/uploads/notifications.py), so the statuses are re-read when one
+    of these files changes; ATTACHMENT_EXTRACTION_RECHECK_SEC (or the poll interval when no listener is running)
+    bounds the wait in case a notification is missed.
     Returns (overall_status, status_by_file_id) where overall is READY | PREVIEW_READY | PROCESSING.
     """
-    statuses = {}
+    from src.settings import ATTACHMENT_EXTRACTION_RECHECK_SEC
+
     deadline = time.monotonic() + SOFT_WAIT_TIMEOUT_SEC
-    while time.monotonic() < deadline:
-        all_ready = True
-        any_preview = False
-        for fid in file_ids:
-            ext = FileExtraction.objects.filter(file_id=fid, file__tenant_id=user_id).first()
-            if not ext:
-                statuses[fid] = "PROCESSING"
-                all_ready = False
-                continue
-            statuses[fid] = ext.status
-            if ext.status != FileExtraction.Status.READY and ext.status != FileExtraction.Status.FAILED:
-                all_ready = False
-            if ext.status == FileExtraction.Status.PREVIEW_READY or ext.status == FileExtraction.Status.READY:
-                any_preview = True
-        if all_ready:
-            return "READY", statuses
-        if any_preview:
-            return "PREVIEW_READY", statuses
-        time.sleep(SOFT_WAIT_POLL_INTERVAL_SEC)
-    return "PROCESSING", statuses
+    while True:
+        # Snapshot before reading, so a change committed after the read still wakes the wait
+        since = extraction_events.snapshot(file_ids)
+        overall, statuses = _extraction_statuses(file_ids=file_ids, user_id=user_id)
+        remaining = deadline - time.monotonic()
+        if overall != "PROCESSING" or remaining <= 0:
+            return overall, statuses
+        recheck = ATTACHMENT_EXTRACTION_RECHECK_SEC if extraction_listener.ensure_started() else SOFT_WAIT_POLL_INTERVAL_SEC
+        extraction_events.wait(since, min(recheck, remaining))
 
 
 def _infer_intent(*, text: str) -> str:
@@ -151,15 +165,20 @@ def _load_doc_context_for_response(*, file_ids: List[str], user_id: int, use_sum
                     ext = FileExtraction.objects.filter(file_id=fid, status=FileExtraction.Status.READY).first()
                     if not ext or not ext.full_text_s3_key or not file_record.s3_bucket:
                         continue
-                    text = download_text_from_s3(bucket=file_record.s3_bucket, key=ext.full_text_s3_key)
                     remaining = MAX_DOC_CONTEXT_CHARS - total
+                    text = download_text_from_s3(
+                        bucket=file_record.s3_bucket, key=ext.full_text_s3_key, max_chars=remaining + 1,
+                    )
                     text = text[:remaining] + "\n[Truncated...]" if len(text) > remaining else text
             else:
                 ext = FileExtraction.objects.filter(file_id=fid, status=FileExtraction.Status.READY).first()
                 if not ext or not ext.full_text_s3_key or not file_record.s3_bucket:
                     continue
-                text = download_text_from_s3(bucket=file_record.s3_bucket, key=ext.full_text_s3_key)
                 remaining = MAX_DOC_CONTEXT_CHARS - total
+                # One extra character tells whether the text was truncated
+                text = download_text_from_s3(
+                    bucket=file_record.s3_bucket, key=ext.full_text_s3_key, max_chars=remaining + 1,
+                )
                 if len(text) > remaining:
                     text = text[:remaining] + "\n\n[Document truncated...]"
             parts.append(f"--- {file_record.original_filename} ---\n{text}")
@@ -256,7 +275,7 @@ def run_attachment_message_flow(
             )
 
     _ensure_extraction_enqueued(file_ids=attachment_file_ids, user_id=user_id)
-    overall_status, _ = _poll_extraction_statuses(file_ids=attachment_file_ids, user_id=user_id)
+    overall_status, _ = _wait_for_extraction_statuses(file_ids=attachment_file_ids, user_id=user_id)
     intent_type = intent or _infer_intent(text=text)
 
     # If not READY yet, run extraction synchronously so we have full text/summary for context (no placeholder message).
@@ -2,6 +2,7 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from pgvector.django import CosineDistance
 
 from src.chats.utils import create_llm
+from src.common.retrievers import embed_query_cached
 from src.reference_documents.models import ReferenceDocument
 from src.settings import embeddings
 
@@ -163,22 +164,7 @@ Now generate the updated structured summary:"""
     return response.content.strip()
 
 
-def rephrase_user_input_using_summary(message: str, summary: str) -> str:
-    """
-    Rephrase user input by incorporating relevant context from conversation summary.
-    
-    Args:
-        message: The user's current input message
-        summary: The conversation summary
-        
-    Returns:
-        Rephrased query with context incorporated
-    """
-    if not summary:
-        return message
-    
-    llm = create_llm('gpt-5-nano', reasoning_effort="low")
-    
+def _rephrase_using_summary_messages(message: str, summary: str) -> list:
     prompt = f"""You are an AI assistant that helps rephrase user input by incorporating relevant context provided in ##CONTEXT.
 Given a user's input and a conversation summary in ##CONTEXT, identify the key themes and details from the ##CONTEXT that are relevant to the user's input. 
 Then, rephrase the user's input to include the most important parts of the ##CONTEXT while maintaining natural flow and clarity.
@@ -203,19 +189,44 @@ Context Instructions:
 {summary}
         """
 
-    messages_list = [
+    return [
         SystemMessage(content=prompt),
         HumanMessage(content=message),
     ]
 
-    response = llm.invoke(messages_list)
+
+def rephrase_user_input_using_summary(message: str, summary: str) -> str:
+    """
+    Rephrase user input by incorporating relevant context from conversation summary.
+    
+    Args:
+        message: The user's current input message
+        summary: The conversation summary
+        
+    Returns:
+        Rephrased query with context incorporated
+    """
+    if not summary:
+        return message
+    
+    llm = create_llm('gpt-5-nano', reasoning_effort="low")
+    response = llm.invoke(_rephrase_using_summary_messages(message, summary))
     return response.content
 
 
-def rephrase_user_input_using_history(message, old_messages):
+async def arephrase_user_input_using_summary(message: str, summary: str) -> str:
+    """
+    Async variant of rephrase_user_input_using_summary.
+    """
+    if not summary:
+        return message
+
     llm = create_llm('gpt-5-nano', reasoning_effort="low")
+    response = await llm.ainvoke(_rephrase_using_summary_messages(message, summary))
+    return response.content
 
-    message = message
+
+def _rephrase_using_history_messages(message, old_messages) -> list:
     context = '\n'.join(filter(None, old_messages))
 
     prompt = f"""
@@ -243,17 +254,27 @@ Context Instructions:
 {context}
         """
 
-    messages = [
+    return [
         SystemMessage(content=prompt),
         HumanMessage(content=message),
     ]
 
-    response = llm.invoke(messages)
+
+def rephrase_user_input_using_history(message, old_messages):
+    llm = create_llm('gpt-5-nano', reasoning_effort="low")
+    response = llm.invoke(_rephrase_using_history_messages(message, old_messages))
 
     return response.content
 
 
-def translate_question(text: str, from_lang: str) -> str:
+async def arephrase_user_input_using_history(message, old_messages):
+    llm = create_llm('gpt-5-nano', reasoning_effort="low")
+    response = await llm.ainvoke(_rephrase_using_history_messages(message, old_messages))
+
+    return response.content
+
+
+def _translate_question_messages(text: str, from_lang: str) -> list:
     translations = {
         'ar': 'English',
         'en': 'Arabic',
@@ -266,8 +287,6 @@ def translate_question(text: str, from_lang: str) -> str:
     if not to_lang:
         raise ValueError(f"Unsupported source language: {from_lang}")
 
-    llm = create_llm('gpt-4o')
-
     system_prompt = f"""
         You are a professional translator working for a legal-tech platform.
 
@@ -294,17 +313,28 @@ def translate_question(text: str, from_lang: str) -> str:
         - Return **only** the translated text, with no extra explanation.
         """
 
-    messages = [
+    return [
         SystemMessage(content=system_prompt),
         HumanMessage(content=text),
     ]
 
+
+def translate_question(text: str, from_lang: str) -> str:
+    messages = _translate_question_messages(text, from_lang)
+    llm = create_llm('gpt-4o')
     response = llm.invoke(messages)
     return response.content.strip()
 
 
+async def atranslate_question(text: str, from_lang: str) -> str:
+    messages = _translate_question_messages(text, from_lang)
+    llm = create_llm('gpt-4o')
+    response = await llm.ainvoke(messages)
+    return response.content.strip()
+
+
 def find_ref_document_ids_by_description(text):
-    embedded_text = embeddings.embed_query(text)
+    embedded_text = embed_query_cached(text, embeddings)
 
     files = (ReferenceDocument
              .objects
@@ -1,3 +1,5 @@
+import functools
+import inspect
 import json
 import re
 import time
@@ -5,7 +7,7 @@ import uuid
 import logging
 
 
-from django.db import connection, transaction
+from django.db import connections
 from django.db.models import Q
 from langchain_core.documents import Document
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
@@ -15,22 +17,27 @@ from langgraph.constants import START, END
 from langgraph.graph import StateGraph
 from pydantic import BaseModel, Field
 from typing_extensions import TypedDict, Literal, Any
+from src.chats import answer_cache
 from src.chats.attachment_flow import load_attached_docs_context_for_chat
+from src.chats.graph_registry import CompiledGraphRegistry
 
 from src.chats.domain import (
     rephrase_user_input_using_history,
     rephrase_user_input_using_summary,
     find_ref_document_ids_by_description,
     translate_question,
-    create_initial_summary,
-    update_conversation_summary,
 )
+from src.common.instrumentation import instrument_node
 from src.common.retrievers import find_rag_source_document_ids_by_description
-from src.chats.models import Message, MessageLog, MessageStepLog, Chat
+from src.chats.log_payloads import pack
+from src.chats.models import Message, MessageLog, Chat
+from src.chats.step_logs import record_step
+from src.chats.streaming import AnswerTokenExtractor, emit_event
 from src.chats.utils import create_legal_advice_llm, detect_language, create_llm
 from src.prompts.enums import PromptType
+from src.prompts.registry import prompt_registry
 from src.prompts.utils import get_prompt_value_by_name
-from src.common.retrievers import FilteredRetriever
+from src.common.retrievers import FilteredRetriever, merge_retrieved_documents, rag_source_two_stage_search
 from src.gibberish import GibberishConfig, classify_input, InputVerdict
 from src.reference_documents.models import RagSourceDocument
 
@@ -56,6 +63,7 @@ class State(TypedDict):
     output: str
     is_gibberish: bool
     is_related_to_history: bool
+    prefetched_retrieval: Any  # Speculative retrieval on the raw input (parallel graph only)
 
 
 # Schema for structured output to use as routing logic
@@ -72,6 +80,25 @@ class InputRelevance(BaseModel):
     )
 
 
+# Schema for the fused pre-answer call (router + relevance + rephrase + translate in one request)
+class QueryUnderstanding(BaseModel):
+    step: Literal["legal_question", "translation", "other"] = Field(
+        description="The next step in the routing process"
+    )
+    is_related_to_history: bool = Field(
+        description="True if the input continues, refers to or answers something in the conversation history."
+    )
+    rephrased_query: str = Field(
+        description="The user's input rephrased with the relevant conversation context, or unchanged if already self-contained."
+    )
+    translated_query: str = Field(
+        description="The user's input translated to English if it is Arabic, otherwise to Arabic."
+    )
+    language: Literal["ar", "en", "fr", "hi", "ur"] = Field(
+        description="ISO code of the language the user's input is written in."
+    )
+
+
 def router(state: State):
     t1 = time.time()
     logger = logging.getLogger(__name__)
@@ -98,7 +125,7 @@ def router(state: State):
         ])
 
         t2 = time.time()
-        MessageStepLog.objects.create(
+        record_step(
             step_name='router',
             message_id=message.id,
             time_sec=t2 - t1,
@@ -117,7 +144,7 @@ def router(state: State):
         message = state.get('message')
         if message:
             try:
-                MessageStepLog.objects.create(
+                record_step(
                     step_name='router',
                     message_id=message.id,
                     time_sec=t2 - t1,
@@ -150,7 +177,7 @@ def has_answer(state: State):
         decision = 'yes' if child is not None else 'no'
         
         t2 = time.time()
-        MessageStepLog.objects.create(
+        record_step(
             step_name='has_answer',
             message_id=message.id,
             time_sec=t2 - t1,
@@ -189,7 +216,7 @@ def first_or_create_message(state: State):
         )
         
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name='first_or_create_message',
         message=user_message,
         time_sec=t2 - t1,
@@ -251,21 +278,10 @@ def retrieve_history(state: State):
             )
         
         if not summary and recent_messages:
-            # Create initial summary if it doesn't exist
-            all_messages = list(
-                Message.objects.filter(
-                    Q(chat_id=chat_id) & 
-                    ~Q(id=message.id) &
-                    ~Q(text__isnull=True) &
-                    ~Q(text='')
-                ).order_by('created_at')
-            )
-            if all_messages:
-                summary = create_initial_summary(all_messages)
-                chat.summary = summary
-                # Track the last message ID included in summary
-                chat.summary_last_message_id = all_messages[-1].id
-                chat.save(update_fields=['summary', 'summary_last_message_id'])
+            # No summary yet (previous turn's task still queued, or an older chat): answer from the recent
+            # messages and let the background task build it instead of summarizing on the request path
+            from src.chats.tasks import enqueue_chat_summary
+            enqueue_chat_summary(chat_id)
 
         # Load summaries of files uploaded in this chat so follow-up questions can use them
         attached_docs_context = load_attached_docs_context_for_chat(
@@ -274,7 +290,7 @@ def retrieve_history(state: State):
         )
 
         t2 = time.time()
-        MessageStepLog.objects.create(
+        record_step(
             step_name='retrieve_history',
             message_id=message.id,
             time_sec=t2 - t1,
@@ -346,7 +362,7 @@ def rephrase_user_input(state: State):
                     user_message.save()
 
         t2 = time.time()
-        MessageStepLog.objects.create(
+        record_step(
             step_name='rephrase_user_input',
             message=user_message,
             time_sec=t2 - t1,
@@ -369,7 +385,7 @@ def rephrase_user_input(state: State):
         
         if user_message:
             try:
-                MessageStepLog.objects.create(
+                record_step(
                     step_name='rephrase_user_input',
                     message=user_message,
                     time_sec=t2 - t1,
@@ -403,7 +419,7 @@ def translate_user_input(state: State):
             logger.warning("translate_user_input: message text is empty")
             # Return empty translation if no text
             t2 = time.time()
-            MessageStepLog.objects.create(
+            record_step(
                 step_name='translate_user_input',
                 message=user_message,
                 time_sec=t2 - t1,
@@ -419,7 +435,7 @@ def translate_user_input(state: State):
         input_translation = translate_question(user_message.text, user_message.language)
 
         t2 = time.time()
-        MessageStepLog.objects.create(
+        record_step(
             step_name='translate_user_input',
             message=user_message,
             time_sec=t2 - t1,
@@ -439,7 +455,7 @@ def translate_user_input(state: State):
         
         if user_message:
             try:
-                MessageStepLog.objects.create(
+                record_step(
                     step_name='translate_user_input',
                     message=user_message,
                     time_sec=t2 - t1,
@@ -482,7 +498,7 @@ def calculate_disclaimer(state: State):
     show_translation_disclaimer = is_different_language and is_context_used and is_answer
 
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name='calculate_disclaimer',
         message=user_message,
         time_sec=t2 - t1,
@@ -502,55 +518,11 @@ def calculate_disclaimer(state: State):
     }
 
 
-@transaction.atomic
-def _update_chat_summary_sync(chat_id: int, message_ids: list):
-    """
-    Synchronous function to update chat summary (called in background).
-    Updates summary and tracks the last message ID included.
-    Uses database locking to prevent race conditions.
-    
-    Args:
-        chat_id: The chat ID
-        message_ids: List of message IDs to add to summary
-    """
-    logger = logging.getLogger(__name__)
-    
-    try:
-        if not message_ids:
-            return
-        
-        # Use select_for_update to lock the row and prevent concurrent updates
-        chat = Chat.objects.select_for_update().get(id=chat_id)
-        existing_summary = chat.summary or ""
-        
-        # Ensure we're not processing messages already in summary
-        if chat.summary_last_message_id:
-            message_ids = [mid for mid in message_ids if mid > chat.summary_last_message_id]
-        
-        if not message_ids:
-            logger.debug(f"No new messages to add to summary for chat {chat_id}")
-            return
-        
-        # Get messages
-        new_messages = list(Message.objects.filter(id__in=message_ids).order_by('created_at'))
-        if not new_messages:
-            return
-        
-        # Update summary with new messages
-        updated_summary = update_conversation_summary(existing_summary, new_messages)
-        chat.summary = updated_summary
-        # Track the last message ID included in summary (the most recent one)
-        chat.summary_last_message_id = max(message_ids)
-        chat.save(update_fields=['summary', 'summary_last_message_id'])
-        
-        logger.info(f"Summary updated for chat {chat_id} with {len(new_messages)} messages (last message ID: {chat.summary_last_message_id})")
-    except Exception as e:
-        logger.error(f"Error updating summary for chat {chat_id}: {str(e)}", exc_info=True)
-
-
 def update_chat_summary(chat_id: int, new_messages: list):
     """
-    Update the chat summary with new messages synchronously.
+    Schedule a background refresh of the chat summary (src.chats.tasks.summarize_chat).
+    The task picks up new_messages together with any other turns not yet in the summary, so
+    summarization never adds to the user's response time.
     
     Args:
         chat_id: The chat ID
@@ -558,12 +530,9 @@ def update_chat_summary(chat_id: int, new_messages: list):
     """
     if not new_messages:
         return
-    
-    # Extract message IDs for processing
-    message_ids = [msg.id for msg in new_messages]
-    
-    # Update summary synchronously
-    _update_chat_summary_sync(chat_id, message_ids)
+
+    from src.chats.tasks import enqueue_chat_summary
+    enqueue_chat_summary(chat_id)
 
 
 def store_system_message(state: State):
@@ -591,7 +560,7 @@ def store_system_message(state: State):
     update_chat_summary(chat_id, [user_message, system_message])
     
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name='store_system_message',
         message=user_message,
         time_sec=t2 - t1,
@@ -607,14 +576,39 @@ def store_system_message(state: State):
     }
 
 
-def answer_legal_question(state: State):
-    t1 = time.time()
-    logger = logging.getLogger(__name__)
-    
-    user_message = state['message']
-    translation = state['input_translation']
-    query = state['query']
+def _stream_legal_answer(llm, prompt_messages):
+    """
+    Stream the LEGAL_ADVICE completion, forwarding the decoded answer text as `token` events.
+    Returns the merged message, so callers see the same object as llm.invoke().
+    """
+    emit_event('status', {'step': 'generating'})
+
+    extractor = AnswerTokenExtractor()
+    response = None
+    for chunk in llm.stream(prompt_messages):
+        response = chunk if response is None else response + chunk
+        text = extractor.feed(chunk.content)
+        if text:
+            emit_event('token', {'text': text})
+
+    return response
 
+
+def _emit_cached_answer(cached):
+    """
+    Send a cached completion to the client as a single `token` event (same events as a streamed answer).
+    """
+    emit_event('status', {'step': 'generating'})
+    text = AnswerTokenExtractor().feed(cached.content)
+    if text:
+        emit_event('token', {'text': text})
+    return cached
+
+
+def _find_candidate_document_ids(query):
+    """
+    Shortlist the documents whose chunks the answer is retrieved from.
+    """
     from src.settings import RAG_SOURCE
     if RAG_SOURCE == 'new':
         ids_all = find_rag_source_document_ids_by_description(query)
@@ -628,19 +622,94 @@ def answer_legal_question(state: State):
             .values_list("id", flat=True)
         )
 
-        ids = ids_non_moj if ids_non_moj else ids_all
-    else:
-        ids = find_ref_document_ids_by_description(query)
+        return ids_non_moj if ids_non_moj else ids_all
 
-    llm = create_legal_advice_llm()
-    template = get_prompt_value_by_name(PromptType.LEGAL_ADVICE)
+    return find_ref_document_ids_by_description(query)
 
-    retriever = FilteredRetriever(ids, k=8, logger=logger)
 
-    if RAG_SOURCE == 'new':
-        search_kwargs = {'k': 10, 'source': 'RagSourceDocumentChunk', 'filter': {'rag_source_document_id': {'$in': ids}}}
-    else:
-        search_kwargs = {'k': 8, 'source': 'langchain_pg_embedding', 'filter': {'reference_document_id': {'$in': ids}}}
+def _shortlist_and_retrieve(query, query_texts, logger):
+    """
+    Shortlist documents for `query` and retrieve chunks for every text in query_texts.
+    With RAG_SOURCE=new both stages run as one SQL statement; otherwise (or if it fails) as separate queries.
+    Returns (document_ids, merged documents).
+    """
+    from src.settings import RAG_SOURCE
+    query_texts = [text for text in query_texts if text and text.strip()]
+
+    if RAG_SOURCE == 'new' and query_texts:
+        result = rag_source_two_stage_search(query, query_texts, k=8, logger=logger)
+        if result is not None:
+            ids, results = result
+            return ids, merge_retrieved_documents(*results)
+
+    ids = _find_candidate_document_ids(query)
+    return ids, FilteredRetriever(ids, k=8, logger=logger).invoke_many(query_texts)
+
+
+def prefetch_retrieval(state: State):
+    """
+    Speculatively retrieve documents for the raw input while history, router and translation run.
+    answer_legal_question only uses the result when rephrase_user_input keeps the query unchanged,
+    which is the case for the first message of a chat.
+    """
+    t1 = time.time()
+    logger = logging.getLogger(__name__)
+
+    try:
+        message = state['message']
+        input_text = state['input']
+
+        if Message.objects.filter(chat_id=state['chat_id']).exclude(id=message.id).exists():
+            # Follow-ups get rephrased with the chat history, so this retrieval would be thrown away
+            return {
+                'prefetched_retrieval': None,
+            }
+
+        ids, documents = _shortlist_and_retrieve(input_text, [input_text], logger)
+
+        t2 = time.time()
+        record_step(
+            step_name='prefetch_retrieval',
+            message_id=message.id,
+            time_sec=t2 - t1,
+            input={
+                'input': input_text,
+            },
+            output={
+                'document_ids': list(ids),
+                'documents_count': len(documents),
+            }
+        )
+
+        return {
+            'prefetched_retrieval': {
+                'query': input_text,
+                'ids': ids,
+                'documents': documents,
+            },
+        }
+    except Exception as e:
+        logger.error(f"Error in prefetch_retrieval: {str(e)}", exc_info=True)
+        return {
+            'prefetched_retrieval': None,
+        }
+
+
+def _prepare_legal_answer(state: State, logger):
+    """
+    Retrieval and prompt assembly for answer_legal_question, i.e. everything before the LLM call.
+    Returns (rag_response without 'response', search_kwargs, used_prefetched_retrieval).
+    """
+    user_message = state['message']
+    translation = state['input_translation']
+    query = state['query']
+
+    # Reuse the speculative retrieval only if rephrasing left the query untouched
+    prefetched = state.get('prefetched_retrieval') or {}
+    if prefetched.get('query') != query:
+        prefetched = {}
+
+    template = get_prompt_value_by_name(PromptType.LEGAL_ADVICE)
 
     # Use summary for context, with recent messages for immediate context
     summary = state.get('summary', '')
@@ -712,21 +781,26 @@ def answer_legal_question(state: State):
             logger.warning('No documents retrieved! Context will be empty.')
         return "\n\n".join(doc.page_content for doc in docs)
 
-    with connection.cursor() as cursor:
-        try:
-            cursor.execute("SET LOCAL hnsw.ef_search = 32;")
-        except Exception as e:
-            logger.error(f"Error setting hnsw.ef_search: {e}")
-    
+    # hnsw.ef_search and iterative scans are set per query by retrievers.vector_search_cursor
+
+    def retrieve_documents(x):
+        nonlocal ids
+        if prefetched:
+            ids = prefetched['ids']
+            translated = FilteredRetriever(ids, k=8, logger=logger).invoke_many([x['translated_input']])
+            return merge_retrieved_documents(prefetched['documents'], translated)
+
+        ids, documents = _shortlist_and_retrieve(x['input'], [x['input'], x['translated_input']], logger)
+        return documents
+
+    ids = []
     rag_chain = (
-            RunnablePassthrough.assign(source_documents=RunnableLambda(
-                lambda x: retriever.invoke(x['input']) + retriever.invoke(x['translated_input'])))
+            RunnablePassthrough.assign(source_documents=RunnableLambda(retrieve_documents))
             | RunnablePassthrough.assign(context=lambda inputs: format_docs(inputs["source_documents"]))
             | RunnablePassthrough.assign(prompt=lambda inputs: prompt.format_messages(
         input=inputs["input"],
         context=inputs["context"]
     ))
-            | RunnablePassthrough.assign(response=lambda inputs: llm.invoke(inputs["prompt"]))
     )
 
     response = rag_chain.invoke({
@@ -734,20 +808,36 @@ def answer_legal_question(state: State):
         'translated_input': translation,
     })
 
+    from src.settings import RAG_SOURCE
+    if RAG_SOURCE == 'new':
+        search_kwargs = {'k': 10, 'source': 'RagSourceDocumentChunk', 'filter': {'rag_source_document_id': {'$in': ids}}}
+    else:
+        search_kwargs = {'k': 8, 'source': 'langchain_pg_embedding', 'filter': {'reference_document_id': {'$in': ids}}}
+
+    return response, search_kwargs, bool(prefetched)
+
+
+def _log_legal_answer(state: State, response, search_kwargs, used_prefetched, t1):
+    user_message = state['message']
+
+    response_data, response_zstd = pack(response)
     MessageLog.logs_objects.create(
         message=user_message,
-        response=response,
+        response_data=response_data,
+        response_zstd=response_zstd,
     )
     
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name='answer_legal_question',
         message=user_message,
         time_sec=t2 - t1,
         input={
-            'input': query,
-            'translated_input': translation,
+            'input': state['query'],
+            'translated_input': state['input_translation'],
             'filters': search_kwargs,
+            'used_prefetched_retrieval': used_prefetched,
+            'answer_cache_entry_id': response.get('answer_cache_entry_id'),
         },
         output={
             'rag_response': response,
@@ -755,6 +845,23 @@ def answer_legal_question(state: State):
     )
 
 
+def answer_legal_question(state: State):
+    t1 = time.time()
+    logger = logging.getLogger(__name__)
+
+    emit_event('status', {'step': 'retrieving'})
+
+    response, search_kwargs, used_prefetched = _prepare_legal_answer(state, logger)
+
+    cached = answer_cache.lookup(state, response)
+    if cached is not None:
+        response['response'] = _emit_cached_answer(cached)
+    else:
+        response['response'] = _stream_legal_answer(create_legal_advice_llm(), response['prompt'])
+        answer_cache.store(state, response)
+
+    _log_legal_answer(state, response, search_kwargs, used_prefetched, t1)
+
     return {
         'rag_response': response,
     }
@@ -775,7 +882,7 @@ def extract_used_languages(state: State):
 
 
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name='extract_used_languages',
         message=state['message'],
         time_sec=t2 - t1,
@@ -808,7 +915,7 @@ def decode_response_json(state: State):
         }
     
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name='decode_response_json',
         message=state['message'],
         time_sec=t2 - t1,
@@ -851,7 +958,7 @@ def translate_previous_message(state: State):
 
     t2 = time.time()
 
-    MessageStepLog.objects.create(
+    record_step(
         step_name="translate_previous_message",
         message=state['message'],
         time_sec=t2 - t1,
@@ -884,7 +991,7 @@ def store_translation_message(state: State):
     update_chat_summary(chat_id, [user_message, system_message])
     
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name="store_translation_message",
         message=user_message,
         time_sec=t2 - t1,
@@ -901,7 +1008,17 @@ def store_translation_message(state: State):
 
 
 def legal_question_flow(state: State):
-    return state
+    return {}
+
+
+def understand_input(state: State):
+    """Fan-out point for the pre-answer steps that only need the raw input (parallel graph)."""
+    return {}
+
+
+def route_question(state: State):
+    """Join point once both the router decision and the chat history are available (parallel graph)."""
+    return {}
 
 
 def return_first_child(state: State):
@@ -936,7 +1053,7 @@ def validate_input_quality(state: State):
         is_gibberish = (result.status == InputVerdict.GIBBERISH)
         
         t2 = time.time()
-        MessageStepLog.objects.create(
+        record_step(
             step_name='validate_input_quality',
             message_id=message.id,
             time_sec=t2 - t1,
@@ -993,7 +1110,7 @@ def handle_gibberish_input(state: State):
     update_chat_summary(chat_id, [user_message, system_message])
     
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name='handle_gibberish_input',
         message=user_message,
         time_sec=t2 - t1,
@@ -1012,6 +1129,105 @@ def handle_gibberish_input(state: State):
     }
 
 
+def _build_history_context(state: State):
+    """
+    Render summary, uploaded-doc summaries and recent messages as prompt context for the
+    pre-answer classifiers. Returns (history_context, last_ai_message).
+    """
+    summary = state.get('summary', '')
+    history = state.get('history', [])
+    unsummarized_messages = state.get('unsummarized_messages', [])
+    attached_docs_context = state.get('attached_docs_context', '') or ''
+
+    # Build conversation context from summary and recent messages
+    history_context = ""
+    last_ai_message = None
+
+    if summary:
+        # Use summary as primary context
+        history_context = f"\n\nConversation Summary:\n{summary}"
+    if attached_docs_context.strip():
+        history_context += f"\n\nUploaded documents in this chat:\n{attached_docs_context[:2000]}{'...' if len(attached_docs_context) > 2000 else ''}"
+
+    # Add messages that aren't in summary yet (from async update race condition)
+    if unsummarized_messages:
+        unsummarized_context = "\n\nRecent Messages (not yet in summary):\n"
+        for msg in unsummarized_messages:
+            role = "User" if msg.role == 'user' else "Assistant"
+            unsummarized_context += f"{role}: {msg.text}\n"
+        history_context += unsummarized_context
+
+    # Add recent messages for immediate context (last 3 messages)
+    recent_messages = history[-3:] if len(history) > 3 else history
+    if recent_messages:
+        recent_context = "\n\nMost Recent Messages:\n"
+        for msg in recent_messages:
+            role = "User" if msg.role == 'user' else "Assistant"
+            recent_context += f"{role}: {msg.text}\n"
+        history_context += recent_context
+
+    # Find the most recent AI message
+    for msg in reversed(recent_messages if recent_messages else history):
+        if msg.role == 'ai':
+            last_ai_message = msg.text
+            break
+
+    return history_context, last_ai_message
+
+
+def _input_relevance_messages(state: State, input_text: str) -> list:
+    history_context, last_ai_message = _build_history_context(state)
+    
+    # Highlight the last AI message if it exists
+    last_ai_context = ""
+    if last_ai_message:
+        last_ai_context = f"\n\nIMPORTANT: The Assistant's last message was:\n{last_ai_message}\n\nIf the user is answering this question (e.g., 'yes', 'no', 'ok', 'sure', etc.), it is RELATED."
+    
+    prompt = f"""You are analyzing whether the current user input is related to the previous conversation history.
+
+Determine if the current input is:
+- RELATED to the chat history: The user is asking about, referring to, or continuing a topic already discussed in the conversation, OR answering a question that the Assistant asked
+- NOT RELATED to the chat history: The user is asking a completely new question about a different topic that is unrelated to the conversation
+
+Examples of RELATED (return True):
+- User answers "yes" or "no" to a question the Assistant asked
+- User responds with short answers like "ok", "sure", "correct", "that's right" to the Assistant's question
+- User asks "Can you tell me more about that?" after discussing contracts
+- User asks "give me more details" or "more details please" after the Assistant answered about a document or topic
+- User asks "can you give me more details about the document I shared before?" (clearly about uploaded document)
+- User asks "What about the second point?" referring to a previous answer
+- User asks "How does this apply to my case?" after discussing a legal concept
+- User asks follow-up questions about the same topic or uploaded document
+- User asks for clarification on something mentioned earlier
+- User provides additional information related to a previous discussion
+- User confirms or denies something the Assistant mentioned
+
+Examples of NOT RELATED (return False):
+- User asks "What is a contract?" when previous conversation was about employment law (completely different topic)
+- User asks a completely new legal question on a different topic
+- User starts a new conversation thread on an unrelated subject
+- User asks about something that has no connection to the conversation history
+
+Current user input to check:
+{input_text}
+{history_context}{last_ai_context}
+"""
+
+    return [
+        SystemMessage(content=prompt),
+        HumanMessage(content=input_text),
+    ]
+
+
+def _has_history_context(state: State) -> bool:
+    return bool(
+        state.get('summary', '')
+        or state.get('history', [])
+        or state.get('unsummarized_messages', [])
+        or (state.get('attached_docs_context', '') or '').strip()
+    )
+
+
 def check_input_relevance(state: State):
     """Check if the current input is related to the chat history"""
     t1 = time.time()
@@ -1031,13 +1247,11 @@ def check_input_relevance(state: State):
         
         summary = state.get('summary', '')
         history = state.get('history', [])
-        unsummarized_messages = state.get('unsummarized_messages', [])
-        attached_docs_context = state.get('attached_docs_context', '') or ''
         
         # If no summary, no history, no uploaded docs, it's definitely a new question
-        if not summary and (not history or len(history) == 0) and not unsummarized_messages and not attached_docs_context.strip():
+        if not _has_history_context(state):
             t2 = time.time()
-            MessageStepLog.objects.create(
+            record_step(
                 step_name='check_input_relevance',
                 message_id=message.id,
                 time_sec=t2 - t1,
@@ -1057,81 +1271,10 @@ def check_input_relevance(state: State):
         llm = create_llm('gpt-5-nano', reasoning_effort="minimal")
         relevance_llm = llm.with_structured_output(InputRelevance)
         
-        # Build conversation context from summary and recent messages
-        history_context = ""
-        last_ai_message = None
-        
-        if summary:
-            # Use summary as primary context
-            history_context = f"\n\nConversation Summary:\n{summary}"
-        if attached_docs_context.strip():
-            history_context += f"\n\nUploaded documents in this chat:\n{attached_docs_context[:2000]}{'...' if len(attached_docs_context) > 2000 else ''}"
-        
-        # Add messages that aren't in summary yet (from async update race condition)
-        if unsummarized_messages:
-            unsummarized_context = "\n\nRecent Messages (not yet in summary):\n"
-            for msg in unsummarized_messages:
-                role = "User" if msg.role == 'user' else "Assistant"
-                unsummarized_context += f"{role}: {msg.text}\n"
-            history_context += unsummarized_context
-        
-        # Add recent messages for immediate context (last 3 messages)
-        recent_messages = history[-3:] if len(history) > 3 else history
-        if recent_messages:
-            recent_context = "\n\nMost Recent Messages:\n"
-            for msg in recent_messages:
-                role = "User" if msg.role == 'user' else "Assistant"
-                recent_context += f"{role}: {msg.text}\n"
-            history_context += recent_context
-        
-        # Find the most recent AI message
-        for msg in reversed(recent_messages if recent_messages else history):
-            if msg.role == 'ai':
-                last_ai_message = msg.text
-                break
-        
-        # Highlight the last AI message if it exists
-        last_ai_context = ""
-        if last_ai_message:
-            last_ai_context = f"\n\nIMPORTANT: The Assistant's last message was:\n{last_ai_message}\n\nIf the user is answering this question (e.g., 'yes', 'no', 'ok', 'sure', etc.), it is RELATED."
-        
-        prompt = f"""You are analyzing whether the current user input is related to the previous conversation history.
-
-Determine if the current input is:
-- RELATED to the chat history: The user is asking about, referring to, or continuing a topic already discussed in the conversation, OR answering a question that the Assistant asked
-- NOT RELATED to the chat history: The user is asking a completely new question about a different topic that is unrelated to the conversation
-
-Examples of RELATED (return True):
-- User answers "yes" or "no" to a question the Assistant asked
-- User responds with short answers like "ok", "sure", "correct", "that's right" to the Assistant's question
-- User asks "Can you tell me more about that?" after discussing contracts
-- User asks "give me more details" or "more details please" after the Assistant answered about a document or topic
-- User asks "can you give me more details about the document I shared before?" (clearly about uploaded document)
-- User asks "What about the second point?" referring to a previous answer
-- User asks "How does this apply to my case?" after discussing a legal concept
-- User asks follow-up questions about the same topic or uploaded document
-- User asks for clarification on something mentioned earlier
-- User provides additional information related to a previous discussion
-- User confirms or denies something the Assistant mentioned
-
-Examples of NOT RELATED (return False):
-- User asks "What is a contract?" when previous conversation was about employment law (completely different topic)
-- User asks a completely new legal question on a different topic
-- User starts a new conversation thread on an unrelated subject
-- User asks about something that has no connection to the conversation history
-
-Current user input to check:
-{input_text}
-{history_context}{last_ai_context}
-"""
-        
-        decision = relevance_llm.invoke([
-            SystemMessage(content=prompt),
-            HumanMessage(content=input_text),
-        ])
+        decision = relevance_llm.invoke(_input_relevance_messages(state, input_text))
         
         t2 = time.time()
-        MessageStepLog.objects.create(
+        record_step(
             step_name='check_input_relevance',
             message_id=message.id,
             time_sec=t2 - t1,
@@ -1156,7 +1299,7 @@ Current user input to check:
         input_text = state.get('input', '')
         if message:
             try:
-                MessageStepLog.objects.create(
+                record_step(
                     step_name='check_input_relevance',
                     message_id=message.id,
                     time_sec=t2 - t1,
@@ -1176,6 +1319,146 @@ Current user input to check:
         }
 
 
+def _query_understanding_messages(state: State, input_text: str, routing_instructions: str) -> list:
+    history_context, last_ai_message = _build_history_context(state)
+    conversation = history_context or "\n(none)"
+    if last_ai_message:
+        conversation += f"\n\nThe Assistant's last message was:\n{last_ai_message}"
+
+    prompt = f"""You are the query-understanding step of a legal assistant. Analyse the user's input and return:
+
+step:
+{routing_instructions.strip()}
+
+is_related_to_history:
+- True if the user continues, refers to, asks for more details about, or answers a question from the conversation below
+  (including short answers like "yes", "ok", "sure" and questions about uploaded documents).
+- False for a new question on a different topic, or when there is no conversation.
+
+rephrased_query:
+- Don't answer the user's query; keep it a question if it is a question.
+- If the query is vague or lacks a topic (e.g. "give me more details"), rephrase it using the relevant parts of the conversation.
+- If the query is clear and self-explanatory, or the conversation is unrelated, return it without modifications.
+- Don't change the jurisdiction of the user's query.
+
+translated_query:
+- Translate the user's input (not the rephrased one) to English if it is Arabic, otherwise to Arabic.
+- Use a formal legal register for legal content; keep numbering, dates, amounts and article numbers.
+- Do not summarize, explain or add anything.
+
+language:
+- The language of the user's input.
+
+##CONVERSATION{conversation}
+"""
+
+    return [
+        SystemMessage(content=prompt),
+        HumanMessage(content=input_text),
+    ]
+
+
+def _resolve_understood_query(state: State, user_message: Message, input_text: str, result: QueryUnderstanding):
+    """
+    Without any conversation the model has nothing to rephrase with or relate to, so keep the raw input.
+    Returns (query, is_related_to_history, used_query_changed).
+    """
+    has_history = _has_history_context(state)
+    is_related = result.is_related_to_history if has_history else False
+    query = (result.rephrased_query or '').strip() if has_history else ''
+    query = query or user_message.text or input_text
+    changed = query != user_message.used_query
+    if changed:
+        user_message.used_query = query
+    return query, is_related, changed
+
+
+def understand_query(state: State):
+    """
+    Fused alternative to router, check_input_relevance, rephrase_user_input and translate_user_input:
+    a single structured-output call (CHAT_QUERY_UNDERSTANDING = 'fused').
+    """
+    t1 = time.time()
+    logger = logging.getLogger(__name__)
+
+    try:
+        user_message = state.get('message')
+        input_text = state.get('input')
+
+        if user_message is None:
+            logger.error("understand_query: message is None in state")
+            raise ValueError("Message is None in state")
+
+        if input_text is None:
+            logger.error("understand_query: input is None in state")
+            raise ValueError("Input is None in state")
+
+        from src.settings import CHAT_QUERY_UNDERSTANDING_MODEL
+        llm = create_llm(CHAT_QUERY_UNDERSTANDING_MODEL, temperature=0)
+        understanding_llm = llm.with_structured_output(QueryUnderstanding)
+
+        result = understanding_llm.invoke(_query_understanding_messages(
+            state, input_text, get_prompt_value_by_name(PromptType.ROUTER),
+        ))
+
+        query, is_related, changed = _resolve_understood_query(state, user_message, input_text, result)
+        if changed:
+            user_message.save()
+
+        t2 = time.time()
+        record_step(
+            step_name='understand_query',
+            message_id=user_message.id,
+            time_sec=t2 - t1,
+            input={
+                'input': input_text,
+                'history_count': len(state.get('history', [])),
+                'has_summary': bool(state.get('summary')),
+            },
+            output={
+                'decision': result.step,
+                'is_related_to_history': is_related,
+                'query': query,
+                'input_translation': result.translated_query,
+                'language': result.language,
+            }
+        )
+
+        return {
+            'decision': result.step,
+            'is_related_to_history': is_related,
+            'query': query,
+            'input_translation': result.translated_query,
+        }
+    except Exception as e:
+        logger.error(f"Error in understand_query: {str(e)}", exc_info=True)
+        t2 = time.time()
+        user_message = state.get('message')
+        fallback_query = state.get('input', '')
+        if user_message:
+            try:
+                record_step(
+                    step_name='understand_query',
+                    message_id=user_message.id,
+                    time_sec=t2 - t1,
+                    input={'error': str(e)},
+                    output={
+                        'decision': 'legal_question',
+                        'query': fallback_query,
+                        'error': True,
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error in understand_query: {str(e)}", exc_info=True)
+        # Same fallbacks as the separate steps: answer the raw input without a translation
+        return {
+            'decision': 'legal_question',
+            'is_related_to_history': False,
+            'query': fallback_query,
+            'input_translation': '',
+        }
+
+
 def handle_related_input(state: State):
     """Handle input that is related to chat history - ask user to be more specific"""
     t1 = time.time()
@@ -1206,7 +1489,7 @@ def handle_related_input(state: State):
     update_chat_summary(chat_id, [user_message, system_message])
     
     t2 = time.time()
-    MessageStepLog.objects.create(
+    record_step(
         step_name='handle_related_input',
         message=user_message,
         time_sec=t2 - t1,
@@ -1224,28 +1507,104 @@ def handle_related_input(state: State):
     }
 
 
-def build_graph():
-    graph_builder = StateGraph(State)
+def close_new_connections(func):
+    """
+    Close the DB connections a sync node opened itself. LangGraph runs the tasks of a multi-task step on a thread pool
+    created for each run, so a connection opened there would be left to garbage collection; connections the thread
+    already had (the request's, when a task runs inline) are kept.
+    """
+    @functools.wraps(func)
+    def node(state, *args, **kwargs):
+        closed = [alias for alias in connections if connections[alias].connection is None]
+        try:
+            return func(state, *args, **kwargs)
+        finally:
+            for alias in closed:
+                if connections[alias].connection is not None:
+                    connections[alias].close()
+    return node
+
+
+def build_graph(*, parallel=None, fused=None, use_async=False, nodes=None):
+    """
+    parallel: run the independent pre-answer steps concurrently (defaults to settings.CHAT_GRAPH_PARALLEL).
+    fused: replace router/relevance/rephrase/translate with the single understand_query call
+           (defaults to settings.CHAT_QUERY_UNDERSTANDING == 'fused').
+    use_async: swap in the async node variants from async_flow (graph must then be run with ainvoke/astream).
+    nodes: optional {node_name: callable} overrides, used by the benchmark_chat_graph command.
+
+    Sequential: retrieve_history -> check_input_relevance -> router -> {translate, rephrase} -> answer.
+    Parallel:   {retrieve_history, router, translate_user_input, prefetch_retrieval}
+                -> {check_input_relevance, rephrase_user_input, route_question} -> answer.
+    Fused:      retrieve_history (|| prefetch_retrieval when parallel) -> understand_query -> answer.
+
+    The parallel graph starts its branches before the router has decided. On the translation route their results
+    are discarded: translate_user_input, rephrase_user_input and check_input_relevance are three wasted LLM calls,
+    and prefetch_retrieval a wasted retrieval on the first message of a chat (it returns early on follow-ups). On the
+    legal_question / other routes everything is used, except the prefetch when rephrasing changed the query.
+    CHAT_GRAPH_PREFETCH_RETRIEVAL=False drops prefetch_retrieval from the graph.
+    """
+    from src.settings import CHAT_GRAPH_PARALLEL, CHAT_GRAPH_PREFETCH_RETRIEVAL, CHAT_QUERY_UNDERSTANDING
+    if parallel is None:
+        parallel = CHAT_GRAPH_PARALLEL
+    prefetch = parallel and CHAT_GRAPH_PREFETCH_RETRIEVAL
+    if fused is None:
+        fused = CHAT_QUERY_UNDERSTANDING == 'fused'
+
+    node_funcs = {
+        'first_or_create_message': first_or_create_message,
+        'retrieve_history': retrieve_history,
+        'router': router,
+        'legal_question_flow': legal_question_flow,
+        'translate_user_input': translate_user_input,
+        'translate_previous_message': translate_previous_message,
+        'store_translation_message': store_translation_message,
+        'rephrase_user_input': rephrase_user_input,
+        'answer_legal_question': answer_legal_question,
+        'extract_used_languages': extract_used_languages,
+        'decode_response_json': decode_response_json,
+        'calculate_disclaimer': calculate_disclaimer,
+        'store_system_message': store_system_message,
+        'has_answer': has_answer,
+        'return_first_child': return_first_child,
+        'validate_input_quality': validate_input_quality,
+        'handle_gibberish_input': handle_gibberish_input,
+        'check_input_relevance': check_input_relevance,
+        'handle_related_input': handle_related_input,
+    }
+    if fused:
+        for name in ('router', 'check_input_relevance', 'rephrase_user_input', 'translate_user_input'):
+            del node_funcs[name]
+        node_funcs['understand_query'] = understand_query
+    if parallel:
+        node_funcs['understand_input'] = understand_input
+        if prefetch:
+            node_funcs['prefetch_retrieval'] = prefetch_retrieval
+        if not fused:
+            node_funcs['route_question'] = route_question
+    overrides = dict(nodes or {})
+    if use_async:
+        from src.chats.async_flow import ASYNC_NODES
+        overrides = {**ASYNC_NODES, **overrides}
+    for name, func in overrides.items():
+        if name in node_funcs:
+            node_funcs[name] = func
+    if use_async:
+        from src.chats.async_flow import sync_node
+        # Keep the ORM work of the remaining sync nodes off LangGraph's executor threads
+        node_funcs = {
+            name: func if inspect.iscoroutinefunction(func) else sync_node(func)
+            for name, func in node_funcs.items()
+        }
+    else:
+        node_funcs = {
+            name: func if inspect.iscoroutinefunction(func) else close_new_connections(func)
+            for name, func in node_funcs.items()
+        }
 
-    graph_builder.add_node('first_or_create_message', first_or_create_message)
-    graph_builder.add_node('retrieve_history', retrieve_history)
-    graph_builder.add_node('router', router)
-    graph_builder.add_node('legal_question_flow', legal_question_flow)
-    graph_builder.add_node('translate_user_input', translate_user_input)
-    graph_builder.add_node('translate_previous_message', translate_previous_message)
-    graph_builder.add_node('store_translation_message', store_translation_message)
-    graph_builder.add_node('rephrase_user_input', rephrase_user_input)
-    graph_builder.add_node('answer_legal_question', answer_legal_question)
-    graph_builder.add_node('extract_used_languages', extract_used_languages)
-    graph_builder.add_node('decode_response_json', decode_response_json)
-    graph_builder.add_node('calculate_disclaimer', calculate_disclaimer)
-    graph_builder.add_node('store_system_message', store_system_message)
-    graph_builder.add_node('has_answer', has_answer)
-    graph_builder.add_node('return_first_child', return_first_child)
-    graph_builder.add_node('validate_input_quality', validate_input_quality)
-    graph_builder.add_node('handle_gibberish_input', handle_gibberish_input)
-    graph_builder.add_node('check_input_relevance', check_input_relevance)
-    graph_builder.add_node('handle_related_input', handle_related_input)
+    graph_builder = StateGraph(State)
+    for name, func in node_funcs.items():
+        graph_builder.add_node(name, instrument_node(name, func))
 
     graph_builder.add_edge(START, "first_or_create_message")
     graph_builder.add_edge('first_or_create_message', 'validate_input_quality')
@@ -1266,38 +1625,88 @@ def build_graph():
         lambda state: state['decision'],
         {
             "yes": 'return_first_child',
-            "no": 'retrieve_history',
+            "no": 'understand_input' if parallel else 'retrieve_history',
         },
     )
 
-    graph_builder.add_edge("retrieve_history", "check_input_relevance")
-    
-    # When input is related to history or uploaded docs (e.g. "give me more details"), answer using context.
-    # Do not ask user to "be more specific"; rephrase and answer in detail.
-    graph_builder.add_conditional_edges(
-        "check_input_relevance",
-        lambda state: "related" if state.get('is_related_to_history', False) else "new_question",
-        {
-            "related": 'router',
-            "new_question": 'router',
-        },
-    )
+    if fused:
+        if parallel:
+            graph_builder.add_edge('understand_input', 'retrieve_history')
+            if prefetch:
+                graph_builder.add_edge('understand_input', 'prefetch_retrieval')
+        graph_builder.add_edge('retrieve_history', 'understand_query')
+
+        graph_builder.add_conditional_edges(
+            "understand_query",
+            lambda state: state['decision'],
+            {
+                "legal_question": 'legal_question_flow',
+                "other": 'legal_question_flow',
+                "translation": "translate_previous_message",
+            },
+        )
 
-    graph_builder.add_conditional_edges(
-        "router",
-        lambda state: state['decision'],
-        {
-            "legal_question": 'legal_question_flow',
-            "other": 'legal_question_flow',
-            "translation": "translate_previous_message",
-        },
-    )
+        if prefetch:
+            graph_builder.add_edge(['legal_question_flow', 'prefetch_retrieval'], 'answer_legal_question')
+        else:
+            graph_builder.add_edge('legal_question_flow', 'answer_legal_question')
+    elif parallel:
+        # router, translation and retrieval only need the raw input; they run alongside retrieve_history
+        graph_builder.add_edge('understand_input', 'retrieve_history')
+        graph_builder.add_edge('understand_input', 'router')
+        graph_builder.add_edge('understand_input', 'translate_user_input')
+        if prefetch:
+            graph_builder.add_edge('understand_input', 'prefetch_retrieval')
+
+        # check_input_relevance never changes the path (both branches went to router), so it runs
+        # next to rephrasing instead of gating it
+        graph_builder.add_edge('retrieve_history', 'check_input_relevance')
+        graph_builder.add_edge('retrieve_history', 'rephrase_user_input')
+
+        graph_builder.add_edge(['router', 'retrieve_history'], 'route_question')
+        graph_builder.add_conditional_edges(
+            "route_question",
+            lambda state: state['decision'],
+            {
+                "legal_question": 'legal_question_flow',
+                "other": 'legal_question_flow',
+                "translation": "translate_previous_message",
+            },
+        )
+
+        answer_inputs = ['legal_question_flow', 'translate_user_input', 'rephrase_user_input', 'check_input_relevance']
+        if prefetch:
+            answer_inputs.append('prefetch_retrieval')
+        graph_builder.add_edge(answer_inputs, 'answer_legal_question')
+    else:
+        graph_builder.add_edge("retrieve_history", "check_input_relevance")
+
+        # When input is related to history or uploaded docs (e.g. "give me more details"), answer using context.
+        # Do not ask user to "be more specific"; rephrase and answer in detail.
+        graph_builder.add_conditional_edges(
+            "check_input_relevance",
+            lambda state: "related" if state.get('is_related_to_history', False) else "new_question",
+            {
+                "related": 'router',
+                "new_question": 'router',
+            },
+        )
 
-    graph_builder.add_edge('legal_question_flow', 'translate_user_input')
-    graph_builder.add_edge('legal_question_flow', 'rephrase_user_input')
+        graph_builder.add_conditional_edges(
+            "router",
+            lambda state: state['decision'],
+            {
+                "legal_question": 'legal_question_flow',
+                "other": 'legal_question_flow',
+                "translation": "translate_previous_message",
+            },
+        )
+
+        graph_builder.add_edge('legal_question_flow', 'translate_user_input')
+        graph_builder.add_edge('legal_question_flow', 'rephrase_user_input')
 
-    graph_builder.add_edge('translate_user_input', 'answer_legal_question')
-    graph_builder.add_edge('rephrase_user_input', 'answer_legal_question')
+        graph_builder.add_edge('translate_user_input', 'answer_legal_question')
+        graph_builder.add_edge('rephrase_user_input', 'answer_legal_question')
     
     graph_builder.add_edge('answer_legal_question', 'extract_used_languages')
     graph_builder.add_edge('answer_legal_question', 'decode_response_json')
@@ -1313,3 +1722,8 @@ def build_graph():
     graph_builder.add_edge("store_translation_message", END)
 
     return graph_builder.compile()
+
+
+# Compiled once per process (warmed at startup in asgi/wsgi); use chat_graph.get() instead of build_graph()
+chat_graph = CompiledGraphRegistry(build_graph, name='chat')
+prompt_registry.add_listener(chat_graph.reload)
@@ -0,0 +1,192 @@
+"""
+Compact JSON payloads for MessageStepLog.input/output and MessageLog.response.
+
+Logged values are converted to JSON (to_log_payload) before they are stored in the jsonb columns:
+
+  - a retrieved Document becomes a reference: chunk id, source document id, chunk index and similarity, without the
+    chunk text (the chunk tables still hold it);
+  - the RAG `context` (the joined chunk texts) and the `prompt` messages built from it keep only their size;
+  - other LangChain messages keep their type and content, model instances their id, pydantic models their fields.
+
+A serialized payload larger than LOG_PAYLOAD_COMPRESS_BYTES is stored zstd-compressed in the matching *_zstd
+column instead (pack / unpack). Rows written before this format hold str(dict) text in the legacy columns;
+parse_legacy reads them back without eval and the backfill_log_payloads command converts them.
+"""
+
+import ast
+import datetime
+import decimal
+import json
+import uuid
+
+import zstandard
+from django.db import models
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from pydantic import BaseModel
+
+# Document metadata kept in a chunk reference
+DOCUMENT_METADATA_KEYS = (
+    'id', 'reference_document_id', 'rag_source_document_id', 'chunk_index', 'language', 'similarity',
+)
+
+# Unparseable legacy text is kept up to this many characters
+LEGACY_TEXT_LIMIT = 2000
+
+_compressor = zstandard.ZstdCompressor(level=3)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def _compress_threshold() -> int:
+    from src.settings import LOG_PAYLOAD_COMPRESS_BYTES
+    return LOG_PAYLOAD_COMPRESS_BYTES
+
+
+def document_ref(document: Document) -> dict:
+    return {key: document.metadata[key] for key in DOCUMENT_METADATA_KEYS if key in document.metadata}
+
+
+def _message(message: BaseMessage) -> dict:
+    return {'type': message.type, 'content': to_log_payload(message.content)}
+
+
+def _message_size(message) -> dict:
+    if isinstance(message, BaseMessage):
+        content = message.content
+        return {'type': message.type, 'chars': len(content) if isinstance(content, str) else len(str(content))}
+    return to_log_payload(message)
+
+
+def to_log_payload(value, key=None):
+    """
+    JSON-serializable, compact copy of a logged value. New containers are built, so later mutations of the
+    logged dicts (graph nodes keep filling rag_response) do not leak into the log.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        if key == 'context' and isinstance(value, str):
+            return {'chars': len(value)}
+        return value
+    if isinstance(value, dict):
+        return {str(k): to_log_payload(v, k) for k, v in value.items()}
+    if key == 'prompt' and isinstance(value, (list, tuple)):
+        return [_message_size(m) for m in value]
+    if isinstance(value, (list, tuple)):
+        return [to_log_payload(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((to_log_payload(v) for v in value), key=str)
+    if isinstance(value, Document):
+        return document_ref(value)
+    if isinstance(value, BaseMessage):
+        return _message(value)
+    if isinstance(value, models.Model):
+        return {'model': value._meta.label, 'id': value.pk}
+    if isinstance(value, BaseModel):
+        return to_log_payload(value.model_dump())
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, bytes):
+        return {'bytes': len(value)}
+    return str(value)
+
+
+def pack(value):
+    """
+    (json_value, zstd_blob) for a logged value: the blob is set, and the json value None, when the serialized
+    payload is larger than LOG_PAYLOAD_COMPRESS_BYTES.
+    """
+    if value is None:
+        return None, None
+    payload = to_log_payload(value)
+    threshold = _compress_threshold()
+    if threshold > 0:
+        raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if len(raw) > threshold:
+            return None, _compressor.compress(raw)
+    return payload, None
+
+
+def unpack(data, blob, legacy=None):
+    """
+    Stored payload from its jsonb value, its zstd blob, or the legacy str(dict) text of older rows.
+    """
+    if blob is not None:
+        return json.loads(_decompressor.decompress(bytes(blob)))
+    if data is not None:
+        return data
+    if legacy is not None:
+        return parse_legacy(legacy)
+    return None
+
+
+# Objects whose repr appears in legacy str(dict) logs and that are rebuilt from their keyword arguments
+LEGACY_CONSTRUCTORS = {
+    'Document': Document,
+    'AIMessage': AIMessage,
+    'AIMessageChunk': AIMessageChunk,
+    'HumanMessage': HumanMessage,
+    'SystemMessage': SystemMessage,
+    'ToolMessage': ToolMessage,
+}
+
+
+def _legacy_call(node: ast.Call):
+    name = node.func.id if isinstance(node.func, ast.Name) else ast.unparse(node.func)
+    args = [_legacy_value(arg) for arg in node.args]
+    kwargs = {kw.arg: _legacy_value(kw.value) for kw in node.keywords if kw.arg is not None}
+
+    constructor = LEGACY_CONSTRUCTORS.get(name)
+    if constructor is not None and not args:
+        try:
+            return constructor(**kwargs)
+        except Exception:
+            pass
+    if name in ('datetime.datetime', 'datetime', 'datetime.date', 'date'):
+        cls = datetime.date if name.endswith('date') else datetime.datetime
+        try:
+            return cls(*args).isoformat()
+        except (TypeError, ValueError):
+            pass
+    if name in ('UUID', 'uuid.UUID') and args:
+        return str(args[0])
+    return {'type': name, **({'args': args} if args else {}), **kwargs}
+
+
+def _legacy_value(node):
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Dict):
+        return {
+            _legacy_value(k) if k is not None else '**': _legacy_value(v)
+            for k, v in zip(node.keys, node.values)
+        }
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_legacy_value(e) for e in node.elts]
+    if isinstance(node, ast.Set):
+        return [_legacy_value(e) for e in node.elts]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _legacy_value(node.operand)
+        if isinstance(operand, (int, float)):
+            return -operand if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.Call):
+        return _legacy_call(node)
+    # Names (enum members, `inf`, ...) and anything else are kept as source text
+    return ast.unparse(node)
+
+
+def parse_legacy(text: str):
+    """
+    Payload of a legacy str(dict) log value. The text is parsed, never evaluated: literals are read as such,
+    Document / message reprs are rebuilt and compacted like new payloads, other calls become {'type': ...} dicts.
+    Text that does not parse (object reprs like <Message: ...>, truncated values) is kept, shortened.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        value = _legacy_value(ast.parse(text, mode='eval').body)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return {'unparsed': text[:LEGACY_TEXT_LIMIT], 'chars': len(text)}
+    return to_log_payload(value)
@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from src.chats.log_payloads import pack, parse_legacy
+from src.chats.models import MessageLog, MessageStepLog
+
+# model -> (manager, legacy text field -> (json field, zstd field))
+TARGETS = {
+    'steps': (
+        lambda: MessageStepLog.objects,
+        {'input': ('input_data', 'input_zstd'), 'output': ('output_data', 'output_zstd')},
+    ),
+    'responses': (
+        lambda: MessageLog.logs_objects,
+        {'response': ('response_data', 'response_zstd')},
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert legacy str(dict) step log and message log payloads to the compact JSON format (jsonb, zstd for '
+        'large payloads) in batches, and clear the legacy text columns. Safe to interrupt and re-run: converted '
+        'rows have no legacy text left.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(TARGETS), help='Backfill one table only')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many rows per table')
+        parser.add_argument('--keep-text', action='store_true',
+                            help='Keep the legacy text columns next to the converted payloads')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='VACUUM ANALYZE the tables afterwards so the freed space is reused')
+
+    def handle(self, *args, **options):
+        names = [options['only']] if options['only'] else sorted(TARGETS)
+        for name in names:
+            get_manager, fields = TARGETS[name]
+            self._backfill(name, get_manager(), fields, options)
+
+    def _backfill(self, name, manager, fields, options):
+        model = manager.model
+        legacy_fields = list(fields)
+        new_fields = [field for pair in fields.values() for field in pair]
+
+        pending = manager.none()
+        for legacy, (data_field, zstd_field) in fields.items():
+            pending = pending | manager.filter(**{
+                f'{legacy}__isnull': False,
+                f'{data_field}__isnull': True,
+                f'{zstd_field}__isnull': True,
+            })
+
+        converted = text_bytes = unparsed = 0
+        last_id = 0
+        while options['limit'] is None or converted < options['limit']:
+            size = options['batch_size']
+            if options['limit'] is not None:
+                size = min(size, options['limit'] - converted)
+            rows = list(pending.filter(id__gt=last_id).order_by('id').only('id', *legacy_fields)[:size])
+            if not rows:
+                break
+
+            for row in rows:
+                for legacy, (data_field, zstd_field) in fields.items():
+                    text = getattr(row, legacy)
+                    if text is None:
+                        continue
+                    text_bytes += len(text.encode('utf-8'))
+                    payload = parse_legacy(text)
+                    if isinstance(payload, dict) and 'unparsed' in payload:
+                        unparsed += 1
+                    data, blob = pack(payload)
+                    setattr(row, data_field, data)
+                    setattr(row, zstd_field, blob)
+                    if not options['keep_text']:
+                        setattr(row, legacy, None)
+
+            update_fields = new_fields if options['keep_text'] else new_fields + legacy_fields
+            manager.bulk_update(rows, update_fields)
+            converted += len(rows)
+            last_id = rows[-1].id
+            self.stdout.write(f'{name}: {converted} rows converted (up to id {last_id})')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {converted} rows, {text_bytes / 1024 / 1024:.1f} MB of legacy text converted, '
+            f'{unparsed} payloads kept as shortened text'
+        ))
+
+        if options['vacuum'] and converted:
+            # VACUUM cannot run in a transaction block; management commands run in autocommit mode
+            with connections[pending.db].cursor() as cursor:
+                cursor.execute(f'VACUUM ANALYZE {model._meta.db_table}')
+            self.stdout.write(
+                f'{name}: vacuumed {model._meta.db_table}; VACUUM FULL or pg_repack returns the space to the OS'
+            )
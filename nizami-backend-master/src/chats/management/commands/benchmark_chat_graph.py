@@ -0,0 +1,136 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg
+from django.utils import timezone
+
+from src.chats.flow import build_graph
+from src.chats.models import MessageStepLog
+
+# Typical per-step latencies (seconds) used when there are no step logs to read them from
+DEFAULT_STEP_LATENCIES = {
+    'first_or_create_message': 0.02,
+    'validate_input_quality': 0.05,
+    'has_answer': 0.01,
+    'retrieve_history': 0.15,
+    'check_input_relevance': 1.2,
+    'router': 0.9,
+    'translate_user_input': 1.0,
+    'rephrase_user_input': 1.3,
+    'prefetch_retrieval': 0.6,
+    'understand_query': 1.6,
+    'answer_legal_question': 6.0,
+    'extract_used_languages': 0.01,
+    'decode_response_json': 0.01,
+    'calculate_disclaimer': 0.01,
+    'store_system_message': 0.05,
+}
+
+# Values the routing lambdas read; every other stub returns nothing
+STUB_OUTPUTS = {
+    'validate_input_quality': {'is_gibberish': False},
+    'has_answer': {'decision': 'no'},
+    'router': {'decision': 'legal_question'},
+    'check_input_relevance': {'is_related_to_history': False},
+    'understand_query': {'decision': 'legal_question', 'is_related_to_history': False},
+}
+
+# name -> (parallel, fused)
+GRAPH_VARIANTS = {
+    'sequential': (False, False),
+    'parallel': (True, False),
+    'fused': (True, True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the critical-path latency of the sequential, parallel and fused chat graphs. '
+        'Every node is replaced by a stub that sleeps for the step latency (defaults, or averages '
+        'from MessageStepLog with --from-logs), so only the graph topology is measured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Runs per graph variant')
+        parser.add_argument('--scale', type=float, default=0.1,
+                            help='Multiply step latencies by this factor to keep the benchmark short')
+        parser.add_argument('--from-logs', action='store_true',
+                            help='Use average step times from MessageStepLog instead of the defaults')
+        parser.add_argument('--days', type=int, default=7, help='Look-back window for --from-logs')
+        parser.add_argument('--follow-up', action='store_true',
+                            help='Model a follow-up message (query gets rephrased, speculative retrieval is unused)')
+
+    def handle(self, *args, **options):
+        latencies = dict(DEFAULT_STEP_LATENCIES)
+        if options['from_logs']:
+            latencies.update(self._latencies_from_logs(options['days']))
+
+        scale = options['scale']
+        first_message = not options['follow_up']
+
+        results = {}
+        for name, (parallel, fused) in GRAPH_VARIANTS.items():
+            graph = build_graph(
+                parallel=parallel,
+                fused=fused,
+                nodes=self._stub_nodes(latencies, scale, first_message),
+            )
+            timings = []
+            for _ in range(options['runs']):
+                t1 = time.perf_counter()
+                graph.invoke({'input': 'benchmark', 'uuid': 'benchmark', 'chat_id': 0})
+                timings.append((time.perf_counter() - t1) / scale)
+            results[name] = timings
+
+        self.stdout.write('Step latencies (s): ' + ', '.join(f'{k}={v:.2f}' for k, v in latencies.items()))
+        for name, timings in results.items():
+            self.stdout.write(
+                f'{name:<10} critical path: mean {statistics.mean(timings):.2f}s, '
+                f'min {min(timings):.2f}s over {len(timings)} runs'
+            )
+
+        before = statistics.mean(results['sequential'])
+        for name in ('parallel', 'fused'):
+            after = statistics.mean(results[name])
+            self.stdout.write(self.style.SUCCESS(
+                f'{name.capitalize()} graph saves {before - after:.2f}s per message ({(1 - after / before) * 100:.0f}%)'
+            ))
+
+    def _latencies_from_logs(self, days):
+        rows = (
+            MessageStepLog.objects
+            .filter(created_at__gte=timezone.now() - timedelta(days=days), step_name__in=DEFAULT_STEP_LATENCIES)
+            .values('step_name')
+            .annotate(avg_time=Avg('time_sec'))
+        )
+        return {row['step_name']: row['avg_time'] for row in rows if row['avg_time'] is not None}
+
+    def _stub_nodes(self, latencies, scale, first_message):
+        prefetch_sec = latencies['prefetch_retrieval']
+
+        def stub(name):
+            def node(state):
+                time.sleep(latencies.get(name, 0) * scale)
+                return dict(STUB_OUTPUTS.get(name, {}))
+            return node
+
+        def prefetch_retrieval(state):
+            if not first_message:
+                return {'prefetched_retrieval': None}
+            time.sleep(prefetch_sec * scale)
+            return {'prefetched_retrieval': {'query': state['input']}}
+
+        def answer_legal_question(state):
+            # The answer step's own retrieval is skipped when the speculative one is reused
+            answer_sec = latencies['answer_legal_question']
+            if state.get('prefetched_retrieval'):
+                answer_sec = max(answer_sec - prefetch_sec, 0)
+            time.sleep(answer_sec * scale)
+            return {}
+
+        nodes = {name: stub(name) for name in DEFAULT_STEP_LATENCIES}
+        nodes['prefetch_retrieval'] = prefetch_retrieval
+        nodes['answer_legal_question'] = answer_legal_question
+        return nodes
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:25
+
+from django.db import migrations, models
+import pgvector.django.vector
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0022_rename_chats_pendi_tenant__status_idx_chats_pendi_tenant__6e0d3e_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('context_key', models.CharField(max_length=64)),
+                ('rag_source', models.CharField(max_length=16)),
+                ('document_ids', models.JSONField(default=list)),
+                ('language', models.CharField(max_length=16)),
+                ('query', models.TextField()),
+                ('query_embedding', pgvector.django.vector.VectorField()),
+                ('answer', models.TextField()),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'chats_answer_cache_entry',
+                'indexes': [models.Index(fields=['context_key', 'language'], name='chats_answe_context_fd7e5d_idx')],
+            },
+        ),
+    ]
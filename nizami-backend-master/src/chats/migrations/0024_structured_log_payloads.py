@@ -0,0 +1,43 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0023_answercacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagelog',
+            name='response_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagelog',
+            name='response_zstd',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagesteplog',
+            name='input_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagesteplog',
+            name='input_zstd',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagesteplog',
+            name='output_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagesteplog',
+            name='output_zstd',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
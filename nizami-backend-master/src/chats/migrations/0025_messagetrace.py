@@ -0,0 +1,31 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0024_structured_log_payloads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageTrace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wall_sec', models.FloatField()),
+                ('db_queries', models.IntegerField(default=0)),
+                ('db_time_sec', models.FloatField(default=0)),
+                ('llm_calls', models.IntegerField(default=0)),
+                ('prompt_tokens', models.IntegerField(default=0)),
+                ('completion_tokens', models.IntegerField(default=0)),
+                ('cost_usd', models.FloatField(blank=True, null=True)),
+                ('embedding_calls', models.IntegerField(default=0)),
+                ('nodes', models.JSONField(default=list)),
+                ('message', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messageTraces', to='chats.message')),
+            ],
+        ),
+    ]
@@ -2,8 +2,9 @@ import os
 import uuid
 
 from django.db import models
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from pgvector.django import VectorField
 
 from src.prompts.enums import PendingDocIntentStatus, PendingDocIntentIntentType
 from src.users.models import User
@@ -105,14 +106,17 @@ class MessageLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     message = models.ForeignKey(Message, related_name='messageLogs', on_delete=models.CASCADE, null=True)
+    # Legacy str(dict) text; new rows use response_data, or response_zstd when large (src/chats/log_payloads.py)
     response = models.TextField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True)
+    response_zstd = models.BinaryField(null=True, blank=True)
 
     logs_objects = LogsManager()
 
     def response_json(self):
-        import ast
+        from src.chats.log_payloads import unpack
 
-        return ast.literal_eval(self.response)
+        return unpack(self.response_data, self.response_zstd, self.response)
 
 
 class MessageStepLog(models.Model):
@@ -121,8 +125,13 @@ class MessageStepLog(models.Model):
 
     step_name = models.CharField(max_length=255, null=True)
     message = models.ForeignKey(Message, related_name='messageStepLogs', on_delete=models.CASCADE, null=True)
+    # Legacy str(dict) text; new rows use *_data, or *_zstd when large (src/chats/log_payloads.py)
     input = models.TextField(null=True, blank=True)
     output = models.TextField(null=True, blank=True)
+    input_data = models.JSONField(null=True, blank=True)
+    output_data = models.JSONField(null=True, blank=True)
+    input_zstd = models.BinaryField(null=True, blank=True)
+    output_zstd = models.BinaryField(null=True, blank=True)
     time_sec = models.FloatField(null=True, blank=True)
 
     def __str__(self):
@@ -130,14 +139,71 @@ class MessageStepLog(models.Model):
         return f"{self.id} - {self.step_name} ({t}s)"
 
     def output_json(self):
-        import ast
+        from src.chats.log_payloads import unpack
 
-        return ast.literal_eval(self.output)
+        return unpack(self.output_data, self.output_zstd, self.output)
 
     def input_json(self):
-        import ast
+        from src.chats.log_payloads import unpack
 
-        return ast.literal_eval(self.output)
+        return unpack(self.input_data, self.input_zstd, self.input)
+
+
+class MessageTrace(models.Model):
+    """
+    Resources used by one chat graph run (src/common/instrumentation.py): totals plus one entry per node run
+    in `nodes` (node, start_sec, wall_sec, db_queries, db_time_sec, llm_calls, tokens, cost_usd, embedding_calls...).
+    """
+
+    id = models.BigAutoField(auto_created=True, primary_key=True, serialize=True, verbose_name='ID')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    message = models.ForeignKey(Message, related_name='messageTraces', on_delete=models.CASCADE, null=True)
+    wall_sec = models.FloatField()
+    db_queries = models.IntegerField(default=0)
+    db_time_sec = models.FloatField(default=0)
+    llm_calls = models.IntegerField(default=0)
+    prompt_tokens = models.IntegerField(default=0)
+    completion_tokens = models.IntegerField(default=0)
+    cost_usd = models.FloatField(null=True, blank=True)
+    embedding_calls = models.IntegerField(default=0)
+    nodes = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"{self.id} - message {self.message_id} ({round(self.wall_sec, 3)}s)"
+
+
+class AnswerCacheEntry(models.Model):
+    """
+    Semantic answer cache (src/chats/answer_cache.py): a LEGAL_ADVICE completion reused for questions with a close
+    enough query embedding, the same language and the same context key.
+    """
+
+    class Meta:
+        db_table = 'chats_answer_cache_entry'
+        indexes = [
+            models.Index(fields=['context_key', 'language']),
+        ]
+
+    id = models.BigAutoField(auto_created=True, primary_key=True, serialize=True, verbose_name='ID')
+
+    # sha256 of RAG source, source document ids and the LEGAL_ADVICE template the answer was generated with
+    context_key = models.CharField(max_length=64)
+    rag_source = models.CharField(max_length=16)
+    document_ids = models.JSONField(default=list)
+    language = models.CharField(max_length=16)
+
+    query = models.TextField()
+    query_embedding = VectorField()
+    answer = models.TextField()
+
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.id} - {self.query[:60]}"
 
 
 @receiver(pre_save, sender=MessageFile)
@@ -147,3 +213,17 @@ def modify_file_name(sender, instance, **kwargs):
         instance.size = instance.file.size
         instance.extension = os.path.splitext(instance.file.name)[-1].lower().lstrip('.')
         instance.file.name = f"{uuid.uuid4().hex}.{instance.extension}"
+
+
+@receiver([post_save, post_delete], sender='reference_documents.ReferenceDocument')
+def invalidate_reference_document_answers(sender, instance, **kwargs):
+    from src.chats.answer_cache import invalidate
+
+    invalidate('old', instance.id)
+
+
+@receiver([post_save, post_delete], sender='reference_documents.RagSourceDocument')
+def invalidate_rag_source_document_answers(sender, instance, **kwargs):
+    from src.chats.answer_cache import invalidate
+
+    invalidate('new', instance.id)
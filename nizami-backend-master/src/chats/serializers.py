@@ -2,7 +2,8 @@ from django.http import Http404
 from rest_framework import serializers
 import logging
 
-from src.chats.flow import build_graph
+from src.chats.flow import chat_graph
+from src.chats.step_logs import collect_step_logs
 from src.chats.models import Chat, Message, MessageFile
 from src.chats.utils import truncate_to_complete_words
 
@@ -33,6 +34,24 @@ def validate_message_file(*, uploaded_file):
 
     if extension not in ALLOWED_MESSAGE_FILE_EXTENSIONS and content_type not in ALLOWED_MESSAGE_FILE_CONTENT_TYPES:
         raise serializers.ValidationError("Unsupported file type.")
+
+
+def attach_message_files(*, user, message_uuid, message_file_ids):
+    """
+    Link previously uploaded MessageFiles to the user message once the flow has created it.
+    """
+    if not message_file_ids:
+        return
+
+    user_message = Message.objects.filter(uuid=message_uuid).first()
+    if user_message is not None:
+        MessageFile.objects.filter(
+            id__in=message_file_ids,
+            user=user,
+            message__isnull=True,
+        ).update(message=user_message)
+
+
 class CreateChatSerializer(serializers.Serializer):
     first_text_message = serializers.CharField(required=True, write_only=True)
 
@@ -144,23 +163,17 @@ class CreateMessageSerializer(serializers.Serializer):
             decrement_credits_post_message(user=user)
             return system_message
 
-        graph = build_graph()
-        output = graph.invoke({
-            'input': validated_data['text'],
-            'uuid': validated_data['uuid'],
-            'chat_id': chat_id,
-        })
+        graph = chat_graph.get()
+        with collect_step_logs():
+            output = graph.invoke({
+                'input': validated_data['text'],
+                'uuid': validated_data['uuid'],
+                'chat_id': chat_id,
+            })
         is_credits_decremented = decrement_credits_post_message(user=user)
         logger.info(f"Are credits decremented post message : {is_credits_decremented}")
         system_message = output['system_message']
 
-        if message_file_ids:
-            user_message = Message.objects.filter(uuid=validated_data['uuid']).first()
-            if user_message is not None:
-                MessageFile.objects.filter(
-                    id__in=message_file_ids,
-                    user=user,
-                    message__isnull=True,
-                ).update(message=user_message)
+        attach_message_files(user=user, message_uuid=validated_data['uuid'], message_file_ids=message_file_ids)
 
         return system_message
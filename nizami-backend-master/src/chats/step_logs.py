@@ -0,0 +1,266 @@
+"""
+Deferred MessageStepLog writes.
+
+Graph nodes call record_step(...) / arecord_step(...) with step_name, message, time_sec, input and output.
+Inside collect_step_logs() / acollect_step_logs(), wrapped around every chat graph run, the rows are buffered in
+memory and written together when the run ends instead of one INSERT per node inside the request
+(STEP_LOG_WRITE_MODE):
+
+  'async' (default): the batch is handed to a background writer thread that bulk-inserts it through the `logs`
+      database alias. The queue holds STEP_LOG_QUEUE_SIZE batches; when it is full (database slow or down) new
+      batches are dropped and counted, so step logging never slows down or fails a request.
+  'batch': one bulk_create on the default database when the run ends.
+  'immediate': one INSERT per step, as before.
+
+Outside a collector (attachment flow, management commands) record_step writes immediately.
+
+The collector also receives the NodeStats of every instrumented graph node (src/common/instrumentation.py) and
+adds one MessageTrace row for the run to the same batch.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from src.chats.log_payloads import pack
+from src.chats.models import MessageStepLog, MessageTrace
+from src.common.instrumentation import NodeStats, node_stats_sink
+
+logger = logging.getLogger(__name__)
+
+_collector = ContextVar('step_log_collector', default=None)
+
+
+def _write_mode() -> str:
+    from src.settings import STEP_LOG_WRITE_MODE
+    return STEP_LOG_WRITE_MODE
+
+
+class StepLogCollector:
+    """Step log rows of one graph run; nodes running in parallel threads append to the same collector."""
+
+    def __init__(self):
+        self._rows = []
+        self._nodes = []
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+
+    def add(self, row: MessageStepLog):
+        with self._lock:
+            self._rows.append(row)
+
+    def add_node(self, stats: NodeStats):
+        with self._lock:
+            self._nodes.append(stats)
+
+    def trace(self):
+        """MessageTrace of the node runs collected so far, or None before the message exists."""
+        with self._lock:
+            nodes, self._nodes = self._nodes, []
+        message_id = next((stats.message_id for stats in nodes if stats.message_id is not None), None)
+        if message_id is None:
+            return None
+        costs = [stats.cost_usd for stats in nodes if stats.cost_usd is not None]
+        return MessageTrace(
+            message_id=message_id,
+            wall_sec=time.perf_counter() - self.started_at,
+            db_queries=sum(stats.db_queries for stats in nodes),
+            db_time_sec=sum(stats.db_time_sec for stats in nodes),
+            llm_calls=sum(stats.llm_calls for stats in nodes),
+            prompt_tokens=sum(stats.prompt_tokens for stats in nodes),
+            completion_tokens=sum(stats.completion_tokens for stats in nodes),
+            cost_usd=sum(costs) if costs else None,
+            embedding_calls=sum(stats.embedding_calls for stats in nodes),
+            nodes=[stats.as_dict(origin=self.started_at) for stats in nodes],
+        )
+
+    def drain(self) -> list:
+        trace = self.trace()
+        with self._lock:
+            rows, self._rows = self._rows, []
+        return rows + [trace] if trace is not None else rows
+
+
+def _fields(kwargs) -> dict:
+    # Convert now: nodes keep mutating the dicts they logged, e.g. rag_response
+    kwargs = dict(kwargs)
+    for field in ('input', 'output'):
+        if field in kwargs:
+            kwargs[f'{field}_data'], kwargs[f'{field}_zstd'] = pack(kwargs.pop(field))
+    return kwargs
+
+
+def record_step(**kwargs):
+    """
+    Log a step. input / output are arbitrary values, stored as compact JSON (src/chats/log_payloads.py).
+    """
+    collector = _collector.get()
+    if collector is None or _write_mode() == 'immediate':
+        return MessageStepLog.objects.create(**_fields(kwargs))
+    collector.add(MessageStepLog(**_fields(kwargs)))
+
+
+async def arecord_step(**kwargs):
+    collector = _collector.get()
+    if collector is None or _write_mode() == 'immediate':
+        return await MessageStepLog.objects.acreate(**_fields(kwargs))
+    collector.add(MessageStepLog(**_fields(kwargs)))
+
+
+def flush(rows):
+    if not rows:
+        return
+    if _write_mode() == 'async':
+        step_log_writer.submit(rows)
+        return
+    for model, model_rows in _by_model(rows):
+        try:
+            model.objects.bulk_create(model_rows)
+        except Exception as e:
+            logger.error(f"Error writing {len(model_rows)} {model.__name__} rows: {str(e)}", exc_info=True)
+
+
+def _by_model(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault(type(row), []).append(row)
+    return groups.items()
+
+
+def _reset(token):
+    try:
+        _collector.reset(token)
+    except ValueError:
+        # Async generators may be resumed from another context than the one that set the collector
+        _collector.set(None)
+
+
+@contextmanager
+def collect_step_logs():
+    collector = StepLogCollector()
+    token = _collector.set(collector)
+    try:
+        with node_stats_sink(collector.add_node):
+            yield collector
+    finally:
+        _reset(token)
+        flush(collector.drain())
+
+
+@asynccontextmanager
+async def acollect_step_logs():
+    collector = StepLogCollector()
+    token = _collector.set(collector)
+    try:
+        with node_stats_sink(collector.add_node):
+            yield collector
+    finally:
+        _reset(token)
+        rows = collector.drain()
+        if _write_mode() == 'async':
+            flush(rows)
+        else:
+            await sync_to_async(flush)(rows)
+
+
+class StepLogWriter:
+    """
+    Background thread that bulk-inserts queued step log batches through the `logs` database alias.
+    """
+
+    MAX_ROWS_PER_INSERT = 500
+
+    def __init__(self, max_batches=None, database='logs'):
+        self._max_batches = max_batches
+        self.database = database
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, rows):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            self.dropped += len(rows)
+            logger.warning('Step log queue full, dropped %s rows (%s dropped so far)', len(rows), self.dropped)
+
+    def stats(self) -> dict:
+        return {
+            'queued_batches': self._queue.qsize() if self._queue is not None else 0,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def stop(self, timeout=5.0):
+        """Write what is queued (up to timeout seconds) and stop the thread."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def _ensure_started(self):
+        # A forked worker (uvicorn, django-q) inherits the object but not the thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._max_batches is None:
+                from src.settings import STEP_LOG_QUEUE_SIZE
+                self._max_batches = STEP_LOG_QUEUE_SIZE
+            self._queue = queue.Queue(maxsize=self._max_batches)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='step-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            rows = self._queue.get()
+            if rows is None:
+                return
+            stop = False
+            # Coalesce batches that piled up meanwhile into one INSERT
+            while len(rows) < self.MAX_ROWS_PER_INSERT:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                rows = rows + more
+            self._write(rows)
+            if stop:
+                return
+
+    def _write(self, rows):
+        close_old_connections()
+        for model, model_rows in _by_model(rows):
+            try:
+                model.objects.using(self.database).bulk_create(model_rows, batch_size=self.MAX_ROWS_PER_INSERT)
+                self.written += len(model_rows)
+            except Exception as e:
+                self.failed += len(model_rows)
+                logger.error(f"Error writing {len(model_rows)} {model.__name__} rows: {str(e)}", exc_info=True)
+
+
+step_log_writer = StepLogWriter()
+atexit.register(step_log_writer.stop)
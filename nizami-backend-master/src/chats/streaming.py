@@ -0,0 +1,274 @@
+"""
+Server-Sent Events streaming for chat messages.
+
+Graph nodes push progress through LangGraph's custom stream (`emit_event`); the SSE view drains
+`graph.stream(..., stream_mode=['custom', 'values'])` and forwards those events to the client,
+then persists/returns the final AI message once the graph ends.
+"""
+
+import asyncio
+import json
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from langgraph.config import get_stream_writer
+
+logger = logging.getLogger(__name__)
+
+_ANSWER_KEY_RE = re.compile(r'"answer"\s*:\s*"')
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class AnswerTokenExtractor:
+    """
+    Incrementally pulls the "answer" string out of the streamed LEGAL_ADVICE JSON completion.
+
+    The model returns {"answer": "...", "is_answer": ..., "is_context_used": ...}; only the decoded
+    answer text is user-facing. Completions that are not JSON are passed through unchanged
+    (same fallback as decode_response_json).
+    """
+
+    def __init__(self):
+        self._mode = None  # None until the first non-blank char, then 'json' or 'plain'
+        self._buffer = ''
+        self._in_answer = False
+        self._done = False
+        self._escape = None
+
+    def feed(self, text: str) -> str:
+        if self._done or not text:
+            return ''
+
+        if self._mode is None:
+            self._buffer += text
+            stripped = self._buffer.lstrip()
+            if not stripped:
+                return ''
+            self._mode = 'json' if stripped[0] in '{`' else 'plain'
+            text, self._buffer = self._buffer, ''
+
+        if self._mode == 'plain':
+            return text
+
+        if not self._in_answer:
+            self._buffer += text
+            match = _ANSWER_KEY_RE.search(self._buffer)
+            if not match:
+                return ''
+            text = self._buffer[match.end():]
+            self._buffer = ''
+            self._in_answer = True
+
+        return self._decode(text)
+
+    def _decode(self, text: str) -> str:
+        out = []
+        for char in text:
+            if self._escape is not None:
+                self._escape += char
+                decoded = self._consume_escape()
+                if decoded is not None:
+                    out.append(decoded)
+                continue
+            if char == '\\':
+                self._escape = ''
+                continue
+            if char == '"':
+                self._done = True
+                break
+            out.append(char)
+        return ''.join(out)
+
+    def _consume_escape(self):
+        escape = self._escape
+        if escape[0] != 'u':
+            self._escape = None
+            return _SIMPLE_ESCAPES.get(escape, escape)
+        if len(escape) < 5:
+            return None
+        try:
+            code = int(escape[1:5], 16)
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: wait for the trailing \uXXXX low surrogate
+                if len(escape) < 11:
+                    return None
+                low = int(escape[7:11], 16)
+                self._escape = None
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00))
+        except ValueError:
+            self._escape = None
+            return ''
+        self._escape = None
+        return chr(code)
+
+
+def emit_event(event: str, data: dict) -> None:
+    """Push an event to the graph's custom stream (no-op when the graph is run with invoke)."""
+    get_stream_writer()({'event': event, 'data': data})
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def iter_message_events(*, user, validated_data):
+    """
+    Run the chat flow for one message and yield SSE frames:
+    status/token events while the graph runs, then `message` (the stored AI message) and `done`.
+    """
+    from src.chats.flow import chat_graph
+    from src.chats.step_logs import collect_step_logs
+    from src.chats.serializers import CreateMessageSerializer, attach_message_files
+    from src.ledger.services import decrement_credits_post_message
+
+    chat_id = validated_data['chat_id']
+    message_uuid = validated_data['uuid']
+    attachment_file_ids = validated_data.get('attachment_file_ids') or []
+    intent = validated_data.get('intent') or None
+
+    yield format_sse('status', {'step': 'received'})
+
+    try:
+        if attachment_file_ids:
+            from src.chats.attachment_flow import run_attachment_message_flow
+
+            yield format_sse('status', {'step': 'processing_attachments'})
+            system_message = run_attachment_message_flow(
+                user=user,
+                chat_id=chat_id,
+                text=validated_data['text'],
+                message_uuid=message_uuid,
+                attachment_file_ids=[str(f) for f in attachment_file_ids],
+                intent=intent,
+            )
+        else:
+            output = {}
+            graph = chat_graph.get()
+            with collect_step_logs():
+                for mode, chunk in graph.stream({
+                    'input': validated_data['text'],
+                    'uuid': message_uuid,
+                    'chat_id': chat_id,
+                }, stream_mode=['custom', 'values']):
+                    if mode == 'custom':
+                        yield format_sse(chunk['event'], chunk['data'])
+                    else:
+                        output = chunk
+            system_message = output['system_message']
+            # Like CreateMessageSerializer: message files are only linked to answers of the chat graph
+            attach_message_files(
+                user=user,
+                message_uuid=message_uuid,
+                message_file_ids=validated_data.get('message_file_ids') or [],
+            )
+
+        decrement_credits_post_message(user=user)
+    except Exception as e:
+        logger.error(f"Error while streaming message {message_uuid}: {str(e)}", exc_info=True)
+        yield format_sse('error', {'detail': 'Could not generate an answer.'})
+        return
+
+    yield format_sse('message', CreateMessageSerializer(system_message).data)
+    yield format_sse('done', {})
+
+
+async def aiter_message_events(*, user, validated_data):
+    """
+    Async counterpart of iter_message_events (CHAT_ASYNC_PIPELINE): the chat graph is driven with astream
+    on the event loop, so one worker holds many in-flight answers without a thread per request.
+    """
+    from src.chats.async_flow import astream_graph, chat_graph_async
+    from src.chats.step_logs import acollect_step_logs
+    from src.chats.serializers import CreateMessageSerializer, attach_message_files
+    from src.ledger.services import decrement_credits_post_message
+
+    chat_id = validated_data['chat_id']
+    message_uuid = validated_data['uuid']
+    attachment_file_ids = validated_data.get('attachment_file_ids') or []
+    intent = validated_data.get('intent') or None
+
+    yield format_sse('status', {'step': 'received'})
+
+    try:
+        if attachment_file_ids:
+            from src.chats.attachment_flow import run_attachment_message_flow
+
+            yield format_sse('status', {'step': 'processing_attachments'})
+            system_message = await sync_to_async(run_attachment_message_flow)(
+                user=user,
+                chat_id=chat_id,
+                text=validated_data['text'],
+                message_uuid=message_uuid,
+                attachment_file_ids=[str(f) for f in attachment_file_ids],
+                intent=intent,
+            )
+        else:
+            output = {}
+            graph = chat_graph_async.get()
+            async with acollect_step_logs():
+                async for mode, chunk in astream_graph(graph, {
+                    'input': validated_data['text'],
+                    'uuid': message_uuid,
+                    'chat_id': chat_id,
+                }, stream_mode=['custom', 'values']):
+                    if mode == 'custom':
+                        yield format_sse(chunk['event'], chunk['data'])
+                    else:
+                        output = chunk
+            system_message = output['system_message']
+            await sync_to_async(attach_message_files)(
+                user=user,
+                message_uuid=message_uuid,
+                message_file_ids=validated_data.get('message_file_ids') or [],
+            )
+
+        await sync_to_async(decrement_credits_post_message)(user=user)
+        data = await sync_to_async(lambda: CreateMessageSerializer(system_message).data)()
+    except Exception as e:
+        logger.error(f"Error while streaming message {message_uuid}: {str(e)}", exc_info=True)
+        yield format_sse('error', {'detail': 'Could not generate an answer.'})
+        return
+
+    yield format_sse('message', data)
+    yield format_sse('done', {})
+
+
+async def aiter_in_thread(iterator_factory):
+    """
+    Drive a blocking iterator in a worker thread and re-yield its items on the event loop.
+
+    Django only streams async iterators under ASGI (sync ones are buffered into a list first), and the
+    graph must keep a single thread for its DB connection, so it cannot be advanced with sync_to_async.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    sentinel = object()
+
+    def run():
+        try:
+            for item in iterator_factory():
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            logger.error(f"Streaming worker failed: {str(e)}", exc_info=True)
+        finally:
+            connections.close_all()
+            loop.call_soon_threadsafe(queue.put_nowait, sentinel)
+
+    worker = loop.run_in_executor(None, run)
+    while True:
+        item = await queue.get()
+        if item is sentinel:
+            break
+        yield item
+    await worker
@@ -0,0 +1,72 @@
+"""
+Background tasks for chats: conversation summary maintenance.
+"""
+
+import logging
+
+from django.db.models import Q
+from django_q.tasks import async_task
+
+from src import settings
+from src.chats.models import Chat, Message
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MAX_ATTEMPTS = 3
+
+
+def enqueue_chat_summary(chat_id: int) -> None:
+    """
+    Schedule summarize_chat on the django-q cluster (inline when CHAT_SUMMARY_ASYNC is off).
+    Never raises: a missed refresh is caught up by the next turn's task.
+    """
+    try:
+        if settings.CHAT_SUMMARY_ASYNC:
+            async_task(summarize_chat, chat_id, task_name=f"chat-summary-{chat_id}")
+        else:
+            summarize_chat(chat_id)
+    except Exception as e:
+        logger.error("Could not schedule summary for chat %s: %s", chat_id, e, exc_info=True)
+
+
+def summarize_chat(chat_id: int) -> None:
+    """
+    Fold every message newer than chat.summary_last_message_id into the chat summary.
+
+    Idempotent: turns queued while a run is pending are summarized together by the first run and later
+    runs exit without an LLM call. No row lock is held during the LLM call; the result is only stored if
+    summary_last_message_id is still what was read (otherwise another run won and this one retries).
+    """
+    from src.chats.domain import update_conversation_summary
+
+    for _ in range(SUMMARY_MAX_ATTEMPTS):
+        chat = Chat.objects.filter(id=chat_id).values('summary', 'summary_last_message_id').first()
+        if chat is None:
+            return
+
+        last_message_id = chat['summary_last_message_id']
+        messages = Message.objects.filter(chat_id=chat_id).exclude(Q(text__isnull=True) | Q(text=''))
+        if last_message_id:
+            messages = messages.filter(id__gt=last_message_id)
+        new_messages = list(messages.order_by('created_at'))
+        if not new_messages:
+            logger.debug("No new messages to add to summary for chat %s", chat_id)
+            return
+
+        updated_summary = update_conversation_summary(chat['summary'] or '', new_messages)
+        new_last_message_id = max(message.id for message in new_messages)
+
+        stored = Chat.objects.filter(id=chat_id, summary_last_message_id=last_message_id).update(
+            summary=updated_summary,
+            summary_last_message_id=new_last_message_id,
+        )
+        if stored:
+            logger.info(
+                "Summary updated for chat %s with %s messages (last message ID: %s)",
+                chat_id, len(new_messages), new_last_message_id,
+            )
+            return
+
+        logger.info("Summary for chat %s advanced concurrently, retrying", chat_id)
+
+    logger.warning("Gave up updating summary for chat %s after %s attempts", chat_id, SUMMARY_MAX_ATTEMPTS)
@@ -0,0 +1,110 @@
+import itertools
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, SystemMessage
+
+from src.chats import answer_cache
+
+
+def make_state(**kwargs):
+    state = {
+        'message': SimpleNamespace(id=1, language='en'),
+        'query': 'What is the notice period in the labor law?',
+        'summary': '',
+        'history': [],
+        'unsummarized_messages': [],
+        'attached_docs_context': '',
+    }
+    state.update(kwargs)
+    return state
+
+
+def make_response():
+    return {
+        'source_documents': [
+            Document(page_content='a', metadata={'reference_document_id': 9}),
+            Document(page_content='b', metadata={'reference_document_id': '4'}),
+            Document(page_content='c', metadata={'reference_document_id': 9}),
+        ],
+        'prompt': [SystemMessage(content='IMPORTANT: You must respond ONLY in English. ...')],
+    }
+
+
+@mock.patch('src.settings.RAG_SOURCE', 'old')
+@mock.patch('src.settings.ANSWER_CACHE_ENABLED', True)
+@mock.patch.object(answer_cache, 'get_prompt_value_by_name', return_value='Answer from {context}')
+class AnswerCacheTest(SimpleTestCase):
+    def test_only_standalone_questions_are_cacheable(self, _template):
+        self.assertTrue(answer_cache.is_cacheable(make_state()))
+        self.assertFalse(answer_cache.is_cacheable(make_state(summary='Earlier we discussed leave')))
+        self.assertFalse(answer_cache.is_cacheable(make_state(attached_docs_context='contract.pdf: ...')))
+
+    def test_context_key_depends_on_document_set_and_template(self, _template):
+        rag_source, ids = answer_cache.source_document_ids(make_response()['source_documents'])
+
+        self.assertEqual(('old', [4, 9]), (rag_source, ids))
+        self.assertEqual(
+            answer_cache.context_key('old', [4, 9], 'prompt'),
+            answer_cache.context_key('old', [4, 9], 'prompt'),
+        )
+        self.assertNotEqual(
+            answer_cache.context_key('old', [4, 9], 'prompt'),
+            answer_cache.context_key('old', [4, 9], 'edited prompt'),
+        )
+        self.assertNotEqual(
+            answer_cache.context_key('old', [4, 9], 'prompt'),
+            answer_cache.context_key('old', [4], 'prompt'),
+        )
+
+    def test_context_key_ignores_the_retrieved_chunk_text(self, _template):
+        response = make_response()
+        other = make_response()
+        for doc in other['source_documents']:
+            doc.page_content = 'another chunk of the same document'
+        other['prompt'] = [SystemMessage(content='IMPORTANT: ... another chunk of the same document')]
+
+        self.assertEqual(answer_cache._context(response), answer_cache._context(other))
+
+    @mock.patch.object(answer_cache, 'trim')
+    @mock.patch.object(answer_cache, 'embed_query_cached', return_value=[0.1, 0.2])
+    @mock.patch.object(answer_cache, 'AnswerCacheEntry')
+    def test_trims_every_trim_every_stores_across_threads(self, _entry_model, _embed, trim, _template):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def store(_):
+            response = make_response()
+            response['response'] = AIMessage(content='answer')
+            answer_cache.store(make_state(), response)
+
+        with mock.patch.object(answer_cache, '_store_counter', itertools.count(1)), \
+                ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(store, range(answer_cache.TRIM_EVERY * 4)))
+
+        self.assertEqual(4, trim.call_count)
+
+    @mock.patch.object(answer_cache, 'record_step')
+    @mock.patch.object(answer_cache, 'embed_query_cached', return_value=[0.1, 0.2])
+    @mock.patch.object(answer_cache, 'AnswerCacheEntry')
+    def test_hit_returns_cached_completion(self, entry_model, _embed, record_step, _template):
+        entry = SimpleNamespace(id=5, answer='{"answer": "30 days"}', query='notice period?', distance=0.01)
+        queryset = entry_model.objects.filter.return_value
+        queryset.annotate.return_value.filter.return_value.order_by.return_value.only.return_value.first.return_value = entry
+        response = make_response()
+
+        cached = answer_cache.lookup(make_state(), response)
+
+        self.assertEqual(AIMessage(content='{"answer": "30 days"}'), cached)
+        self.assertEqual(5, response['answer_cache_entry_id'])
+        self.assertEqual('answer_cache_hit', record_step.call_args.kwargs['step_name'])
+
+    @mock.patch.object(answer_cache, 'AnswerCacheEntry')
+    def test_follow_up_questions_are_not_stored(self, entry_model, _template):
+        response = make_response()
+        response['response'] = AIMessage(content='answer')
+
+        answer_cache.store(make_state(history=[object()]), response)
+
+        entry_model.objects.create.assert_not_called()
@@ -0,0 +1,104 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from src.chats import async_flow, step_logs
+from src.chats.flow import Route, build_graph
+
+
+class AsyncNodesTest(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.object(step_logs.MessageStepLog.objects, 'acreate', new_callable=AsyncMock)
+        self.acreate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_router_awaits_structured_llm(self):
+        llm = MagicMock()
+        llm.with_structured_output.return_value.ainvoke = AsyncMock(return_value=Route(step='translation'))
+
+        with patch('src.chats.async_flow.create_llm', return_value=llm), \
+                patch('src.chats.async_flow.get_prompt_value_by_name', return_value='Route the input'):
+            output = asyncio.run(async_flow.arouter({'message': MagicMock(id=1), 'input': 'translate it'}))
+
+        self.assertEqual({'decision': 'translation'}, output)
+        self.assertEqual('router', self.acreate.call_args.kwargs['step_name'])
+
+    def test_translate_falls_back_to_empty_translation(self):
+        message = MagicMock(id=1, text='hello', language='en')
+
+        with patch('src.chats.async_flow.atranslate_question', AsyncMock(side_effect=RuntimeError('timeout'))):
+            output = asyncio.run(async_flow.atranslate_user_input({'message': message}))
+
+        self.assertEqual({'input_translation': ''}, output)
+        self.assertTrue(self.acreate.call_args.kwargs['output_data']['error'])
+
+    def test_relevance_without_history_skips_llm(self):
+        with patch('src.chats.async_flow.create_llm') as create_llm:
+            output = asyncio.run(async_flow.acheck_input_relevance({'message': MagicMock(id=1), 'input': 'hi'}))
+
+        self.assertEqual({'is_related_to_history': False}, output)
+        create_llm.assert_not_called()
+
+
+class AsyncGraphTest(SimpleTestCase):
+    def test_async_graph_uses_async_nodes(self):
+        graph = build_graph(parallel=True, use_async=True)
+
+        # Nodes are wrapped by the instrumentation layer
+        self.assertIs(async_flow.arouter, graph.builder.nodes['router'].runnable.afunc.__wrapped__)
+        self.assertIs(
+            async_flow.aanswer_legal_question,
+            graph.builder.nodes['answer_legal_question'].runnable.afunc.__wrapped__,
+        )
+
+    def test_sync_nodes_run_through_sync_node(self):
+        from src.chats.flow import has_answer
+
+        graph = build_graph(parallel=True, use_async=True)
+
+        node = graph.builder.nodes['has_answer'].runnable.afunc
+        self.assertIsNotNone(node)
+        # instrument_node(sync_node(has_answer))
+        self.assertIs(has_answer, node.__wrapped__.__wrapped__)
+
+
+class SyncNodeConnectionsTest(SimpleTestCase):
+    def test_astream_leaves_no_connection_open_on_node_thread(self):
+        import threading
+
+        from django.db import connections
+        from langgraph.constants import END, START
+        from langgraph.graph import StateGraph
+        from typing_extensions import TypedDict
+
+        class S(TypedDict, total=False):
+            done: bool
+
+        opened = []
+
+        def db_node(state):
+            # What an ORM query leaves behind on this thread
+            wrapper = connections['default']
+            wrapper.connection = MagicMock()
+            wrapper.autocommit = True
+            # The sqlite test backend never closes in-memory databases; Postgres ones are closed
+            wrapper.is_in_memory_db = lambda: False
+            opened.append((threading.get_ident(), wrapper))
+            return {'done': True}
+
+        builder = StateGraph(S)
+        builder.add_node('db_node', async_flow.sync_node(db_node))
+        builder.add_edge(START, 'db_node')
+        builder.add_edge('db_node', END)
+        graph = builder.compile()
+
+        async def run():
+            return [chunk async for chunk in async_flow.astream_graph(graph, {}, stream_mode='values')]
+
+        chunks = asyncio.run(run())
+
+        self.assertEqual({'done': True}, chunks[-1])
+        thread_id, wrapper = opened[0]
+        self.assertNotEqual(threading.get_ident(), thread_id)
+        self.assertIsNone(wrapper.connection)
@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase
+
+from src.chats.graph_registry import CompiledGraphRegistry, graph_registry_metrics
+
+
+class CompiledGraphRegistryTest(SimpleTestCase):
+    def test_compiles_once_and_reuses(self):
+        builds = []
+        registry = CompiledGraphRegistry(lambda: builds.append(1) or object(), name='test')
+
+        first = registry.get()
+        second = registry.get()
+
+        self.assertIs(first, second)
+        self.assertEqual(1, len(builds))
+        self.assertEqual(2, registry.stats()['hits'])
+
+    def test_counts_every_hit_across_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        registry = CompiledGraphRegistry(object, name='test')
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            graphs = list(executor.map(lambda _: registry.get(), range(400)))
+
+        self.assertEqual(1, len({id(graph) for graph in graphs}))
+        self.assertEqual(1, registry.version)
+        self.assertEqual(400, registry.stats()['hits'])
+
+    def test_reload_swaps_the_graph(self):
+        registry = CompiledGraphRegistry(object, name='test')
+        old = registry.get()
+
+        new = registry.reload()
+
+        self.assertIsNot(old, new)
+        self.assertIs(new, registry.get())
+        self.assertEqual(2, registry.version)
+
+    def test_metrics_source(self):
+        registry = CompiledGraphRegistry(object, name='metrics-test')
+        registry.get()
+        registry.get()
+
+        metrics = {name: dict((labels['graph'], value) for labels, value in samples)
+                   for name, kind, help_text, samples in graph_registry_metrics()}
+
+        self.assertEqual(1, metrics['nizami_graph_version']['metrics-test'])
+        self.assertEqual(2, metrics['nizami_graph_requests_total']['metrics-test'])
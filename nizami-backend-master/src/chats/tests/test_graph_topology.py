@@ -0,0 +1,193 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.db import connections
+from django.test import SimpleTestCase
+
+from src.chats import flow
+from src.chats.flow import build_graph
+
+STUBBED_NODES = [
+    'first_or_create_message', 'validate_input_quality', 'has_answer', 'retrieve_history',
+    'check_input_relevance', 'router', 'translate_user_input', 'rephrase_user_input', 'prefetch_retrieval',
+    'answer_legal_question', 'extract_used_languages', 'decode_response_json', 'calculate_disclaimer',
+    'store_system_message', 'translate_previous_message', 'store_translation_message', 'understand_query',
+]
+
+
+class ChatGraphTopologyTest(SimpleTestCase):
+    def run_graph(self, parallel, decision='legal_question', fused=False):
+        calls = []
+        lock = threading.Lock()
+        outputs = {
+            'validate_input_quality': {'is_gibberish': False},
+            'has_answer': {'decision': 'no'},
+            'router': {'decision': decision},
+            'understand_query': {'decision': decision},
+        }
+
+        def stub(name):
+            def node(state):
+                with lock:
+                    calls.append(name)
+                return dict(outputs.get(name, {}))
+            return node
+
+        graph = build_graph(parallel=parallel, fused=fused, nodes={name: stub(name) for name in STUBBED_NODES})
+        graph.invoke({'input': 'question', 'uuid': 'uuid', 'chat_id': 1})
+        return calls
+
+    def test_parallel_runs_classifiers_before_history_dependent_steps(self):
+        calls = self.run_graph(parallel=True)
+
+        self.assertEqual(1, calls.count('answer_legal_question'))
+        self.assertEqual('store_system_message', calls[-1])
+        first_wave = set(calls[3:7])
+        self.assertEqual({'retrieve_history', 'router', 'translate_user_input', 'prefetch_retrieval'}, first_wave)
+        self.assertLess(calls.index('rephrase_user_input'), calls.index('answer_legal_question'))
+        self.assertLess(calls.index('check_input_relevance'), calls.index('answer_legal_question'))
+
+    def test_parallel_translation_route_skips_answer(self):
+        calls = self.run_graph(parallel=True, decision='translation')
+
+        self.assertNotIn('answer_legal_question', calls)
+        self.assertEqual('store_translation_message', calls[-1])
+
+    def test_parallel_without_prefetch(self):
+        with patch('src.settings.CHAT_GRAPH_PREFETCH_RETRIEVAL', False):
+            calls = self.run_graph(parallel=True)
+            fused_calls = self.run_graph(parallel=True, fused=True)
+
+        self.assertNotIn('prefetch_retrieval', calls + fused_calls)
+        self.assertEqual(1, calls.count('answer_legal_question'))
+        self.assertEqual(1, fused_calls.count('answer_legal_question'))
+
+    def test_sequential_graph_is_unchanged(self):
+        calls = self.run_graph(parallel=False)
+
+        self.assertNotIn('prefetch_retrieval', calls)
+        self.assertLess(calls.index('check_input_relevance'), calls.index('router'))
+        self.assertLess(calls.index('router'), calls.index('rephrase_user_input'))
+
+    def test_fused_replaces_the_separate_classifiers(self):
+        calls = self.run_graph(parallel=True, fused=True)
+
+        for name in ('router', 'check_input_relevance', 'rephrase_user_input', 'translate_user_input'):
+            self.assertNotIn(name, calls)
+        self.assertLess(calls.index('retrieve_history'), calls.index('understand_query'))
+        self.assertLess(calls.index('prefetch_retrieval'), calls.index('answer_legal_question'))
+        self.assertEqual(1, calls.count('answer_legal_question'))
+
+    def test_fused_translation_route(self):
+        calls = self.run_graph(parallel=False, fused=True, decision='translation')
+
+        self.assertNotIn('answer_legal_question', calls)
+        self.assertEqual('store_translation_message', calls[-1])
+
+
+class PoolThreadConnectionsTest(SimpleTestCase):
+    def open_connection(self, alias='default'):
+        # What an ORM query leaves behind on this thread
+        wrapper = connections[alias]
+        wrapper.connection = MagicMock()
+        wrapper.autocommit = True
+        # The sqlite test backend never closes in-memory databases; Postgres ones are closed
+        wrapper.is_in_memory_db = lambda: False
+        return wrapper
+
+    def test_connections_opened_on_pool_threads_are_closed(self):
+        opened = []
+        outputs = {
+            'validate_input_quality': {'is_gibberish': False},
+            'has_answer': {'decision': 'no'},
+            'router': {'decision': 'legal_question'},
+        }
+
+        def stub(name):
+            def node(state):
+                if name in ('translate_user_input', 'prefetch_retrieval'):
+                    opened.append((threading.get_ident(), self.open_connection()))
+                return dict(outputs.get(name, {}))
+            return node
+
+        graph = build_graph(parallel=True, nodes={name: stub(name) for name in STUBBED_NODES})
+        graph.invoke({'input': 'question', 'uuid': 'uuid', 'chat_id': 1})
+
+        self.assertEqual(2, len(opened))
+        for thread_id, wrapper in opened:
+            self.assertNotEqual(threading.get_ident(), thread_id)
+            self.assertIsNone(wrapper.connection)
+
+    def test_connection_the_thread_already_had_is_kept(self):
+        kept = []
+
+        def run():
+            wrapper = self.open_connection()
+            flow.close_new_connections(lambda state: {})({})
+            kept.append(wrapper.connection)
+            wrapper.connection = None
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+
+        self.assertIsNotNone(kept[0])
+
+
+class UnderstandQueryTest(SimpleTestCase):
+    def run_node(self, state, result):
+        llm = MagicMock()
+        llm.with_structured_output.return_value.invoke.return_value = result
+        with patch('src.chats.flow.create_llm', return_value=llm), \
+                patch('src.chats.flow.get_prompt_value_by_name', return_value='Route the input'), \
+                patch('src.chats.step_logs.MessageStepLog.objects.create'):
+            return flow.understand_query(state), llm
+
+    def make_result(self, **kwargs):
+        values = {
+            'step': 'legal_question',
+            'is_related_to_history': True,
+            'rephrased_query': 'What is the notice period for employment contracts?',
+            'translated_query': 'ما هي مدة الإشعار؟',
+            'language': 'en',
+        }
+        values.update(kwargs)
+        return flow.QueryUnderstanding(**values)
+
+    def test_uses_rephrased_query_with_history(self):
+        message = MagicMock(id=1, text='more details?', used_query='more details?')
+        state = {'message': message, 'input': 'more details?', 'summary': 'Employment contracts', 'history': []}
+
+        output, _ = self.run_node(state, self.make_result())
+
+        self.assertEqual('legal_question', output['decision'])
+        self.assertTrue(output['is_related_to_history'])
+        self.assertEqual('What is the notice period for employment contracts?', output['query'])
+        self.assertEqual('ما هي مدة الإشعار؟', output['input_translation'])
+        message.save.assert_called_once()
+
+    def test_keeps_raw_input_without_history(self):
+        message = MagicMock(id=1, text='What is a contract?', used_query='What is a contract?')
+        state = {'message': message, 'input': 'What is a contract?', 'history': []}
+
+        output, _ = self.run_node(state, self.make_result(rephrased_query='Something else'))
+
+        self.assertFalse(output['is_related_to_history'])
+        self.assertEqual('What is a contract?', output['query'])
+        message.save.assert_not_called()
+
+    def test_falls_back_to_legal_question_on_error(self):
+        message = MagicMock(id=1, text='hi', used_query='hi')
+        llm = MagicMock()
+        llm.with_structured_output.return_value.invoke.side_effect = RuntimeError('timeout')
+        with patch('src.chats.flow.create_llm', return_value=llm), \
+                patch('src.chats.flow.get_prompt_value_by_name', return_value='Route the input'), \
+                patch('src.chats.step_logs.MessageStepLog.objects.create'):
+            output = flow.understand_query({'message': message, 'input': 'hi'})
+
+        self.assertEqual({
+            'decision': 'legal_question',
+            'is_related_to_history': False,
+            'query': 'hi',
+            'input_translation': '',
+        }, output)
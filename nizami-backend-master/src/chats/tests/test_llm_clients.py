@@ -0,0 +1,38 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from src import settings
+from src.chats.utils import close_llm_clients, create_llm, get_llm_http_client
+
+
+class LLMClientRegistryTest(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.object(settings, 'OPENAI_API_KEY', 'sk-test')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_llm_clients)
+
+    def test_reuses_client_per_model_and_params(self):
+        first = create_llm('gpt-4o-mini', temperature=0)
+        second = create_llm('gpt-4o-mini', temperature=0)
+        other = create_llm('gpt-4o-mini', temperature=0.1)
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+    def test_clients_share_one_connection_pool(self):
+        pool = get_llm_http_client()
+
+        self.assertIs(pool, create_llm('gpt-4o').http_client)
+        self.assertIs(pool, create_llm('gpt-5-nano', reasoning_effort='low').http_client)
+
+    def test_close_releases_pool(self):
+        pool = get_llm_http_client()
+        llm = create_llm('gpt-4o')
+
+        close_llm_clients()
+
+        self.assertTrue(pool.is_closed)
+        self.assertIsNot(llm, create_llm('gpt-4o'))
+        self.assertFalse(get_llm_http_client().is_closed)
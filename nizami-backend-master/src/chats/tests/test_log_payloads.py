@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from src.chats.log_payloads import pack, parse_legacy, to_log_payload, unpack
+from src.chats.models import MessageStepLog
+
+
+def rag_response():
+    return {
+        'input': 'ما هي مدة الإشعار؟',
+        'source_documents': [
+            Document(page_content='Article 75 ...' * 100, metadata={
+                'id': 'c1', 'reference_document_id': 7, 'title': 'Labor Law', 'similarity': 0.82,
+            }),
+        ],
+        'context': 'Article 75 ...' * 100,
+        'prompt': [SystemMessage(content='Answer from the context ' * 50), HumanMessage(content='q')],
+        'response': AIMessage(content='Sixty days.'),
+    }
+
+
+class ToLogPayloadTest(SimpleTestCase):
+    def test_rag_response_keeps_references_not_text(self):
+        payload = to_log_payload(rag_response())
+
+        self.assertEqual(
+            [{'id': 'c1', 'reference_document_id': 7, 'similarity': 0.82}],
+            payload['source_documents'],
+        )
+        self.assertEqual({'chars': 1400}, payload['context'])
+        self.assertEqual({'type': 'system', 'chars': 1200}, payload['prompt'][0])
+        self.assertEqual({'type': 'ai', 'content': 'Sixty days.'}, payload['response'])
+
+    def test_sets_and_objects(self):
+        self.assertEqual({'languages': ['ar', 'en'], 'other': 'x'}, to_log_payload({
+            'languages': {'en', 'ar'},
+            'other': type('Obj', (), {'__str__': lambda self: 'x'})(),
+        }))
+
+
+class PackTest(SimpleTestCase):
+    @mock.patch('src.settings.LOG_PAYLOAD_COMPRESS_BYTES', 100)
+    def test_large_payloads_are_compressed(self):
+        small = pack({'decision': 'x'})
+        large = pack({'text': 'y' * 1000})
+
+        self.assertEqual(({'decision': 'x'}, None), small)
+        self.assertIsNone(large[0])
+        self.assertLess(len(large[1]), 100)
+        self.assertEqual({'text': 'y' * 1000}, unpack(*large))
+
+    def test_step_log_reads_new_and_legacy_rows(self):
+        self.assertEqual({'a': 1}, MessageStepLog(input_data={'a': 1}).input_json())
+        self.assertEqual({'b': 2}, MessageStepLog(output="{'b': 2}").output_json())
+        self.assertIsNone(MessageStepLog().output_json())
+
+
+class ParseLegacyTest(SimpleTestCase):
+    def test_reprs_are_rebuilt_without_eval(self):
+        text = str({'rag_response': rag_response(), 'at': __import__('datetime').date(2025, 1, 2)})
+
+        payload = parse_legacy(text)
+
+        response = payload['rag_response']
+        self.assertEqual('c1', response['source_documents'][0]['id'])
+        self.assertEqual({'type': 'ai', 'content': 'Sixty days.'}, response['response'])
+        self.assertEqual('system', response['prompt'][0]['type'])
+        self.assertEqual('2025-01-02', payload['at'])
+
+    def test_calls_are_not_executed(self):
+        payload = parse_legacy("{'x': __import__('os').system('false')}")
+
+        self.assertEqual('system', payload['x']['type'].rsplit('.', 1)[-1])
+
+    def test_unparseable_text_is_shortened(self):
+        payload = parse_legacy('{' + 'x' * 5000)
+
+        self.assertEqual(5001, payload['chars'])
+        self.assertEqual(2000, len(payload['unparsed']))
@@ -0,0 +1,105 @@
+import asyncio
+import contextvars
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from src.chats import step_logs
+from src.chats.step_logs import StepLogWriter, acollect_step_logs, arecord_step, collect_step_logs, record_step
+from src.common.instrumentation import instrument_node
+
+
+class StepLogCollectorTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(step_logs.MessageStepLog.objects, 'create')
+        self.create = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(step_logs.MessageStepLog.objects, 'bulk_create')
+        self.bulk_create = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('src.settings.STEP_LOG_WRITE_MODE', 'batch')
+    def test_buffers_steps_and_writes_once(self):
+        with collect_step_logs():
+            record_step(step_name='router', message_id=1, time_sec=0.5, input=None, output={'decision': 'x'})
+            # LangGraph runs parallel nodes in threads with a copy of the caller's context
+            threads = [
+                threading.Thread(target=contextvars.copy_context().run, args=(record_step,), kwargs={
+                    'step_name': f'step{i}', 'message_id': 1, 'time_sec': 0,
+                })
+                for i in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.bulk_create.assert_not_called()
+
+        self.create.assert_not_called()
+        rows = self.bulk_create.call_args[0][0]
+        self.assertEqual(4, len(rows))
+        self.assertEqual({'decision': 'x'}, rows[0].output_data)
+
+    @mock.patch('src.settings.STEP_LOG_WRITE_MODE', 'batch')
+    def test_logged_dicts_are_captured_when_recorded(self):
+        output = {'rag_response': {'input': 'q'}}
+        with collect_step_logs():
+            record_step(step_name='answer_legal_question', message_id=1, time_sec=1, output=output)
+            output['rag_response']['response'] = 'added later'
+
+        self.assertEqual({'rag_response': {'input': 'q'}}, self.bulk_create.call_args[0][0][0].output_data)
+
+    @mock.patch('src.settings.STEP_LOG_WRITE_MODE', 'batch')
+    def test_instrumented_nodes_add_a_trace(self):
+        first = instrument_node('first_or_create_message', lambda state: {'message': mock.Mock(id=7)})
+        second = instrument_node('router', lambda state: {'decision': 'x'})
+
+        with mock.patch.object(step_logs.MessageTrace.objects, 'bulk_create') as bulk_create:
+            with collect_step_logs():
+                state = first({})
+                second(state)
+
+        trace = bulk_create.call_args[0][0][0]
+        self.assertEqual(7, trace.message_id)
+        self.assertEqual(['first_or_create_message', 'router'], [node['node'] for node in trace.nodes])
+
+    @mock.patch('src.settings.STEP_LOG_WRITE_MODE', 'batch')
+    def test_without_collector_writes_immediately(self):
+        record_step(step_name='router', message_id=1, time_sec=0.5)
+
+        self.create.assert_called_once()
+
+    @mock.patch('src.settings.STEP_LOG_WRITE_MODE', 'async')
+    def test_async_nodes_hand_batch_to_writer(self):
+        async def run():
+            async with acollect_step_logs():
+                await arecord_step(step_name='router', message_id=1, time_sec=0.5)
+                await asyncio.gather(*(arecord_step(step_name='translate', message_id=1, time_sec=0) for _ in range(2)))
+
+        with mock.patch.object(step_logs.step_log_writer, 'submit') as submit:
+            asyncio.run(run())
+
+        self.assertEqual(3, len(submit.call_args[0][0]))
+
+
+class StepLogWriterTest(SimpleTestCase):
+    def test_full_queue_drops_new_batches(self):
+        writer = StepLogWriter(max_batches=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_write(rows):
+            started.set()
+            release.wait(5)
+
+        with mock.patch.object(writer, '_write', side_effect=slow_write) as write:
+            writer.submit(['a'])
+            started.wait(5)
+            writer.submit(['b'])
+            writer.submit(['c', 'd'])
+            release.set()
+            writer.stop()
+
+        self.assertEqual(2, writer.dropped)
+        self.assertEqual([['a'], ['b']], [c[0][0] for c in write.call_args_list])
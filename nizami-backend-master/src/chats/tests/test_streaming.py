@@ -0,0 +1,76 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from src.chats.streaming import AnswerTokenExtractor, aiter_message_events, format_sse, iter_message_events
+
+
+class AnswerTokenExtractorTest(SimpleTestCase):
+    def feed_all(self, chunks):
+        extractor = AnswerTokenExtractor()
+        return ''.join(extractor.feed(chunk) for chunk in chunks)
+
+    def test_extracts_answer_from_split_json(self):
+        completion = json.dumps({
+            'answer': '<p>Notice period is "30" days.</p>\nArticle 75',
+            'is_answer': True,
+            'is_context_used': True,
+        })
+        chunks = [completion[i:i + 3] for i in range(0, len(completion), 3)]
+
+        self.assertEqual('<p>Notice period is "30" days.</p>\nArticle 75', self.feed_all(chunks))
+
+    def test_decodes_unicode_escapes_across_chunks(self):
+        completion = json.dumps({'answer': 'مدة الإشعار 😀'})
+        chunks = [completion[i:i + 2] for i in range(0, len(completion), 2)]
+
+        self.assertEqual('مدة الإشعار 😀', self.feed_all(chunks))
+
+    def test_fenced_json(self):
+        self.assertEqual('yes', self.feed_all(['```json\n{"is_answer": true, ', '"answer": "ye', 's"}\n```']))
+
+    def test_plain_text_passthrough(self):
+        self.assertEqual('Hello there', self.feed_all(['Hel', 'lo there']))
+
+
+class FormatSseTest(SimpleTestCase):
+    def test_frame(self):
+        self.assertEqual(
+            'event: token\ndata: {"text": "مرحبا"}\n\n',
+            format_sse('token', {'text': 'مرحبا'}),
+        )
+
+
+@mock.patch('src.ledger.services.decrement_credits_post_message')
+@mock.patch('src.chats.serializers.CreateMessageSerializer', return_value=mock.Mock(data={'id': 1}))
+@mock.patch('src.chats.serializers.attach_message_files')
+@mock.patch('src.chats.attachment_flow.run_attachment_message_flow')
+class AttachmentMessageEventsTest(SimpleTestCase):
+    validated_data = {
+        'chat_id': 1,
+        'uuid': 'uuid',
+        'text': 'Summarize the contract',
+        'attachment_file_ids': ['5b0c6f3e-6f0a-4f57-9d7c-0f3c8c6f0a11'],
+        'message_file_ids': [3],
+    }
+
+    def test_attachment_answer_does_not_link_message_files(self, run_flow, attach, _serializer, decrement):
+        frames = list(iter_message_events(user=mock.Mock(), validated_data=self.validated_data))
+
+        run_flow.assert_called_once()
+        attach.assert_not_called()
+        decrement.assert_called_once()
+        self.assertTrue(frames[-1].startswith('event: done'))
+
+    def test_async_attachment_answer_does_not_link_message_files(self, run_flow, attach, _serializer, decrement):
+        async def collect():
+            return [frame async for frame in aiter_message_events(user=mock.Mock(), validated_data=self.validated_data)]
+
+        frames = asyncio.run(collect())
+
+        run_flow.assert_called_once()
+        attach.assert_not_called()
+        decrement.assert_called_once()
+        self.assertTrue(frames[-1].startswith('event: done'))
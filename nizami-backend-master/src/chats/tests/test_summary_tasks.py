@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from src.chats import tasks
+
+
+class SummarizeChatTest(SimpleTestCase):
+    def setUp(self):
+        chat_patcher = patch.object(tasks, 'Chat')
+        message_patcher = patch.object(tasks, 'Message')
+        summary_patcher = patch('src.chats.domain.update_conversation_summary', return_value='new summary')
+        self.Chat = chat_patcher.start()
+        self.Message = message_patcher.start()
+        self.update_summary = summary_patcher.start()
+        for patcher in (chat_patcher, message_patcher, summary_patcher):
+            self.addCleanup(patcher.stop)
+
+    def set_chat(self, summary, last_message_id):
+        self.Chat.objects.filter.return_value.values.return_value.first.return_value = {
+            'summary': summary,
+            'summary_last_message_id': last_message_id,
+        }
+
+    def set_messages(self, ids):
+        queryset = self.Message.objects.filter.return_value.exclude.return_value
+        queryset.filter.return_value = queryset
+        queryset.order_by.return_value = [MagicMock(id=i) for i in ids]
+
+    def test_coalesces_pending_turns_into_one_call(self):
+        self.set_chat('old summary', 10)
+        self.set_messages([11, 12, 13, 14])
+        self.Chat.objects.filter.return_value.update.return_value = 1
+
+        tasks.summarize_chat(1)
+
+        self.update_summary.assert_called_once()
+        self.assertEqual(4, len(self.update_summary.call_args.args[1]))
+        self.Chat.objects.filter.assert_called_with(id=1, summary_last_message_id=10)
+        self.Chat.objects.filter.return_value.update.assert_called_once_with(
+            summary='new summary', summary_last_message_id=14,
+        )
+
+    def test_nothing_new_skips_llm(self):
+        self.set_chat('summary', 14)
+        self.set_messages([])
+
+        tasks.summarize_chat(1)
+
+        self.update_summary.assert_not_called()
+
+    def test_retries_when_another_run_won(self):
+        self.set_chat('summary', 10)
+        self.set_messages([11, 12])
+        self.Chat.objects.filter.return_value.update.side_effect = [0, 1]
+
+        tasks.summarize_chat(1)
+
+        self.assertEqual(2, self.update_summary.call_count)
+
+
+class EnqueueChatSummaryTest(SimpleTestCase):
+    def test_enqueues_on_cluster(self):
+        with patch.object(tasks.settings, 'CHAT_SUMMARY_ASYNC', True), \
+                patch.object(tasks, 'async_task') as async_task:
+            tasks.enqueue_chat_summary(5)
+
+        self.assertIs(tasks.summarize_chat, async_task.call_args.args[0])
+        self.assertEqual(5, async_task.call_args.args[1])
+
+    def test_broker_errors_do_not_fail_the_message(self):
+        with patch.object(tasks.settings, 'CHAT_SUMMARY_ASYNC', True), \
+                patch.object(tasks, 'async_task', side_effect=RuntimeError('db down')):
+            tasks.enqueue_chat_summary(5)
@@ -2,14 +2,15 @@ from django.urls import path
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from src.chats.flow import build_graph
+from src.chats.flow import chat_graph
 from src.chats.views import CreateChatViewSet, ListChatsViewSet, ListMessagesViewSet, CreateMessageViewSet, \
-    RetrieveChatViewSet, CreateMessageFileViewSet, DownloadFileViewSet, DeleteChatViewSet, UpdateChatViewSet
+    RetrieveChatViewSet, CreateMessageFileViewSet, DownloadFileViewSet, DeleteChatViewSet, UpdateChatViewSet, \
+    StreamMessageView
 
 
 @api_view(['GET'])
 def test(request):
-    graph = build_graph()
+    graph = chat_graph.get()
 
     print(graph.get_graph().draw_mermaid())
 
@@ -27,6 +28,7 @@ urlpatterns = [
 
     path('<int:chat_id>/messages', ListMessagesViewSet.as_view({'get': 'list'})),
     path('messages/create', CreateMessageViewSet.as_view({'post': 'create'})),
+    path('messages/stream', StreamMessageView.as_view()),
 
     path('messages/upload-file', CreateMessageFileViewSet.as_view({'post': 'create'})),
 
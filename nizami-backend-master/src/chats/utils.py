@@ -1,8 +1,10 @@
+import atexit
 import difflib
 import io
 import random
 import re
 import string
+import threading
 from datetime import datetime
 
 import aspose.words as aw
@@ -13,75 +15,78 @@ from src import settings
 from src.chats.classes import MostUsedFont
 
 
+# One ChatOpenAI per (model, params) and a single keep-alive httpx pool per process, so every flow step
+# reuses warm TLS connections instead of opening (and leaking) a new client per call.
+_http_client = None
+_llm_clients = {}
+_llm_clients_lock = threading.RLock()
+
+
+def get_llm_http_client() -> httpx.Client:
+    global _http_client
+    with _llm_clients_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(
+                # The OpenAI client passes request_timeout per request, so this only applies to raw calls
+                timeout=httpx.Timeout(30000, connect=10),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_SEC,
+                ),
+            )
+        return _http_client
+
+
+def close_llm_clients():
+    """
+    Drop cached LLM clients and close the shared connection pool (registered with atexit).
+    """
+    global _http_client
+    with _llm_clients_lock:
+        _llm_clients.clear()
+        if _http_client is not None and not _http_client.is_closed:
+            _http_client.close()
+        _http_client = None
+
+
+atexit.register(close_llm_clients)
+
+
+def create_llm(model_name, request_timeout=30000, **kwargs):
+    key = (model_name, request_timeout, tuple(sorted(kwargs.items())))
+    llm = _llm_clients.get(key)
+    if llm is None:
+        with _llm_clients_lock:
+            llm = _llm_clients.get(key)
+            if llm is None:
+                llm = ChatOpenAI(
+                    openai_api_key=settings.OPENAI_API_KEY,
+                    model_name=model_name,
+                    request_timeout=request_timeout,
+                    http_client=get_llm_http_client(),
+                    # Token usage of streamed completions, for the node instrumentation
+                    stream_usage=kwargs.pop('stream_usage', True),
+                    **kwargs,
+                )
+                _llm_clients[key] = llm
+    return llm
+
+
 def create_document_review_llm():
-    return ChatOpenAI(
-        openai_api_key=settings.OPENAI_API_KEY,
-        model_name='o3-mini',
-        request_timeout=30000,
-        http_client=httpx.Client(
-            timeout=httpx.Timeout(30000, connect=0000),
-            # headers={
-            #     'Connection': 'close',
-            # },
-        ),
-    )
+    return create_llm('o3-mini')
 
 
 def create_legal_advice_llm():
-    return ChatOpenAI(
-        openai_api_key=settings.OPENAI_API_KEY,
-        model_name='gpt-4o',
-        request_timeout=30000,
-        http_client=httpx.Client(
-            timeout=httpx.Timeout(30000, connect=0000),
-            # headers={
-            #     'Connection': 'close',
-            # },
-        )
-    )
-
-def create_llm(model_name, **kwargs):
-    return ChatOpenAI(
-        openai_api_key=settings.OPENAI_API_KEY,
-        model_name=model_name,
-        request_timeout=30000,
-        http_client=httpx.Client(
-            timeout=httpx.Timeout(30000, connect=0000),
-            # headers={
-            #     'Connection': 'close',
-            # },
-        ),
-        **kwargs,
-    )
+    return create_llm('gpt-4o')
 
 
 def create_translation_llm():
-    return ChatOpenAI(
-        openai_api_key=settings.OPENAI_API_KEY,
-        model_name='gpt-4o-mini',
-        temperature=0.1,
-        top_p=0.3,
-        request_timeout=30000,
-        http_client=httpx.Client(
-            timeout=httpx.Timeout(30000, connect=0000),
-            # headers={
-            #     'Connection': 'close',
-            # },
-        ),
-    )
+    return create_llm('gpt-4o-mini', temperature=0.1, top_p=0.3)
+
 
 def create_description_llm():
-    return ChatOpenAI(
-        openai_api_key=settings.OPENAI_API_KEY,
-        model_name='gpt-4.1-mini',
-        request_timeout=30000,
-        http_client=httpx.Client(
-            timeout=httpx.Timeout(30000, connect=0000),
-            # headers={
-            #     'Connection': 'close',
-            # },
-        ),
-    )
+    return create_llm('gpt-4.1-mini')
 
 
 def get_random_unclear_request_message():
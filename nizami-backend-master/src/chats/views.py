@@ -1,7 +1,11 @@
 import os
+from functools import partial
 
-from django.http import FileResponse, Http404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework.filters import SearchFilter
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
@@ -9,8 +13,10 @@ from src import settings
 from src.chats.models import Chat, Message, MessageFile
 from src.chats.serializers import CreateChatSerializer, ListChatsSerializer, ListMessagesSerializer, \
     CreateMessageSerializer, CreateMessageFileSerializer, ListMessageFileSerializer, UpdateChatSerializer
+from src.chats.streaming import aiter_in_thread, aiter_message_events, iter_message_events
 from src.common.pagination import PerPagePagination, IDBasedPagination
 from src.common.viewsets import CreateViewSet
+from src.ledger.services import pre_message_processing_validate
 
 
 class CreateChatViewSet(CreateViewSet):
@@ -101,6 +107,39 @@ class CreateMessageViewSet(ModelViewSet):
         return context
 
 
+class StreamMessageView(APIView):
+    """
+    POST /api/v1/chats/messages/stream
+    Same payload as messages/create, answered as text/event-stream: status and token events while the
+    flow runs, then a `message` event with the stored AI message and `done`.
+    Under ASGI the flow itself runs async on the event loop (CHAT_ASYNC_PIPELINE); only validation and
+    the credit check run in this sync handler.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = []
+
+    def post(self, request):
+        serializer = CreateMessageSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+
+        pre_message_processing_validate(user=user)
+        get_object_or_404(Chat, user=user, id=serializer.validated_data['chat_id'])
+
+        events = partial(iter_message_events, user=user, validated_data=serializer.validated_data)
+        if isinstance(request._request, ASGIRequest) and settings.CHAT_ASYNC_PIPELINE:
+            streaming_content = aiter_message_events(user=user, validated_data=serializer.validated_data)
+        elif isinstance(request._request, ASGIRequest):
+            streaming_content = aiter_in_thread(events)
+        else:
+            streaming_content = events()
+
+        response = StreamingHttpResponse(streaming_content, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class CreateMessageFileViewSet(CreateViewSet):
     queryset = MessageFile.objects.all()
     input_serializer_class = CreateMessageFileSerializer
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'src.common'
+
+    def ready(self):
+        # Import tasks to register scheduled tasks
+        import src.common.tasks  # noqa: F401
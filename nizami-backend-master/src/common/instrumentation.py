@@ -0,0 +1,399 @@
+"""
+Per-node instrumentation for the chat graph.
+
+build_graph wraps every node with instrument_node(name, func). While a node runs, a NodeStats in a context variable
+collects:
+
+  - wall time;
+  - DB queries and their time, through an execute wrapper on every connection (threads that sync_to_async or
+    LangGraph use inherit the context);
+  - LLM calls and prompt / completion tokens per model, through a LangChain callback handler injected into every
+    run started inside the node (register_configure_hook), priced with LLM_TOKEN_PRICES_USD;
+  - embedding API calls and embedded texts (record_embedding_call, called by the embedding cache on misses).
+
+Finished nodes are added to the process-wide `node_metrics` (served in the Prometheus text format by
+metrics_view) and handed to the trace sink of the current graph run, if any (node_stats_sink; step_logs
+turns them into one MessageTrace row per message).
+
+Other process-wide stats (compiled graph registries, the embedding cache) are published on the same endpoint through
+register_metrics().
+
+Metrics are kept per process: with several workers, each one is scraped on its own.
+"""
+
+import functools
+import hmac
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+_current = ContextVar('node_stats', default=None)
+_usage_handler = ContextVar('node_llm_usage_handler', default=None)
+_sink = ContextVar('node_stats_sink', default=None)
+
+register_configure_hook(_usage_handler, inheritable=True)
+
+
+def _token_prices():
+    from src.settings import LLM_TOKEN_PRICES_USD
+    return LLM_TOKEN_PRICES_USD
+
+
+def llm_cost_usd(model, prompt_tokens, completion_tokens):
+    """
+    Cost of an LLM call from LLM_TOKEN_PRICES_USD ({model prefix: [input, output] USD per 1M tokens}), or None when
+    the model is not priced. Dated model names (gpt-4o-2024-08-06) match their longest listed prefix.
+    """
+    prices = _token_prices()
+    matches = [prefix for prefix in prices if model and model.startswith(prefix)]
+    if not matches:
+        return None
+    input_price, output_price = prices[max(matches, key=len)]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class NodeStats:
+    """Resources used by one run of a graph node."""
+
+    def __init__(self, node):
+        self.node = node
+        self.started_at = time.perf_counter()
+        self.wall_sec = 0.0
+        self.db_queries = 0
+        self.db_time_sec = 0.0
+        self.llm_calls = 0
+        self.embedding_calls = 0
+        self.embedded_texts = 0
+        # model -> [calls, prompt tokens, completion tokens]
+        self.llm_usage = {}
+        self.message_id = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def add_db(self, seconds):
+        with self._lock:
+            self.db_queries += 1
+            self.db_time_sec += seconds
+
+    def add_llm(self, model, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.llm_calls += 1
+            usage = self.llm_usage.setdefault(model or 'unknown', [0, 0, 0])
+            usage[0] += 1
+            usage[1] += prompt_tokens
+            usage[2] += completion_tokens
+
+    def add_embeddings(self, texts):
+        with self._lock:
+            self.embedding_calls += 1
+            self.embedded_texts += texts
+
+    @property
+    def prompt_tokens(self):
+        return sum(usage[1] for usage in self.llm_usage.values())
+
+    @property
+    def completion_tokens(self):
+        return sum(usage[2] for usage in self.llm_usage.values())
+
+    @property
+    def cost_usd(self):
+        costs = [llm_cost_usd(model, usage[1], usage[2]) for model, usage in self.llm_usage.items()]
+        costs = [cost for cost in costs if cost is not None]
+        return sum(costs) if costs else None
+
+    def as_dict(self, origin=None) -> dict:
+        return {
+            'node': self.node,
+            'start_sec': round(self.started_at - origin, 4) if origin is not None else None,
+            'wall_sec': round(self.wall_sec, 4),
+            'db_queries': self.db_queries,
+            'db_time_sec': round(self.db_time_sec, 4),
+            'llm_calls': self.llm_calls,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cost_usd': self.cost_usd,
+            'llm_usage': {
+                model: {'calls': calls, 'prompt_tokens': prompt, 'completion_tokens': completion}
+                for model, (calls, prompt, completion) in self.llm_usage.items()
+            },
+            'embedding_calls': self.embedding_calls,
+            'embedded_texts': self.embedded_texts,
+            'error': self.error,
+        }
+
+
+def current_stats():
+    return _current.get()
+
+
+def record_embedding_call(texts):
+    stats = _current.get()
+    if stats is not None:
+        stats.add_embeddings(texts)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    t1 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_db(time.perf_counter() - t1)
+
+
+def _install_db_wrapper(connection):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_db_wrapper(connection)
+
+
+# Connections opened later, in any thread (sync_to_async, LangGraph executor), are wrapped when they connect
+connection_created.connect(_on_connection_created, dispatch_uid='node_instrumentation')
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Adds the token usage of every LLM call to the NodeStats it was created for."""
+
+    def __init__(self, stats: NodeStats):
+        self.stats = stats
+
+    def on_llm_end(self, response, **kwargs):
+        model = (response.llm_output or {}).get('model_name')
+        prompt_tokens = completion_tokens = 0
+        found = False
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, 'message', None)
+                usage = getattr(message, 'usage_metadata', None)
+                if usage:
+                    found = True
+                    prompt_tokens += usage.get('input_tokens', 0)
+                    completion_tokens += usage.get('output_tokens', 0)
+                if message is not None and not model:
+                    model = message.response_metadata.get('model_name')
+        if not found:
+            token_usage = (response.llm_output or {}).get('token_usage') or {}
+            prompt_tokens = token_usage.get('prompt_tokens', 0)
+            completion_tokens = token_usage.get('completion_tokens', 0)
+        self.stats.add_llm(model, prompt_tokens, completion_tokens)
+
+
+@contextmanager
+def track_node(node):
+    """Collect the NodeStats of the code run inside the block."""
+    stats = NodeStats(node)
+    for connection in connections.all():
+        _install_db_wrapper(connection)
+    token = _current.set(stats)
+    handler_token = _usage_handler.set(UsageCallbackHandler(stats))
+    try:
+        yield stats
+    except BaseException as e:
+        stats.error = type(e).__name__
+        raise
+    finally:
+        stats.wall_sec = time.perf_counter() - stats.started_at
+        _usage_handler.reset(handler_token)
+        _current.reset(token)
+        node_metrics.observe(stats)
+        sink = _sink.get()
+        if sink is not None:
+            sink(stats)
+
+
+def _message_id(state, result):
+    for source in (result, state):
+        message = source.get('message') if isinstance(source, dict) else None
+        if message is not None:
+            return getattr(message, 'id', None)
+    return None
+
+
+def instrument_node(name, func):
+    """Wrap a (sync or async) graph node so each run is measured with track_node."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_node(state, *args, **kwargs):
+            with track_node(name) as stats:
+                result = await func(state, *args, **kwargs)
+                stats.message_id = _message_id(state, result)
+                return result
+        return async_node
+
+    @functools.wraps(func)
+    def node(state, *args, **kwargs):
+        with track_node(name) as stats:
+            result = func(state, *args, **kwargs)
+            stats.message_id = _message_id(state, result)
+            return result
+    return node
+
+
+@contextmanager
+def node_stats_sink(callback):
+    """Hand the NodeStats of every node finished inside the block to callback."""
+    token = _sink.set(callback)
+    try:
+        yield
+    finally:
+        try:
+            _sink.reset(token)
+        except ValueError:
+            # Async generators may be resumed from another context than the one that set the sink
+            _sink.set(None)
+
+
+class NodeMetrics:
+    """Process-wide counters and latency histograms per node, rendered in the Prometheus text format."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._nodes = {}
+            self._llm = {}
+
+    def observe(self, stats: NodeStats):
+        with self._lock:
+            node = self._nodes.setdefault(stats.node, {
+                'buckets': [0] * len(self.BUCKETS),
+                'count': 0,
+                'sum': 0.0,
+                'errors': 0,
+                'db_queries': 0,
+                'db_seconds': 0.0,
+                'embedding_calls': 0,
+                'embedded_texts': 0,
+            })
+            for i, bound in enumerate(self.BUCKETS):
+                if stats.wall_sec <= bound:
+                    node['buckets'][i] += 1
+            node['count'] += 1
+            node['sum'] += stats.wall_sec
+            node['errors'] += 1 if stats.error else 0
+            node['db_queries'] += stats.db_queries
+            node['db_seconds'] += stats.db_time_sec
+            node['embedding_calls'] += stats.embedding_calls
+            node['embedded_texts'] += stats.embedded_texts
+            for model, (calls, prompt, completion) in stats.llm_usage.items():
+                llm = self._llm.setdefault((stats.node, model), [0, 0, 0, 0.0])
+                llm[0] += calls
+                llm[1] += prompt
+                llm[2] += completion
+                llm[3] += llm_cost_usd(model, prompt, completion) or 0.0
+
+    def render(self) -> str:
+        with self._lock:
+            nodes = {name: dict(values, buckets=list(values['buckets'])) for name, values in self._nodes.items()}
+            llm = {key: list(values) for key, values in self._llm.items()}
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            _render_metric(lines, name, kind, help_text, samples)
+
+        histogram = []
+        for name, values in sorted(nodes.items()):
+            for bound, count in zip(self.BUCKETS, values['buckets']):
+                histogram.append(({'node': name, 'le': bound}, count))
+            histogram.append(({'node': name, 'le': '+Inf'}, values['count']))
+        lines.append('# HELP nizami_graph_node_duration_seconds Wall time of chat graph node runs')
+        lines.append('# TYPE nizami_graph_node_duration_seconds histogram')
+        for labels, value in histogram:
+            lines.append(
+                f'nizami_graph_node_duration_seconds_bucket{{node="{_escape(labels["node"])}",le="{labels["le"]}"}} '
+                f'{value}'
+            )
+        for name, values in sorted(nodes.items()):
+            lines.append(f'nizami_graph_node_duration_seconds_sum{{node="{_escape(name)}"}} {values["sum"]}')
+            lines.append(f'nizami_graph_node_duration_seconds_count{{node="{_escape(name)}"}} {values["count"]}')
+
+        for key, kind, help_text in (
+            ('errors', 'nizami_graph_node_errors_total', 'Node runs that raised'),
+            ('db_queries', 'nizami_graph_node_db_queries_total', 'SQL statements executed by graph nodes'),
+            ('db_seconds', 'nizami_graph_node_db_seconds_total', 'Time spent in SQL statements by graph nodes'),
+            ('embedding_calls', 'nizami_graph_node_embedding_calls_total', 'Embedding API calls by graph nodes'),
+            ('embedded_texts', 'nizami_graph_node_embedded_texts_total', 'Texts sent to the embedding API'),
+        ):
+            metric(kind, 'counter', help_text, [({'node': name}, values[key]) for name, values in sorted(nodes.items())])
+
+        metric('nizami_graph_node_llm_calls_total', 'counter', 'LLM calls by graph nodes', [
+            ({'node': node, 'model': model}, values[0]) for (node, model), values in sorted(llm.items())
+        ])
+        metric('nizami_graph_node_llm_tokens_total', 'counter', 'LLM tokens used by graph nodes', [
+            ({'node': node, 'model': model, 'kind': kind}, values[index])
+            for (node, model), values in sorted(llm.items())
+            for kind, index in (('prompt', 1), ('completion', 2))
+        ])
+        metric('nizami_graph_node_llm_cost_usd_total', 'counter', 'Estimated LLM cost (LLM_TOKEN_PRICES_USD)', [
+            ({'node': node, 'model': model}, round(values[3], 6)) for (node, model), values in sorted(llm.items())
+        ])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _render_metric(lines, name, kind, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    for labels, value in samples:
+        label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+
+node_metrics = NodeMetrics()
+
+_metric_sources = []
+
+
+def register_metrics(source):
+    """
+    Publish more metrics on /metrics. source() returns [(name, kind, help, [(labels, value), ...]), ...] and is
+    called on every scrape.
+    """
+    if source not in _metric_sources:
+        _metric_sources.append(source)
+    return source
+
+
+def render_metrics() -> str:
+    """node_metrics followed by every registered source, in the Prometheus text format."""
+    lines = []
+    for source in _metric_sources:
+        for name, kind, help_text, samples in source():
+            _render_metric(lines, name, kind, help_text, samples)
+    return node_metrics.render() + ('\n'.join(lines) + '\n' if lines else '')
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Disabled (404) unless METRICS_TOKEN is set; scrapers send it as a bearer token.
+    """
+    from src.settings import METRICS_TOKEN
+
+    if not METRICS_TOKEN:
+        return HttpResponseNotFound()
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
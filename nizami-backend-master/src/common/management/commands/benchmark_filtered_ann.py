@@ -0,0 +1,157 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from src.common.retrievers import apply_vector_search_settings, iterative_scan_available
+
+TABLE = 'benchmark_filtered_ann_chunks'
+
+# Same shape as the production document-filtered chunk search
+SEARCH_SQL = f"""
+    SELECT id, 1 - (embedding <=> %s::vector) AS similarity
+    FROM {TABLE}
+    WHERE document_id = ANY(%s::bigint[])
+    ORDER BY embedding <=> %s::vector
+    LIMIT %s
+"""
+
+# mode -> hnsw.iterative_scan ('exact' disables index scans, i.e. the bitmap scan on document_id + sort)
+MODES = {
+    'exact': None,
+    'hnsw': 'off',
+    'hnsw_iterative': 'relaxed_order',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark document-filtered top-k chunk search on a synthetic corpus: exact scan vs plain HNSW vs '
+        'HNSW with pgvector iterative index scans. The corpus grows through --sizes; latency and recall '
+        '(against the exact result) are reported for each size. Uses its own UNLOGGED table, dropped at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                            help='Corpus sizes (chunks) to measure, ascending')
+        parser.add_argument('--documents', type=int, default=5_000, help='Documents the chunks are spread over')
+        parser.add_argument('--filter-documents', type=int, default=10,
+                            help='Documents per query filter (the description shortlist size)')
+        parser.add_argument('--dimensions', type=int, default=256,
+                            help='Vector dimensions (production uses 1536; lower keeps corpus generation fast)')
+        parser.add_argument('--queries', type=int, default=50, help='Queries per mode and size')
+        parser.add_argument('--k', type=int, default=8)
+        parser.add_argument('--ef-search', type=int, default=32)
+        parser.add_argument('--max-scan-tuples', type=int, default=20_000)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark table afterwards')
+
+    def handle(self, *args, **options):
+        dimensions = options['dimensions']
+        rng = random.Random(42)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+            cursor.execute(f"""
+                CREATE UNLOGGED TABLE {TABLE} (
+                    id bigserial PRIMARY KEY,
+                    document_id bigint NOT NULL,
+                    embedding vector({dimensions}) NOT NULL
+                )
+            """)
+            cursor.execute(f'CREATE INDEX ON {TABLE} (document_id)')
+
+        try:
+            size = 0
+            for target in sorted(options['sizes']):
+                self._grow(size, target, options['documents'], dimensions)
+                size = target
+                self._build_hnsw_index()
+
+                queries = [
+                    (
+                        self._random_vector(rng, dimensions),
+                        rng.sample(range(1, options['documents'] + 1), options['filter_documents']),
+                    )
+                    for _ in range(options['queries'])
+                ]
+                self._report(size, queries, options)
+        finally:
+            if not options['keep']:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+    def _grow(self, start, target, documents, dimensions, batch_size=50_000):
+        self.stdout.write(f'Generating chunks {start + 1}..{target}')
+        with connection.cursor() as cursor:
+            for first in range(start + 1, target + 1, batch_size):
+                last = min(first + batch_size - 1, target)
+                # The WHERE on g makes the vector subquery correlated, i.e. one random vector per row
+                cursor.execute(f"""
+                    INSERT INTO {TABLE} (document_id, embedding)
+                    SELECT
+                        1 + (g %% %s),
+                        (SELECT array_agg(random()::real - 0.5) FROM generate_series(1, %s) WHERE g > 0)::vector
+                    FROM generate_series(%s, %s) g
+                """, [documents, dimensions, first, last])
+
+    def _build_hnsw_index(self):
+        t1 = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS {TABLE}_embedding_hnsw')
+            # Same parameters as rag_chunk_embedding_hnsw_idx
+            cursor.execute(f"""
+                CREATE INDEX {TABLE}_embedding_hnsw ON {TABLE}
+                USING hnsw (embedding vector_cosine_ops) WITH (m = 12, ef_construction = 120)
+            """)
+            cursor.execute(f'ANALYZE {TABLE}')
+        self.stdout.write(f'Built HNSW index in {time.perf_counter() - t1:.1f}s')
+
+    def _report(self, size, queries, options):
+        k = options['k']
+        exact_ids = None
+        self.stdout.write(f'\n{size:,} chunks, {options["filter_documents"]} documents per filter, k={k}')
+
+        for mode, iterative_scan in MODES.items():
+            timings, results = [], []
+            for embedding, document_ids in queries:
+                t1 = time.perf_counter()
+                ids = self._search(embedding, document_ids, k, iterative_scan, options)
+                timings.append((time.perf_counter() - t1) * 1000)
+                results.append(ids)
+
+            if exact_ids is None:
+                exact_ids = results
+            recall = statistics.mean(
+                len(set(ids) & set(expected)) / len(expected) if expected else 1.0
+                for ids, expected in zip(results, exact_ids)
+            )
+            timings.sort()
+            # apply_vector_search_settings drops iterative scans on servers without them (pgvector < 0.8)
+            fell_back = iterative_scan not in (None, 'off') and not iterative_scan_available()
+            self.stdout.write(
+                f'  {mode:<15} p50 {statistics.median(timings):7.2f} ms  '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms  '
+                f'recall@{k} {recall:.3f}  '
+                f'avg rows {statistics.mean(len(ids) for ids in results):.1f}'
+                + ('  (no iterative scan support, ran as plain hnsw)' if fell_back else '')
+            )
+
+    def _search(self, embedding, document_ids, k, iterative_scan, options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if iterative_scan is None:
+                cursor.execute('SET LOCAL enable_indexscan = off')
+            else:
+                apply_vector_search_settings(
+                    cursor,
+                    iterative_scan=iterative_scan,
+                    ef_search=options['ef_search'],
+                    max_scan_tuples=options['max_scan_tuples'],
+                )
+            cursor.execute(SEARCH_SQL, [embedding, document_ids, embedding, k])
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _random_vector(rng, dimensions):
+        return '[' + ','.join(str(rng.random() - 0.5) for _ in range(dimensions)) + ']'
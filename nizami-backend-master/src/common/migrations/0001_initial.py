@@ -0,0 +1,27 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:17
+
+from django.db import migrations, models
+import pgvector.django.vector
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        # pgvector extension is created there
+        ('chats', '0003_alter_message_chat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryEmbedding',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=128)),
+                ('dimensions', models.PositiveIntegerField(blank=True, null=True)),
+                ('embedding', pgvector.django.vector.VectorField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
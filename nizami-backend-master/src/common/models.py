@@ -0,0 +1,14 @@
+from django.db import models
+from pgvector.django import VectorField
+
+
+class QueryEmbedding(models.Model):
+    """
+    Shared (cross-process) cache of query embeddings used by src.common.retrievers.EmbeddingCache.
+    key = sha256 of embedding model, dimensions and normalized query text.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=128)
+    dimensions = models.PositiveIntegerField(null=True, blank=True)
+    embedding = VectorField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,74 @@
+"""
+Page-sharded PDF text extraction.
+
+extract_pdf_pages() returns the text of every page, in page order. Documents with at least PDF_PARALLEL_MIN_PAGES
+pages are split into contiguous page ranges that a process pool of PDF_EXTRACTION_WORKERS processes extracts in
+parallel (each process opens the file itself; PyMuPDF documents cannot be shared); results are reassembled by range.
+Smaller documents, a single worker, or a daemonic parent process (django-q workers unless daemonize_workers is False)
+extract serially in the calling process.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Ranges per worker: more, smaller ranges even out pages of uneven cost
+RANGES_PER_WORKER = 4
+
+
+def extract_page_range(file_path: str, start: int, stop: int) -> list[str]:
+    """Text of pages start..stop-1."""
+    import fitz
+
+    with fitz.open(file_path) as doc:
+        return [doc[i].get_text() for i in range(start, min(stop, doc.page_count))]
+
+
+def page_ranges(page_count: int, shards: int) -> list[tuple[int, int]]:
+    """page_count pages split into at most `shards` contiguous (start, stop) ranges of near-equal size."""
+    shards = max(1, min(shards, page_count))
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for i in range(shards):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _init_worker():
+    # django-q pins its workers to cpu_affinity cores, which child processes inherit
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, range(os.cpu_count() or 1))
+        except OSError:
+            pass
+
+
+def extract_pdf_pages(file_path: str, workers: int | None = None) -> list[str]:
+    """Text of every page of a PDF, in order."""
+    import fitz
+    from src.settings import PDF_EXTRACTION_WORKERS, PDF_PARALLEL_MIN_PAGES
+
+    workers = PDF_EXTRACTION_WORKERS if workers is None else workers
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+
+    if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES or multiprocessing.current_process().daemon:
+        return extract_page_range(file_path, 0, page_count)
+
+    ranges = page_ranges(page_count, workers * RANGES_PER_WORKER)
+    # spawn: the caller may run threads (DB listener, HTTP clients) that a forked child would inherit mid-operation
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(ranges)),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    ) as pool:
+        results = pool.map(extract_page_range, *zip(*[(file_path, start, stop) for start, stop in ranges]))
+        pages = [text for chunk in results for text in chunk]
+    logger.info("Extracted %s PDF pages in %s ranges with %s processes", page_count, len(ranges), workers)
+    return pages
@@ -7,13 +7,284 @@ which is necessary because PGVector's filter syntax doesn't support filter-befor
 Supports two backends controlled by the RAG_SOURCE setting:
   - "old": searches the langchain_pg_embedding table (ReferenceDocument pipeline)
   - "new": searches the reference_documents_ragsourcedocumentchunk table (S3 RAG pipeline)
+
+Query embeddings go through `embedding_cache` so the same text is embedded once per process
+(and, with EMBEDDING_CACHE_DB, once across processes); its hit/miss counters are on /metrics and the shared
+table is pruned by common.tasks. Searches run through `vector_search_cursor`, which enables pgvector iterative
+index scans for the document filter.
 """
+import hashlib
 import json
 import logging
-
-from django.db import connection
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
 from langchain_core.documents import Document
 
+from src.common.instrumentation import record_embedding_call, register_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Query-embedding cache: an in-process LRU in front of an optional shared Postgres table
+    (common.QueryEmbedding). Keys are sha256(model, dimensions, normalized text), so changing the
+    embedding model or dimensions never returns stale vectors.
+    """
+
+    log_interval_sec = 300
+
+    def __init__(self, max_entries=None, use_db=None):
+        self._max_entries = max_entries
+        self._use_db = use_db
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._logged_at = time.monotonic()
+
+    @property
+    def max_entries(self):
+        if self._max_entries is None:
+            from src.settings import EMBEDDING_CACHE_SIZE
+            return EMBEDDING_CACHE_SIZE
+        return self._max_entries
+
+    @property
+    def use_db(self):
+        if self._use_db is None:
+            from src.settings import EMBEDDING_CACHE_DB
+            return EMBEDDING_CACHE_DB
+        return self._use_db
+
+    @staticmethod
+    def normalize(text):
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text or '')).strip()
+
+    @staticmethod
+    def model_signature(embeddings):
+        return getattr(embeddings, 'model', type(embeddings).__name__), getattr(embeddings, 'dimensions', None)
+
+    def make_key(self, text, embeddings):
+        model, dimensions = self.model_signature(embeddings)
+        raw = f"{model}:{dimensions}:{self.normalize(text)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def embed_query(self, text, embeddings=None):
+        return self.embed_queries([text], embeddings)[0]
+
+    def embed_queries(self, texts, embeddings=None):
+        """
+        Embed several query texts; all cache misses go to the API in a single embed_documents batch.
+        """
+        if embeddings is None:
+            from src.settings import embeddings
+
+        keys = [self.make_key(text, embeddings) for text in texts]
+        vectors = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    vectors[key] = vector
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self._load_from_db(key) if self.use_db else None
+            if vector is not None:
+                vectors[key] = vector
+                self._remember(key, vector, db_hit=True)
+            else:
+                missing[key] = self.normalize(text)
+
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            record_embedding_call(len(missing))
+            batch = embeddings.embed_documents(list(missing.values()))
+            for key, vector in zip(missing, batch):
+                vectors[key] = vector
+                self._remember(key, vector)
+                if self.use_db:
+                    self._store_in_db(key, embeddings, vector)
+
+        self._log_stats()
+        return [vectors[key] for key in keys]
+
+    def stats(self):
+        with self._lock:
+            memory_hits, db_hits, misses, entries = self.memory_hits, self.db_hits, self.misses, len(self._entries)
+        lookups = memory_hits + db_hits + misses
+        return {
+            'lookups': lookups,
+            'memory_hits': memory_hits,
+            'db_hits': db_hits,
+            'misses': misses,
+            'hit_rate': (memory_hits + db_hits) / lookups if lookups else 0.0,
+            'entries': entries,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.db_hits = self.misses = 0
+
+    def _remember(self, key, vector, db_hit=False):
+        with self._lock:
+            if db_hit:
+                self.db_hits += 1
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load_from_db(self, key):
+        from src.common.models import QueryEmbedding
+
+        try:
+            row = QueryEmbedding.objects.filter(key=key).values_list('embedding', flat=True).first()
+        except Exception as e:
+            logger.warning('Embedding cache lookup failed: %s', e)
+            return None
+        return [float(x) for x in row] if row is not None else None
+
+    def _store_in_db(self, key, embeddings, vector):
+        from src.common.models import QueryEmbedding
+
+        model, dimensions = self.model_signature(embeddings)
+        try:
+            QueryEmbedding.objects.bulk_create(
+                [QueryEmbedding(key=key, model=model, dimensions=dimensions, embedding=vector)],
+                ignore_conflicts=True,
+            )
+        except Exception as e:
+            logger.warning('Embedding cache write failed: %s', e)
+
+    def _log_stats(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._logged_at < self.log_interval_sec:
+                return
+            self._logged_at = now
+        stats = self.stats()
+        logger.info(
+            'Embedding cache: %s lookups, hit rate %.1f%% (memory %s, db %s, misses %s)',
+            stats['lookups'], stats['hit_rate'] * 100, stats['memory_hits'], stats['db_hits'], stats['misses'],
+        )
+
+
+embedding_cache = EmbeddingCache()
+
+
+@register_metrics
+def embedding_cache_metrics():
+    stats = embedding_cache.stats()
+    return [
+        ('nizami_embedding_cache_lookups_total', 'counter', 'Query embedding lookups by where they were answered',
+         [({'result': 'memory_hit'}, stats['memory_hits']), ({'result': 'db_hit'}, stats['db_hits']),
+          ({'result': 'miss'}, stats['misses'])]),
+        ('nizami_embedding_cache_entries', 'gauge', 'Query embeddings held in this process',
+         [({}, stats['entries'])]),
+    ]
+
+
+def embed_query_cached(text, embeddings=None):
+    """
+    Drop-in for embeddings.embed_query(text) that goes through the shared embedding cache.
+    """
+    return embedding_cache.embed_query(text, embeddings)
+
+
+# Filter expression for langchain_pg_embedding chunks of a ReferenceDocument. Must match the btree expression index
+# idx_cmetadata_referencedocumentid_embedding exactly (other spellings, e.g. a text comparison, scan the whole table).
+LEGACY_REFERENCE_DOCUMENT_ID_SQL = "(cmetadata->>'reference_document_id')::bigint"
+LEGACY_REFERENCE_DOCUMENT_ID_INDEX = 'idx_cmetadata_referencedocumentid_embedding'
+
+_iterative_scan_supported = True
+
+# SET of a parameter the server does not know: undefined_object ("unrecognized configuration parameter"), or
+# invalid_name when the extension reserved the "hnsw" prefix without defining the parameter
+UNKNOWN_PARAMETER_SQLSTATES = ('42704', '42602')
+
+
+def _is_unknown_parameter_error(exc) -> bool:
+    # Django wraps the driver error; psycopg 3 has .sqlstate, psycopg2 .pgcode
+    for error in (exc, exc.__cause__):
+        if getattr(error, 'sqlstate', None) in UNKNOWN_PARAMETER_SQLSTATES:
+            return True
+        if getattr(error, 'pgcode', None) in UNKNOWN_PARAMETER_SQLSTATES:
+            return True
+    return False
+
+
+def iterative_scan_available() -> bool:
+    """False once the server turned out not to support iterative index scans (pgvector < 0.8)."""
+    return _iterative_scan_supported
+
+
+def apply_vector_search_settings(cursor, iterative_scan=None, ef_search=None, max_scan_tuples=None):
+    """
+    SET LOCAL the HNSW search options for the current transaction. Servers without iterative scan
+    support (pgvector < 0.8) are detected once and only get ef_search from then on; other errors are raised.
+    """
+    global _iterative_scan_supported
+    from src import settings
+
+    iterative_scan = iterative_scan or settings.VECTOR_SEARCH_ITERATIVE_SCAN
+    ef_search = ef_search or settings.VECTOR_SEARCH_EF_SEARCH
+    max_scan_tuples = max_scan_tuples or settings.VECTOR_SEARCH_MAX_SCAN_TUPLES
+
+    cursor.execute('SET LOCAL hnsw.ef_search = %s' % int(ef_search))
+
+    if iterative_scan == 'off' or not _iterative_scan_supported:
+        return
+
+    if iterative_scan not in ('relaxed_order', 'strict_order'):
+        raise ValueError(f'Unknown VECTOR_SEARCH_ITERATIVE_SCAN: {iterative_scan}')
+
+    try:
+        with transaction.atomic():
+            cursor.execute(f'SET LOCAL hnsw.iterative_scan = {iterative_scan}')
+            cursor.execute('SET LOCAL hnsw.max_scan_tuples = %s' % int(max_scan_tuples))
+    except Exception as e:
+        if not _is_unknown_parameter_error(e):
+            raise
+        _iterative_scan_supported = False
+        logger.warning('pgvector iterative index scans unavailable, using plain HNSW scans: %s', e)
+
+
+@contextmanager
+def vector_search_cursor():
+    """
+    Cursor for document-filtered ANN queries (`WHERE <document filter> ORDER BY embedding <=> q LIMIT k`).
+
+    A plain HNSW scan visits ef_search candidates and then drops the ones from other documents, so a
+    small shortlist in a large corpus often comes back with fewer than k chunks, and the planner
+    falls back to an exact scan of every matching chunk. With iterative scans the index keeps
+    returning candidates until k rows pass the filter, so the query stays sub-linear as the
+    corpus grows. SET LOCAL needs a transaction, hence the atomic block.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        apply_vector_search_settings(cursor)
+        yield cursor
+
+
+def _by_similarity(docs):
+    # relaxed_order scans may return rows slightly out of distance order
+    return sorted(docs, key=lambda d: -(d.metadata.get('similarity') or 0))
+
 
 def similarity_search_with_document_filter(query_text, document_ids, k=8, embeddings=None, logger=None):
     """
@@ -33,29 +304,26 @@ def similarity_search_with_document_filter(query_text, document_ids, k=8, embedd
     Returns:
         List of Document objects or None if search fails
     """
-    if embeddings is None:
-        from src.settings import embeddings
-    
     if not document_ids:
         return []
     
     try:
-        query_emb = embeddings.embed_query(query_text)
+        query_emb = embed_query_cached(query_text, embeddings)
         
-        with connection.cursor() as cursor:
+        with vector_search_cursor() as cursor:
             # Format embedding as vector string for pgvector
             embedding_str = '[' + ','.join(str(x) for x in query_emb) + ']'
             document_ids_list = list(document_ids)
             
             # Parameterized query: Filter FIRST, then search within filtered set
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT 
                     id,
                     document,
                     cmetadata,
                     1 - (embedding <=> %s::vector) as similarity
                 FROM langchain_pg_embedding 
-                WHERE (cmetadata->>'reference_document_id')::bigint = ANY(%s::bigint[])
+                WHERE {LEGACY_REFERENCE_DOCUMENT_ID_SQL} = ANY(%s::bigint[])
                 ORDER BY embedding <=> %s::vector
                 LIMIT %s
             """, [embedding_str, document_ids_list, embedding_str, k])
@@ -71,6 +339,7 @@ def similarity_search_with_document_filter(query_text, document_ids, k=8, embedd
                         metadata = {}
                     
                     metadata['id'] = str(chunk_id) if chunk_id else None
+                    metadata['similarity'] = float(similarity) if similarity is not None else None
                     docs.append(Document(
                         page_content=document or '',
                         metadata=metadata
@@ -78,7 +347,7 @@ def similarity_search_with_document_filter(query_text, document_ids, k=8, embedd
                 
                 if logger:
                     logger.info(f'Similarity search found {len(docs)} chunks from {len(document_ids)} target documents')
-                return docs
+                return _by_similarity(docs)
     except Exception as e:
         if logger:
             logger.warning(f'Similarity search with document filter failed: {e}')
@@ -144,16 +413,13 @@ def rag_source_similarity_search(query_text, document_ids, k=8, embeddings=None,
     Same pattern as similarity_search_with_document_filter but queries the
     Django-managed reference_documents_ragsourcedocumentchunk table.
     """
-    if embeddings is None:
-        from src.settings import embeddings
-
     if not document_ids:
         return []
 
     try:
-        query_emb = embeddings.embed_query(query_text)
+        query_emb = embed_query_cached(query_text, embeddings)
 
-        with connection.cursor() as cursor:
+        with vector_search_cursor() as cursor:
             embedding_str = '[' + ','.join(str(x) for x in query_emb) + ']'
             document_ids_list = list(document_ids)
 
@@ -183,6 +449,7 @@ def rag_source_similarity_search(query_text, document_ids, k=8, embeddings=None,
                         'chunk_index': chunk_idx,
                         'title': title or '',
                         'language': 'ar',
+                        'similarity': float(similarity) if similarity is not None else None,
                     }
                     docs.append(Document(page_content=content or '', metadata=metadata))
 
@@ -191,7 +458,7 @@ def rag_source_similarity_search(query_text, document_ids, k=8, embeddings=None,
                         'rag_source_similarity_search found %s chunks from %s target documents',
                         len(docs), len(document_ids),
                     )
-                return docs
+                return _by_similarity(docs)
     except Exception as e:
         if logger:
             logger.warning('rag_source_similarity_search failed: %s', e)
@@ -200,6 +467,250 @@ def rag_source_similarity_search(query_text, document_ids, k=8, embeddings=None,
     return None
 
 
+def _vector_literal(embedding):
+    return '[' + ','.join(str(x) for x in embedding) + ']'
+
+
+def _row_metadata(metadata):
+    if isinstance(metadata, str):
+        return json.loads(metadata)
+    return metadata or {}
+
+
+# One row per (query, chunk): each query variant gets its own top-k through a LATERAL subquery,
+# so all variants are searched in a single round trip and each still uses the HNSW index.
+MULTI_QUERY_SQL = {
+    'langchain_pg_embedding': f"""
+        WITH queries AS (
+            SELECT (q.ord - 1)::int AS query_index, q.embedding::vector AS embedding
+            FROM unnest(%s::text[]) WITH ORDINALITY AS q(embedding, ord)
+        )
+        SELECT
+            queries.query_index,
+            hits.id,
+            hits.document,
+            hits.cmetadata,
+            1 - (hits.embedding <=> queries.embedding) AS similarity
+        FROM queries
+        CROSS JOIN LATERAL (
+            SELECT id, document, cmetadata, embedding
+            FROM langchain_pg_embedding
+            WHERE {LEGACY_REFERENCE_DOCUMENT_ID_SQL} = ANY(%s::bigint[])
+            ORDER BY embedding <=> queries.embedding
+            LIMIT %s
+        ) hits
+    """,
+    'rag_source_document_chunk': """
+        WITH queries AS (
+            SELECT (q.ord - 1)::int AS query_index, q.embedding::vector AS embedding
+            FROM unnest(%s::text[]) WITH ORDINALITY AS q(embedding, ord)
+        )
+        SELECT
+            queries.query_index,
+            hits.id,
+            hits.content,
+            hits.rag_source_document_id,
+            hits.chunk_index,
+            d.title,
+            1 - (hits.embedding <=> queries.embedding) AS similarity
+        FROM queries
+        CROSS JOIN LATERAL (
+            SELECT c.id, c.content, c.rag_source_document_id, c.chunk_index, c.embedding
+            FROM reference_documents_ragsourcedocumentchunk c
+            WHERE c.rag_source_document_id = ANY(%s::bigint[])
+            ORDER BY c.embedding <=> queries.embedding
+            LIMIT %s
+        ) hits
+        JOIN reference_documents_ragsourcedocument d ON d.id = hits.rag_source_document_id
+    """,
+}
+
+
+def _multi_query_row_to_document(table, row):
+    if table == 'rag_source_document_chunk':
+        query_index, chunk_id, content, doc_id, chunk_idx, title, similarity = row
+        metadata = {
+            'id': str(chunk_id),
+            'rag_source_document_id': doc_id,
+            'chunk_index': chunk_idx,
+            'title': title or '',
+            'language': 'ar',
+        }
+    else:
+        query_index, chunk_id, content, metadata, similarity = row
+        metadata = _row_metadata(metadata)
+        metadata['id'] = str(chunk_id) if chunk_id else None
+
+    metadata['similarity'] = float(similarity) if similarity is not None else None
+    return query_index, Document(page_content=content or '', metadata=metadata)
+
+
+def merge_retrieved_documents(*document_lists):
+    """
+    Merge retrieval results from several queries: a chunk hit by more than one query appears once,
+    keeping its best similarity, and the result is ordered by that similarity (highest first).
+    """
+    merged = OrderedDict()
+    for documents in document_lists:
+        for doc in documents or []:
+            chunk_id = doc.metadata.get('id') or doc.page_content
+            current = merged.get(chunk_id)
+            if current is None or (doc.metadata.get('similarity') or 0) > (current.metadata.get('similarity') or 0):
+                merged[chunk_id] = doc
+
+    # Stable sort: chunks without a score (fallback search) keep their relative order at the end
+    return sorted(merged.values(), key=lambda d: -(d.metadata.get('similarity') or 0))
+
+
+def multi_query_similarity_search(query_texts, document_ids, k=8, table='langchain_pg_embedding',
+                                  embeddings=None, logger=None):
+    """
+    Similarity search for several query variants (e.g. the rephrased query and its translation) at once.
+
+    All variants are embedded in one batch (through embedding_cache) and searched with one SQL
+    statement, each variant returning its own top-k within document_ids.
+
+    Returns a list with one Document list per query (same order as query_texts), or None if search fails.
+    """
+    if not document_ids or not query_texts:
+        return [[] for _ in query_texts]
+
+    try:
+        query_embs = embedding_cache.embed_queries(query_texts, embeddings)
+
+        with vector_search_cursor() as cursor:
+            cursor.execute(MULTI_QUERY_SQL[table], [
+                [_vector_literal(emb) for emb in query_embs],
+                list(document_ids),
+                k,
+            ])
+            rows = cursor.fetchall()
+
+        results = [[] for _ in query_texts]
+        for row in rows:
+            query_index, doc = _multi_query_row_to_document(table, row)
+            results[query_index].append(doc)
+
+        if logger:
+            logger.info(
+                'Multi-query search (%s queries) found %s chunks from %s target documents',
+                len(query_texts), len(rows), len(document_ids),
+            )
+        return results
+    except Exception as e:
+        if logger:
+            logger.warning(f'Multi-query similarity search failed: {e}')
+        return None
+
+
+# Document shortlist (description HNSW, non-MOJ preferred) and per-query chunk search in one statement.
+# Mirrors find_rag_source_document_ids_by_description + the MOJ exclusion + rag_source_similarity_search.
+RAG_SOURCE_TWO_STAGE_SQL = """
+    WITH queries AS (
+        SELECT (q.ord - 1)::int AS query_index, q.embedding::vector AS embedding
+        FROM unnest(%s::text[]) WITH ORDINALITY AS q(embedding, ord)
+    ),
+    candidates AS (
+        SELECT d.id, d.title, d.s3_key
+        FROM reference_documents_ragsourcedocument d
+        WHERE d.is_embedded
+        ORDER BY d.description_embedding <=> %s::vector
+        LIMIT %s
+    ),
+    preferred AS (
+        SELECT id, title FROM candidates
+        WHERE s3_key IS NULL OR s3_key NOT ILIKE %s
+    ),
+    shortlist AS (
+        SELECT id, title FROM preferred
+        UNION ALL
+        SELECT id, title FROM candidates WHERE NOT EXISTS (SELECT 1 FROM preferred)
+    ),
+    hits AS (
+        SELECT queries.query_index, c.*
+        FROM queries
+        CROSS JOIN LATERAL (
+            SELECT
+                chunk.id,
+                chunk.content,
+                chunk.rag_source_document_id,
+                chunk.chunk_index,
+                1 - (chunk.embedding <=> queries.embedding) AS similarity
+            FROM reference_documents_ragsourcedocumentchunk chunk
+            WHERE chunk.rag_source_document_id = ANY(ARRAY(SELECT id FROM shortlist))
+            ORDER BY chunk.embedding <=> queries.embedding
+            LIMIT %s
+        ) c
+    )
+    SELECT
+        ARRAY(SELECT id FROM shortlist),
+        COALESCE((
+            SELECT json_agg(json_build_object(
+                'query_index', hits.query_index,
+                'id', hits.id,
+                'content', hits.content,
+                'rag_source_document_id', hits.rag_source_document_id,
+                'chunk_index', hits.chunk_index,
+                'title', shortlist.title,
+                'similarity', hits.similarity
+            ) ORDER BY hits.query_index, hits.similarity DESC)
+            FROM hits
+            JOIN shortlist ON shortlist.id = hits.rag_source_document_id
+        ), '[]'::json)
+"""
+
+
+def rag_source_two_stage_search(shortlist_text, query_texts, k=8, shortlist_size=10, moj_prefix='processed/MOJ/',
+                                embeddings=None, logger=None):
+    """
+    Shortlist RagSourceDocuments by description and search their chunks in one SQL round trip.
+
+    shortlist_text picks the documents (top shortlist_size by description similarity, MOJ documents
+    only when nothing else matches); every text in query_texts then gets its own top-k chunks within
+    that shortlist. All texts are embedded in one batch (shortlist_text is usually query_texts[0],
+    so it is embedded once).
+
+    Returns (document_ids, one Document list per query) or None if search fails.
+    """
+    try:
+        shortlist_emb, *query_embs = embedding_cache.embed_queries([shortlist_text, *query_texts], embeddings)
+
+        with vector_search_cursor() as cursor:
+            cursor.execute(RAG_SOURCE_TWO_STAGE_SQL, [
+                [_vector_literal(emb) for emb in query_embs],
+                _vector_literal(shortlist_emb),
+                shortlist_size,
+                moj_prefix.replace('%', r'\%').replace('_', r'\_') + '%',
+                k,
+            ])
+            document_ids, hits = cursor.fetchone()
+
+        if isinstance(hits, str):
+            hits = json.loads(hits)
+
+        results = [[] for _ in query_texts]
+        for hit in hits:
+            results[hit['query_index']].append(Document(page_content=hit['content'] or '', metadata={
+                'id': str(hit['id']),
+                'rag_source_document_id': hit['rag_source_document_id'],
+                'chunk_index': hit['chunk_index'],
+                'title': hit['title'] or '',
+                'language': 'ar',
+                'similarity': hit['similarity'],
+            }))
+
+        if logger:
+            logger.info(
+                'Two-stage search (%s queries) found %s chunks from %s shortlisted documents',
+                len(query_texts), len(hits), len(document_ids),
+            )
+        return list(document_ids), results
+    except Exception as e:
+        if logger:
+            logger.warning(f'Two-stage rag source search failed: {e}')
+        return None
+
+
 def find_rag_source_document_ids_by_description(text):
     """
     Find the most relevant RagSourceDocument IDs by description embedding similarity.
@@ -207,9 +718,8 @@ def find_rag_source_document_ids_by_description(text):
     """
     from pgvector.django import CosineDistance
     from src.reference_documents.models import RagSourceDocument
-    from src.settings import embeddings
 
-    embedded_text = embeddings.embed_query(text)
+    embedded_text = embed_query_cached(text)
 
     files = (
         RagSourceDocument.objects
@@ -224,6 +734,8 @@ class FilteredRetriever:
     """
     Custom retriever that filters similarity search by document IDs.
 
+    invoke() searches one query, invoke_many() several query variants in a single round trip.
+
     Uses two strategies:
     1. SQL-based search: Filters FIRST, then searches within filtered set (preferred)
     2. Fallback search: Searches globally, then filters (less reliable)
@@ -273,6 +785,28 @@ class FilteredRetriever:
             logger=self.logger,
         )
 
+    def invoke_many(self, query_texts):
+        """
+        Retrieve for several query variants with one embedding batch and one SQL round trip.
+        Returns the merged chunks (see merge_retrieved_documents) of all queries.
+        """
+        query_texts = [text for text in query_texts if text and text.strip()]
+        if not self.document_ids or not query_texts:
+            return []
+
+        table = 'rag_source_document_chunk' if self.rag_source == 'new' else 'langchain_pg_embedding'
+        results = multi_query_similarity_search(
+            query_texts=query_texts,
+            document_ids=self.document_ids,
+            k=self.k,
+            table=table,
+            logger=self.logger,
+        )
+        if results is None:
+            results = [self.invoke(text) for text in query_texts]
+
+        return merge_retrieved_documents(*results)
+
     def invoke(self, query_text):
         if not self.document_ids:
             return []
@@ -0,0 +1,41 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django_q.models import Schedule
+
+logger = logging.getLogger(__name__)
+
+
+def prune_query_embeddings_task():
+    """Delete shared query embeddings older than EMBEDDING_CACHE_DB_TTL_DAYS; a pruned query is embedded again."""
+    from src.common.models import QueryEmbedding
+    from src.settings import EMBEDDING_CACHE_DB_TTL_DAYS
+
+    cutoff = timezone.now() - timedelta(days=EMBEDDING_CACHE_DB_TTL_DAYS)
+    deleted, _ = QueryEmbedding.objects.filter(created_at__lt=cutoff).delete()
+    if deleted:
+        logger.info("Pruned %s query embeddings created before %s", deleted, cutoff)
+    return deleted
+
+
+def setup_query_embedding_prune_schedule():
+    try:
+        with transaction.atomic():
+            _, created = Schedule.objects.get_or_create(
+                name="prune_query_embeddings",
+                defaults={
+                    'func': 'src.common.tasks.prune_query_embeddings_task',
+                    'schedule_type': 'D',  # daily
+                    'repeats': -1,  # run forever
+                }
+            )
+
+            if created:
+                logger.info("Scheduled task 'prune_query_embeddings' created successfully")
+    except Exception as e:
+        logger.error(f"Error setting up query embedding prune schedule: {str(e)}", exc_info=True)
+
+
+setup_query_embedding_prune_schedule()
@@ -0,0 +1,112 @@
+from unittest import mock
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from src.common import retrievers
+from src.common.retrievers import EmbeddingCache
+
+
+def make_embeddings(model='text-embedding-3-large', dimensions=1536):
+    embeddings = MagicMock(model=model, dimensions=dimensions)
+    embeddings.embed_documents.side_effect = lambda texts: [[float(len(text)), 1.0] for text in texts]
+    return embeddings
+
+
+class EmbeddingCacheTest(SimpleTestCase):
+    def test_normalized_text_is_embedded_once(self):
+        cache = EmbeddingCache(max_entries=10, use_db=False)
+        embeddings = make_embeddings()
+
+        first = cache.embed_query('ما هي  مدة الإشعار؟ ', embeddings)
+        second = cache.embed_query('ما هي مدة الإشعار؟', embeddings)
+
+        self.assertEqual(first, second)
+        embeddings.embed_documents.assert_called_once_with(['ما هي مدة الإشعار؟'])
+        self.assertEqual({'lookups': 2, 'memory_hits': 1, 'db_hits': 0, 'misses': 1, 'hit_rate': 0.5, 'entries': 1},
+                         cache.stats())
+
+    def test_model_and_dimensions_are_part_of_the_key(self):
+        cache = EmbeddingCache(max_entries=10, use_db=False)
+        large = make_embeddings(dimensions=1536)
+        small = make_embeddings(dimensions=256)
+
+        cache.embed_query('notice period', large)
+        cache.embed_query('notice period', small)
+
+        large.embed_documents.assert_called_once()
+        small.embed_documents.assert_called_once()
+
+    def test_evicts_least_recently_used(self):
+        cache = EmbeddingCache(max_entries=2, use_db=False)
+        embeddings = make_embeddings()
+
+        cache.embed_query('a', embeddings)
+        cache.embed_query('b', embeddings)
+        cache.embed_query('a', embeddings)
+        cache.embed_query('c', embeddings)  # evicts 'b'
+        cache.embed_query('b', embeddings)
+
+        self.assertEqual(4, embeddings.embed_documents.call_count)
+        self.assertEqual(2, cache.stats()['entries'])
+
+    def test_batches_misses_into_one_call(self):
+        cache = EmbeddingCache(max_entries=10, use_db=False)
+        embeddings = make_embeddings()
+        cache.embed_query('cached', embeddings)
+
+        vectors = cache.embed_queries(['cached', 'new one', 'another'], embeddings)
+
+        self.assertEqual([[6.0, 1.0], [7.0, 1.0], [7.0, 1.0]], vectors)
+        embeddings.embed_documents.assert_called_with(['new one', 'another'])
+        self.assertEqual(2, embeddings.embed_documents.call_count)
+
+    def test_counts_shared_table_hits(self):
+        cache = EmbeddingCache(max_entries=10, use_db=True)
+        embeddings = make_embeddings()
+
+        with mock.patch.object(cache, '_load_from_db', return_value=[1.0, 2.0]):
+            self.assertEqual([1.0, 2.0], cache.embed_query('stored elsewhere', embeddings))
+            cache.embed_query('stored elsewhere', embeddings)
+
+        embeddings.embed_documents.assert_not_called()
+        self.assertEqual((1, 1, 0), (cache.stats()['db_hits'], cache.stats()['memory_hits'], cache.stats()['misses']))
+
+    def test_logs_stats_once_per_interval(self):
+        cache = EmbeddingCache(max_entries=10, use_db=False)
+        cache.log_interval_sec = 60
+        embeddings = make_embeddings()
+
+        with mock.patch.object(retrievers.time, 'monotonic', side_effect=[1000.0, 1001.0, 1062.0]), \
+                mock.patch.object(retrievers.logger, 'info') as info:
+            cache._logged_at = 990.0
+            cache.embed_query('a', embeddings)
+            cache.embed_query('b', embeddings)
+            cache.embed_query('c', embeddings)
+
+        self.assertEqual(1, info.call_count)
+
+    def test_metrics_source(self):
+        cache = EmbeddingCache(max_entries=10, use_db=False)
+        cache.embed_queries(['a', 'a', 'b'], make_embeddings())
+
+        with mock.patch.object(retrievers, 'embedding_cache', cache):
+            metrics = {name: samples for name, kind, help_text, samples in retrievers.embedding_cache_metrics()}
+
+        self.assertIn(({'result': 'miss'}, 2), metrics['nizami_embedding_cache_lookups_total'])
+        self.assertEqual([({}, 2)], metrics['nizami_embedding_cache_entries'])
+
+
+class PruneQueryEmbeddingsTest(SimpleTestCase):
+    def test_deletes_rows_older_than_the_ttl(self):
+        from src.common.models import QueryEmbedding
+        from src.common.tasks import prune_query_embeddings_task
+
+        with mock.patch('src.settings.EMBEDDING_CACHE_DB_TTL_DAYS', 7), \
+                mock.patch.object(QueryEmbedding.objects, 'filter') as filter_:
+            filter_.return_value.delete.return_value = (3, {'common.QueryEmbedding': 3})
+            self.assertEqual(3, prune_query_embeddings_task())
+
+        cutoff = filter_.call_args.kwargs['created_at__lt']
+        self.assertAlmostEqual(7 * 86400, (timezone.now() - cutoff).total_seconds(), delta=60)
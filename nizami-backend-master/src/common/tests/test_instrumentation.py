@@ -0,0 +1,105 @@
+import asyncio
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.common import instrumentation
+from src.common.instrumentation import instrument_node, node_metrics, node_stats_sink, record_embedding_call
+
+
+def fake_llm():
+    return GenericFakeChatModel(messages=iter([AIMessage(
+        content='answer',
+        usage_metadata={'input_tokens': 1000, 'output_tokens': 200, 'total_tokens': 1200},
+        response_metadata={'model_name': 'gpt-4o-2024-08-06'},
+    )]))
+
+
+class InstrumentNodeTest(SimpleTestCase):
+    def setUp(self):
+        node_metrics.clear()
+        self.addCleanup(node_metrics.clear)
+        self.finished = []
+
+    def run_node(self, func, state=None):
+        with node_stats_sink(self.finished.append):
+            return instrument_node('answer', func)(state or {})
+
+    def test_collects_db_llm_and_embedding_usage(self):
+        llm = fake_llm()
+
+        def node(state):
+            instrumentation._db_wrapper(lambda *args: None, 'SELECT 1', None, False, {})
+            llm.invoke('question')
+            record_embedding_call(3)
+            return {'message': mock.Mock(id=42)}
+
+        self.run_node(node)
+
+        stats = self.finished[0].as_dict()
+        self.assertEqual(1, stats['db_queries'])
+        self.assertEqual(1, stats['llm_calls'])
+        self.assertEqual((1000, 200), (stats['prompt_tokens'], stats['completion_tokens']))
+        self.assertAlmostEqual(0.0045, stats['cost_usd'])
+        self.assertEqual((1, 3), (stats['embedding_calls'], stats['embedded_texts']))
+        self.assertEqual(42, self.finished[0].message_id)
+
+    def test_usage_outside_nodes_is_not_counted(self):
+        fake_llm().invoke('question')
+        record_embedding_call(1)
+
+        self.run_node(lambda state: {})
+
+        self.assertEqual((0, 0), (self.finished[0].llm_calls, self.finished[0].embedding_calls))
+
+    def test_async_nodes_and_errors(self):
+        async def node(state):
+            await fake_llm().ainvoke('question')
+            raise RuntimeError('boom')
+
+        with node_stats_sink(self.finished.append), self.assertRaises(RuntimeError):
+            asyncio.run(instrument_node('router', node)({}))
+
+        self.assertEqual(('RuntimeError', 1), (self.finished[0].error, self.finished[0].llm_calls))
+
+    def test_prometheus_text(self):
+        self.run_node(lambda state: fake_llm().invoke('question') and {})
+
+        text = node_metrics.render()
+
+        self.assertIn('nizami_graph_node_duration_seconds_count{node="answer"} 1', text)
+        self.assertIn(
+            'nizami_graph_node_llm_tokens_total{node="answer",model="gpt-4o-2024-08-06",kind="prompt"} 1000', text
+        )
+
+    def test_registered_sources_are_rendered(self):
+        def source():
+            return [('nizami_test_items', 'gauge', 'Items', [({'kind': 'a'}, 3)])]
+
+        instrumentation.register_metrics(source)
+        self.addCleanup(instrumentation._metric_sources.remove, source)
+
+        text = instrumentation.render_metrics()
+
+        self.assertIn('# TYPE nizami_test_items gauge', text)
+        self.assertIn('nizami_test_items{kind="a"} 3', text)
+
+
+class MetricsViewTest(SimpleTestCase):
+    def get(self, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return instrumentation.metrics_view(RequestFactory().get('/metrics', **headers))
+
+    def test_disabled_without_token(self):
+        with mock.patch('src.settings.METRICS_TOKEN', ''):
+            self.assertEqual(404, self.get('anything').status_code)
+
+    def test_requires_bearer_token(self):
+        with mock.patch('src.settings.METRICS_TOKEN', 'secret'):
+            self.assertEqual(403, self.get('wrong').status_code)
+            response = self.get('secret')
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
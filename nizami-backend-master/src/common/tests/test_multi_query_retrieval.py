@@ -0,0 +1,153 @@
+from unittest import mock
+
+from django.db import OperationalError, ProgrammingError
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+from psycopg.errors import UndefinedObject
+
+from src.common import retrievers
+from src.common.retrievers import FilteredRetriever, merge_retrieved_documents
+
+
+def doc(chunk_id, similarity, content=None):
+    return Document(page_content=content or f'chunk {chunk_id}', metadata={'id': chunk_id, 'similarity': similarity})
+
+
+class MergeRetrievedDocumentsTest(SimpleTestCase):
+    def test_dedupes_and_keeps_best_score(self):
+        merged = merge_retrieved_documents(
+            [doc('1', 0.8), doc('2', 0.6)],
+            [doc('2', 0.9), doc('3', 0.5)],
+        )
+
+        self.assertEqual(['2', '1', '3'], [d.metadata['id'] for d in merged])
+        self.assertEqual(0.9, merged[0].metadata['similarity'])
+
+
+class RetrievalSqlTestCase(SimpleTestCase):
+    def setUp(self):
+        self.cursor = mock.MagicMock()
+        connection = mock.MagicMock()
+        connection.cursor.return_value.__enter__.return_value = self.cursor
+        patcher = mock.patch.object(retrievers, 'connection', connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(retrievers, 'transaction')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        embeddings = mock.Mock(model='test-model', dimensions=2)
+        embeddings.embed_documents.side_effect = lambda texts: [[float(i), 1.0] for i, _ in enumerate(texts)]
+        self.embeddings = embeddings
+        patcher = mock.patch('src.settings.embeddings', embeddings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        retrievers.embedding_cache.clear()
+        self.addCleanup(retrievers.embedding_cache.clear)
+
+    def search_calls(self):
+        return [c for c in self.cursor.execute.call_args_list if not c[0][0].startswith('SET LOCAL')]
+
+
+class InvokeManyTest(RetrievalSqlTestCase):
+    def make_retriever(self):
+        with mock.patch('src.settings.RAG_SOURCE', 'old'):
+            return FilteredRetriever([7], k=2, vectorstore=mock.Mock())
+
+    def test_one_embedding_batch_and_one_query(self):
+        self.cursor.fetchall.return_value = [
+            (0, 1, 'first', {'reference_document_id': 7}, 0.7),
+            (0, 2, 'second', {'reference_document_id': 7}, 0.6),
+            (1, 2, 'second', {'reference_document_id': 7}, 0.8),
+        ]
+
+        docs = self.make_retriever().invoke_many(['ما هي مدة الإشعار؟', 'What is the notice period?', ''])
+
+        self.embeddings.embed_documents.assert_called_once_with(['ما هي مدة الإشعار؟', 'What is the notice period?'])
+        self.assertEqual(1, len(self.search_calls()))
+        self.assertEqual(['2', '1'], [d.metadata['id'] for d in docs])
+        self.assertEqual(0.8, docs[0].metadata['similarity'])
+
+    def test_falls_back_to_single_queries_when_sql_fails(self):
+        retriever = self.make_retriever()
+        self.cursor.execute.side_effect = lambda sql, *args: None if sql.startswith('SET LOCAL') else 1 / 0
+
+        with mock.patch.object(retriever, 'invoke', side_effect=[[doc('1', None)], [doc('1', None)]]) as invoke:
+            docs = retriever.invoke_many(['a', 'b'])
+
+        self.assertEqual(2, invoke.call_count)
+        self.assertEqual(['1'], [d.metadata['id'] for d in docs])
+
+
+class RagSourceTwoStageSearchTest(RetrievalSqlTestCase):
+    def test_shortlist_and_chunks_in_one_statement(self):
+        self.cursor.fetchone.return_value = ([4, 9], [
+            {'query_index': 0, 'id': 'a', 'content': 'first', 'rag_source_document_id': 4,
+             'chunk_index': 0, 'title': 'Labor Law', 'similarity': 0.7},
+            {'query_index': 1, 'id': 'b', 'content': 'second', 'rag_source_document_id': 9,
+             'chunk_index': 3, 'title': None, 'similarity': 0.6},
+        ])
+
+        ids, results = retrievers.rag_source_two_stage_search('مدة الإشعار', ['مدة الإشعار', 'notice period'])
+
+        # The shortlist text is also the first query, so only two texts are embedded
+        self.embeddings.embed_documents.assert_called_once_with(['مدة الإشعار', 'notice period'])
+        self.assertEqual(1, len(self.search_calls()))
+        self.assertIn('processed/MOJ/%', self.search_calls()[0][0][1])
+        self.assertEqual([4, 9], ids)
+        self.assertEqual([['a'], ['b']], [[d.metadata['id'] for d in docs] for docs in results])
+        self.assertEqual('Labor Law', results[0][0].metadata['title'])
+
+    def test_returns_none_on_failure(self):
+        self.cursor.execute.side_effect = lambda sql, *args: None if sql.startswith('SET LOCAL') else 1 / 0
+
+        self.assertIsNone(retrievers.rag_source_two_stage_search('q', ['q']))
+
+
+class VectorSearchSettingsTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(retrievers, 'transaction')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(retrievers, '_iterative_scan_supported', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sets_iterative_scan(self):
+        cursor = mock.Mock()
+
+        retrievers.apply_vector_search_settings(cursor, 'relaxed_order', 40, 1000)
+
+        self.assertEqual([
+            'SET LOCAL hnsw.ef_search = 40',
+            'SET LOCAL hnsw.iterative_scan = relaxed_order',
+            'SET LOCAL hnsw.max_scan_tuples = 1000',
+        ], [c[0][0] for c in cursor.execute.call_args_list])
+
+    def fail_on_iterative_scan(self, error):
+        def execute(sql):
+            if 'iterative_scan' in sql:
+                raise error
+        cursor = mock.Mock()
+        cursor.execute.side_effect = execute
+        return cursor
+
+    def test_old_pgvector_falls_back_to_ef_search_only(self):
+        error = ProgrammingError('unrecognized configuration parameter "hnsw.iterative_scan"')
+        error.__cause__ = UndefinedObject('unrecognized configuration parameter "hnsw.iterative_scan"')
+        cursor = self.fail_on_iterative_scan(error)
+
+        retrievers.apply_vector_search_settings(cursor, 'relaxed_order', 40, 1000)
+        cursor.execute.reset_mock()
+        retrievers.apply_vector_search_settings(cursor, 'relaxed_order', 40, 1000)
+
+        self.assertEqual(['SET LOCAL hnsw.ef_search = 40'], [c[0][0] for c in cursor.execute.call_args_list])
+        self.assertFalse(retrievers.iterative_scan_available())
+
+    def test_other_errors_do_not_disable_iterative_scan(self):
+        cursor = self.fail_on_iterative_scan(OperationalError('server closed the connection unexpectedly'))
+
+        with self.assertRaises(OperationalError):
+            retrievers.apply_vector_search_settings(cursor, 'relaxed_order', 40, 1000)
+
+        self.assertTrue(retrievers.iterative_scan_available())
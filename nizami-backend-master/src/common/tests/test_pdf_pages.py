@@ -0,0 +1,49 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from src.common import pdf_pages
+
+
+def _write_pdf(pages):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f'Page {i + 1}')
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    doc.save(path)
+    return path
+
+
+class PageRangesTest(SimpleTestCase):
+    def test_ranges_cover_all_pages_in_order(self):
+        ranges = pdf_pages.page_ranges(10, 4)
+
+        self.assertEqual(ranges, [(0, 3), (3, 6), (6, 8), (8, 10)])
+
+    def test_no_more_ranges_than_pages(self):
+        self.assertEqual(pdf_pages.page_ranges(2, 8), [(0, 1), (1, 2)])
+
+
+class ExtractPdfPagesTest(SimpleTestCase):
+    def setUp(self):
+        self.path = _write_pdf(12)
+        self.addCleanup(os.unlink, self.path)
+
+    def test_serial_below_threshold(self):
+        with mock.patch('src.settings.PDF_PARALLEL_MIN_PAGES', 100), \
+                mock.patch.object(pdf_pages, 'ProcessPoolExecutor') as pool:
+            pages = pdf_pages.extract_pdf_pages(self.path, workers=2)
+
+        pool.assert_not_called()
+        self.assertEqual([p.strip() for p in pages], [f'Page {i + 1}' for i in range(12)])
+
+    def test_process_pool_keeps_page_order(self):
+        with mock.patch('src.settings.PDF_PARALLEL_MIN_PAGES', 4):
+            pages = pdf_pages.extract_pdf_pages(self.path, workers=2)
+
+        self.assertEqual([p.strip() for p in pages], [f'Page {i + 1}' for i in range(12)])
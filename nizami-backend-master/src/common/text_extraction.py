@@ -1,7 +1,8 @@
 import docx
-import fitz  # PyMuPDF
 import magic
 
+from src.common.pdf_pages import extract_pdf_pages
+
 
 def extract_text_from_file(file_path):
     # Detect file type using python-magic (MIME type detection)
@@ -29,12 +30,8 @@ def extract_text_from_file(file_path):
 
 
 def extract_text_from_pdf(file_path):
-    # Extract text from a PDF file using PyMuPDF (fitz)
-    doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
+    # Extract text from a PDF file using PyMuPDF (fitz), page-sharded over processes for long documents
+    return "".join(extract_pdf_pages(file_path))
 
 
 def extract_text_from_docx(file_path):
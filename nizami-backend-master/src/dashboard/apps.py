@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class DashboardConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'src.dashboard'
+
+    def ready(self):
+        # Connect the dashboard counter receivers
+        import src.dashboard.counters  # noqa: F401
+        # Import tasks to register scheduled tasks
+        import src.dashboard.tasks  # noqa: F401
@@ -0,0 +1,180 @@
+"""
+Dashboard card totals without COUNT(*) on every load.
+
+Each counter is a DashboardCounter row, read in one query by get_counts():
+
+  - post_save (created) / post_delete receivers add or subtract 1. The changes of a transaction are summed and
+    applied with one UPDATE per counter when it commits (rolled back writes never count). For conditional counters
+    (rag_source_documents_embedded) the receivers compare the condition before and after the save;
+  - chats and messages have no post_delete receiver: a delete signal on a model turns off Django's fast-delete of
+    its cascade, so deleting a chat would load every message. Their deletions show up at the next refresh;
+  - refresh_counters() replaces every value with an exact COUNT(*), on the django-q schedule (every
+    DASHBOARD_COUNTER_REFRESH_MIN minutes). That corrects drift from writes that bypass signals
+    (QuerySet.update, bulk_create, raw SQL), from those deletions, and from savepoints rolled back inside a
+    committed transaction.
+
+A counter that has no row yet, before the first refresh, is served from the planner estimate (pg_class.reltuples)
+and an exact refresh is queued.
+"""
+
+import logging
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from src.chats.models import Chat, Message
+from src.dashboard.models import DashboardCounter
+from src.reference_documents.models import RagSourceDocument, ReferenceDocument
+from src.users.models import User
+
+logger = logging.getLogger(__name__)
+
+# name -> (model, condition the counted rows match, or None for all rows)
+COUNTERS = {
+    'users': (User, None),
+    'chats': (Chat, None),
+    'messages': (Message, None),
+    'reference_documents': (ReferenceDocument, None),
+    'rag_source_documents_embedded': (RagSourceDocument, {'is_embedded': True}),
+}
+
+# Counters whose deletions are left to refresh_counters(), so their cascades stay fast deletes
+DELETES_NOT_TRACKED = {'chats', 'messages'}
+
+_refresh_queued = False
+_pending = threading.local()
+
+
+def _matches(instance, condition):
+    return all(getattr(instance, field) == value for field, value in condition.items())
+
+
+def _apply(name, delta):
+    DashboardCounter.objects.filter(name=name).update(value=F('value') + delta, updated_at=timezone.now())
+
+
+class _Deltas(dict):
+    """{name: delta} of one transaction; registered with on_commit, which calls it."""
+
+    def __call__(self):
+        for name, delta in self.items():
+            if delta:
+                _apply(name, delta)
+
+
+def _registered(deltas):
+    # Committed or rolled back transactions leave run_on_commit, so a stale batch is not reused
+    return deltas is not None and any(entry[1] is deltas for entry in connection.run_on_commit)
+
+
+def bump(name, delta):
+    """Add delta to a counter when the current transaction commits (immediately outside one)."""
+    if not delta:
+        return
+    deltas = getattr(_pending, 'deltas', None)
+    if _registered(deltas):
+        deltas[name] = deltas.get(name, 0) + delta
+        return
+    deltas = _pending.deltas = _Deltas({name: delta})
+    transaction.on_commit(deltas)
+
+
+def _connect(name, model, condition):
+    flag = f'_dashboard_counted_{name}'
+
+    def on_init(sender, instance, **kwargs):
+        # Condition as loaded, to detect changes on save
+        setattr(instance, flag, _matches(instance, condition))
+
+    def on_save(sender, instance, created, **kwargs):
+        if condition is None:
+            if created:
+                bump(name, 1)
+            return
+        counted = _matches(instance, condition)
+        before = False if created else getattr(instance, flag, counted)
+        setattr(instance, flag, counted)
+        bump(name, int(counted) - int(before))
+
+    def on_delete(sender, instance, **kwargs):
+        if condition is None or getattr(instance, flag, _matches(instance, condition)):
+            bump(name, -1)
+
+    if condition is not None:
+        post_init.connect(on_init, sender=model, weak=False, dispatch_uid=f'dashboard_counter_init_{name}')
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=f'dashboard_counter_save_{name}')
+    if name not in DELETES_NOT_TRACKED:
+        post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=f'dashboard_counter_delete_{name}')
+
+
+for _name, (_model, _condition) in COUNTERS.items():
+    _connect(_name, _model, _condition)
+
+
+def _queryset(name):
+    model, condition = COUNTERS[name]
+    return model.objects.filter(**condition) if condition else model.objects.all()
+
+
+def refresh_counters(names=None) -> dict:
+    """Exact COUNT(*) of each counter (all by default), stored; returns {name: value}."""
+    values = {}
+    for name in names or COUNTERS:
+        value = _queryset(name).count()
+        DashboardCounter.objects.update_or_create(
+            name=name,
+            defaults={'value': value, 'counted_at': timezone.now()},
+        )
+        values[name] = value
+    return values
+
+
+def _estimate(name):
+    """Planner row estimate of an unconditional counter's table, or None."""
+    model, condition = COUNTERS[name]
+    if condition is not None or connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1: never vacuumed / analyzed
+    return row[0] if row and row[0] >= 0 else None
+
+
+def _queue_refresh():
+    global _refresh_queued
+    if _refresh_queued:
+        return
+    _refresh_queued = True
+    try:
+        from django_q.tasks import async_task
+
+        async_task('src.dashboard.tasks.refresh_counters_task', task_name='refresh-dashboard-counters')
+    except Exception as e:
+        _refresh_queued = False
+        logger.error("Could not queue dashboard counter refresh: %s", e, exc_info=True)
+
+
+def get_counts() -> dict:
+    """{name: value} of every counter in one query."""
+    values = dict(DashboardCounter.objects.filter(name__in=COUNTERS).values_list('name', 'value'))
+    missing = [name for name in COUNTERS if name not in values]
+    if not missing:
+        return values
+
+    exact = []
+    for name in missing:
+        estimate = _estimate(name)
+        if estimate is None:
+            exact.append(name)
+        else:
+            values[name] = estimate
+    if exact:
+        # Conditional counters have no planner estimate; counted once here, then maintained
+        values.update(refresh_counters(exact))
+    if len(exact) < len(missing):
+        _queue_refresh()
+    return values
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from src.dashboard.rollups import rebuild_rollups, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold new MessageStepLog / MessageTrace rows into the dashboard latency rollups (the scheduled task does '
+        'the same every DASHBOARD_ROLLUP_INTERVAL_MIN minutes). --rebuild starts over from the first log row.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop the rollups and fold all log rows again')
+        parser.add_argument('--batch-size', type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild_rollups()
+            self.stdout.write('Dropped the existing rollups')
+
+        folded = refresh_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{source}: {count} rows folded' for source, count in folded.items())
+        ))
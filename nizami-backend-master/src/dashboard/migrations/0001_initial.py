@@ -0,0 +1,82 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('chats', '0025_messagetrace'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageLatencyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(unique=True)),
+                ('messages', models.IntegerField(default=0)),
+                ('total_sec', models.FloatField(default=0)),
+                ('max_sec', models.FloatField(default=0)),
+                ('histogram', models.JSONField(default=dict)),
+            ],
+            options={
+                'db_table': 'dashboard_message_latency_rollup',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'dashboard_rollup_watermark',
+            },
+        ),
+        migrations.CreateModel(
+            name='SlowMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('trace_id', models.BigIntegerField()),
+                ('wall_sec', models.FloatField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'dashboard_slow_message',
+            },
+        ),
+        migrations.CreateModel(
+            name='StepLatencyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(db_index=True)),
+                ('step_name', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+                ('total_sec', models.FloatField(default=0)),
+                ('max_sec', models.FloatField(default=0)),
+                ('histogram', models.JSONField(default=dict)),
+            ],
+            options={
+                'db_table': 'dashboard_step_latency_rollup',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='steplatencyrollup',
+            constraint=models.UniqueConstraint(fields=('bucket_start', 'step_name'), name='uniq_step_latency_rollup'),
+        ),
+        migrations.AddField(
+            model_name='slowmessage',
+            name='message',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='chats.message'),
+        ),
+        migrations.AddIndex(
+            model_name='slowmessage',
+            index=models.Index(fields=['bucket_start', '-wall_sec'], name='dashboard_s_bucket__ba7aae_idx'),
+        ),
+    ]
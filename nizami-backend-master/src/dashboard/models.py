@@ -0,0 +1,87 @@
+from django.db import models
+
+from src.chats.models import Message
+
+
+class StepLatencyRollup(models.Model):
+    """
+    Hourly aggregate of MessageStepLog.time_sec per step_name (src/dashboard/rollups.py).
+    `histogram` maps latency bucket index -> count, see rollups.bucket_index.
+    """
+
+    class Meta:
+        db_table = 'dashboard_step_latency_rollup'
+        constraints = [
+            models.UniqueConstraint(fields=['bucket_start', 'step_name'], name='uniq_step_latency_rollup'),
+        ]
+
+    id = models.BigAutoField(auto_created=True, primary_key=True, serialize=True, verbose_name='ID')
+    bucket_start = models.DateTimeField(db_index=True)
+    step_name = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+    total_sec = models.FloatField(default=0)
+    max_sec = models.FloatField(default=0)
+    histogram = models.JSONField(default=dict)
+
+
+class MessageLatencyRollup(models.Model):
+    """
+    Hourly aggregate of chat graph runs (MessageTrace.wall_sec): throughput and end-to-end latency.
+    """
+
+    class Meta:
+        db_table = 'dashboard_message_latency_rollup'
+
+    id = models.BigAutoField(auto_created=True, primary_key=True, serialize=True, verbose_name='ID')
+    bucket_start = models.DateTimeField(unique=True)
+    messages = models.IntegerField(default=0)
+    total_sec = models.FloatField(default=0)
+    max_sec = models.FloatField(default=0)
+    histogram = models.JSONField(default=dict)
+
+
+class SlowMessage(models.Model):
+    """
+    The slowest graph runs of each hour (DASHBOARD_SLOW_MESSAGES_PER_HOUR of them).
+    """
+
+    class Meta:
+        db_table = 'dashboard_slow_message'
+        indexes = [
+            models.Index(fields=['bucket_start', '-wall_sec']),
+        ]
+
+    id = models.BigAutoField(auto_created=True, primary_key=True, serialize=True, verbose_name='ID')
+    bucket_start = models.DateTimeField()
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, null=True)
+    trace_id = models.BigIntegerField()
+    wall_sec = models.FloatField()
+    created_at = models.DateTimeField()
+
+
+class RollupWatermark(models.Model):
+    """
+    Last source row id folded into the rollups, per source table.
+    """
+
+    class Meta:
+        db_table = 'dashboard_rollup_watermark'
+
+    name = models.CharField(max_length=64, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class DashboardCounter(models.Model):
+    """
+    Row count behind a dashboard card, kept current by src/dashboard/counters.py.
+    """
+
+    class Meta:
+        db_table = 'dashboard_counter'
+
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    # Last exact COUNT(*); signal increments keep the value current in between
+    counted_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,322 @@
+"""
+Hourly latency rollups behind the dashboard latency endpoint.
+
+refresh_rollups() (django-q schedule, every DASHBOARD_ROLLUP_INTERVAL_MIN minutes, or the refresh_dashboard_rollups
+command) folds the MessageStepLog and MessageTrace rows written since its last run into:
+
+  StepLatencyRollup     per (hour, step_name): count, total, max and a latency histogram
+  MessageLatencyRollup  per hour: graph runs (throughput), total, max and a histogram of their wall time
+  SlowMessage           the DASHBOARD_SLOW_MESSAGES_PER_HOUR slowest graph runs of each hour
+
+The schedule shares the django-q cluster with extraction tasks that can run for hours, so the latency endpoint also
+folds one batch inline (refresh_rollups_if_stale) when the last fold is more than STALE_INTERVALS intervals old.
+
+Each source row is read once: a RollupWatermark per source table stores the last folded id. Rows younger than
+DASHBOARD_ROLLUP_LAG_SEC are left for the next run, so rows of transactions that commit late are not skipped.
+
+Histograms count latencies in log-spaced buckets (BUCKET_GROWTH apart, i.e. percentiles are within 10%); hourly
+histograms of any window merge by adding counts, so the endpoint never touches the log tables.
+"""
+
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from src.chats.models import MessageStepLog, MessageTrace
+from src.dashboard.models import MessageLatencyRollup, RollupWatermark, SlowMessage, StepLatencyRollup
+
+BUCKET_BASE_SEC = 0.01
+BUCKET_GROWTH = 1.1
+MAX_BUCKET = 200
+
+STALE_INTERVALS = 3
+
+STEP_SOURCE = 'message_step_log'
+TRACE_SOURCE = 'message_trace'
+
+
+def bucket_index(seconds) -> int:
+    if seconds is None or seconds <= BUCKET_BASE_SEC:
+        return 0
+    return min(math.ceil(math.log(seconds / BUCKET_BASE_SEC, BUCKET_GROWTH)), MAX_BUCKET)
+
+
+def bucket_upper_sec(index) -> float:
+    return BUCKET_BASE_SEC * BUCKET_GROWTH ** index
+
+
+def hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class LatencyAggregate:
+    """count / total / max / histogram of a set of latencies; merges with rollup rows and other aggregates."""
+
+    def __init__(self, count=0, total_sec=0.0, max_sec=0.0, histogram=None):
+        self.count = count
+        self.total_sec = total_sec
+        self.max_sec = max_sec
+        self.histogram = {int(k): v for k, v in (histogram or {}).items()}
+
+    def add(self, seconds):
+        seconds = seconds or 0.0
+        self.count += 1
+        self.total_sec += seconds
+        self.max_sec = max(self.max_sec, seconds)
+        index = bucket_index(seconds)
+        self.histogram[index] = self.histogram.get(index, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total_sec += other.total_sec
+        self.max_sec = max(self.max_sec, other.max_sec)
+        for index, count in other.histogram.items():
+            self.histogram[index] = self.histogram.get(index, 0) + count
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.histogram):
+            seen += self.histogram[index]
+            if seen >= rank:
+                return min(bucket_upper_sec(index), self.max_sec)
+        return self.max_sec
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'avg_sec': self.total_sec / self.count if self.count else None,
+            'p50_sec': self.percentile(0.50),
+            'p95_sec': self.percentile(0.95),
+            'p99_sec': self.percentile(0.99),
+            'max_sec': self.max_sec if self.count else None,
+        }
+
+    def store(self, row):
+        row.total_sec = self.total_sec
+        row.max_sec = self.max_sec
+        row.histogram = {str(k): v for k, v in sorted(self.histogram.items())}
+
+    @classmethod
+    def of(cls, row, count_field='count'):
+        return cls(getattr(row, count_field), row.total_sec, row.max_sec, row.histogram)
+
+
+def aggregate_steps(rows) -> dict:
+    """(hour, step_name) -> LatencyAggregate for (id, step_name, time_sec, created_at) rows."""
+    aggregates = {}
+    for _, step_name, time_sec, created_at in rows:
+        key = (hour_start(created_at), step_name or '')
+        aggregates.setdefault(key, LatencyAggregate()).add(time_sec)
+    return aggregates
+
+
+def _settled(rows, cutoff):
+    """Leading rows (in id order) created before cutoff; later ones wait for the next run."""
+    for i, row in enumerate(rows):
+        if row[-1] >= cutoff:
+            return rows[:i]
+    return rows
+
+
+def _fold(source, queryset, fields, apply, batch_size, cutoff):
+    with transaction.atomic():
+        # The row lock keeps concurrent refreshes from folding the same rows twice
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=source)
+        rows = list(
+            queryset.filter(id__gt=watermark.last_id)
+            .order_by('id')
+            .values_list(*fields)[:batch_size]
+        )
+        rows = _settled(rows, cutoff)
+        if not rows:
+            return 0
+        apply(rows)
+        watermark.last_id = rows[-1][0]
+        watermark.save()
+    return len(rows)
+
+
+def _apply_steps(rows):
+    aggregates = aggregate_steps(rows)
+    existing = {
+        (row.bucket_start, row.step_name): row
+        for row in StepLatencyRollup.objects.filter(
+            bucket_start__in={hour for hour, _ in aggregates},
+            step_name__in={step for _, step in aggregates},
+        )
+    }
+    to_create, to_update = [], []
+    for (hour, step_name), aggregate in aggregates.items():
+        row = existing.get((hour, step_name))
+        if row is None:
+            row = StepLatencyRollup(bucket_start=hour, step_name=step_name)
+            to_create.append(row)
+        else:
+            aggregate.merge(LatencyAggregate.of(row))
+            to_update.append(row)
+        row.count = aggregate.count
+        aggregate.store(row)
+    StepLatencyRollup.objects.bulk_create(to_create)
+    StepLatencyRollup.objects.bulk_update(to_update, ['count', 'total_sec', 'max_sec', 'histogram'])
+
+
+def _apply_traces(rows):
+    from src.settings import DASHBOARD_SLOW_MESSAGES_PER_HOUR
+
+    by_hour = {}
+    for row in rows:
+        by_hour.setdefault(hour_start(row[-1]), []).append(row)
+
+    existing = {row.bucket_start: row for row in MessageLatencyRollup.objects.filter(bucket_start__in=by_hour)}
+    to_create, to_update = [], []
+    for hour, hour_rows in by_hour.items():
+        aggregate = LatencyAggregate()
+        for _, _, wall_sec, _ in hour_rows:
+            aggregate.add(wall_sec)
+        row = existing.get(hour)
+        if row is None:
+            row = MessageLatencyRollup(bucket_start=hour)
+            to_create.append(row)
+        else:
+            aggregate.merge(LatencyAggregate.of(row, 'messages'))
+            to_update.append(row)
+        row.messages = aggregate.count
+        aggregate.store(row)
+
+        ranked = sorted(
+            list(SlowMessage.objects.filter(bucket_start=hour)) + [
+                SlowMessage(bucket_start=hour, trace_id=trace_id, message_id=message_id, wall_sec=wall_sec or 0,
+                            created_at=created_at)
+                for trace_id, message_id, wall_sec, created_at in hour_rows
+            ],
+            key=lambda slow: slow.wall_sec,
+            reverse=True,
+        )
+        top, rest = ranked[:DASHBOARD_SLOW_MESSAGES_PER_HOUR], ranked[DASHBOARD_SLOW_MESSAGES_PER_HOUR:]
+        SlowMessage.objects.filter(id__in=[slow.id for slow in rest if slow.id is not None]).delete()
+        SlowMessage.objects.bulk_create([slow for slow in top if slow.id is None])
+
+    MessageLatencyRollup.objects.bulk_create(to_create)
+    MessageLatencyRollup.objects.bulk_update(to_update, ['messages', 'total_sec', 'max_sec', 'histogram'])
+
+
+def refresh_rollups(batch_size=20_000, max_batches=None) -> dict:
+    """
+    Fold new step logs and traces into the rollups; returns the number of rows folded per source.
+    """
+    from src.settings import DASHBOARD_ROLLUP_LAG_SEC
+
+    cutoff = timezone.now() - timedelta(seconds=DASHBOARD_ROLLUP_LAG_SEC)
+    sources = (
+        (STEP_SOURCE, MessageStepLog.objects.all(), ('id', 'step_name', 'time_sec', 'created_at'), _apply_steps),
+        (TRACE_SOURCE, MessageTrace.objects.all(), ('id', 'message_id', 'wall_sec', 'created_at'), _apply_traces),
+    )
+    folded = {}
+    for source, queryset, fields, apply in sources:
+        folded[source] = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = _fold(source, queryset, fields, apply, batch_size, cutoff)
+            folded[source] += count
+            batches += 1
+            if count < batch_size:
+                break
+    return folded
+
+
+def refresh_rollups_if_stale(now=None):
+    """
+    refresh_rollups(max_batches=1) when no source was folded in the last STALE_INTERVALS schedule intervals, e.g.
+    because the schedule waits behind long tasks; returns the rows folded per source, or None when fresh.
+    """
+    from src.settings import DASHBOARD_ROLLUP_INTERVAL_MIN
+
+    now = now or timezone.now()
+    watermarks = RollupWatermark.objects.filter(name__in=[STEP_SOURCE, TRACE_SOURCE])
+    newest = max(watermarks.values_list('updated_at', flat=True), default=None)
+    if newest is not None and now - newest < timedelta(minutes=STALE_INTERVALS * DASHBOARD_ROLLUP_INTERVAL_MIN):
+        return None
+    return refresh_rollups(max_batches=1)
+
+
+def rebuild_rollups():
+    """Drop all rollups and watermarks; the next refresh folds the log tables from the start."""
+    with transaction.atomic():
+        StepLatencyRollup.objects.all().delete()
+        MessageLatencyRollup.objects.all().delete()
+        SlowMessage.objects.all().delete()
+        RollupWatermark.objects.filter(name__in=[STEP_SOURCE, TRACE_SOURCE]).delete()
+
+
+def _merge_steps(rows, steps=None):
+    merged = {}
+    for row in rows:
+        if steps and row.step_name not in steps:
+            continue
+        merged.setdefault(row.step_name, LatencyAggregate()).merge(LatencyAggregate.of(row))
+    return merged
+
+
+def latency_report(hours=24, steps=None, slowest=20, now=None) -> dict:
+    """
+    Per-step and end-to-end latency percentiles, hourly throughput and the slowest messages of the last `hours`
+    hours (whole hours, the current one included), with the p95 of the preceding window of the same length.
+    """
+    now = now or timezone.now()
+    start = hour_start(now) - timedelta(hours=hours - 1)
+    previous_start = start - timedelta(hours=hours)
+
+    step_rows = list(StepLatencyRollup.objects.filter(bucket_start__gte=previous_start))
+    current = _merge_steps([r for r in step_rows if r.bucket_start >= start], steps)
+    previous = _merge_steps([r for r in step_rows if r.bucket_start < start], steps)
+
+    message_rows = list(MessageLatencyRollup.objects.filter(bucket_start__gte=start).order_by('bucket_start'))
+    messages = LatencyAggregate()
+    for row in message_rows:
+        messages.merge(LatencyAggregate.of(row, 'messages'))
+
+    step_summaries = []
+    for step_name, aggregate in sorted(current.items(), key=lambda item: -item[1].total_sec):
+        summary = {'step_name': step_name, **aggregate.summary()}
+        previous_p95 = previous[step_name].percentile(0.95) if step_name in previous else None
+        summary['previous_p95_sec'] = previous_p95
+        summary['p95_change'] = (
+            summary['p95_sec'] / previous_p95 - 1 if previous_p95 and summary['p95_sec'] is not None else None
+        )
+        step_summaries.append(summary)
+
+    slow = (
+        SlowMessage.objects
+        .filter(bucket_start__gte=start)
+        .select_related('message')
+        .order_by('-wall_sec')[:slowest]
+    )
+    watermarks = dict(RollupWatermark.objects.values_list('name', 'updated_at'))
+
+    return {
+        'window_hours': hours,
+        'from': start,
+        'to': now,
+        'rolled_up_at': max(watermarks.values()) if watermarks else None,
+        'steps': step_summaries,
+        'messages': messages.summary(),
+        'throughput': [
+            {'hour': row.bucket_start, 'messages': row.messages} for row in message_rows
+        ],
+        'slowest_messages': [
+            {
+                'message_id': s.message_id,
+                'message_uuid': s.message.uuid if s.message else None,
+                'chat_id': s.message.chat_id if s.message else None,
+                'trace_id': s.trace_id,
+                'wall_sec': s.wall_sec,
+                'created_at': s.created_at,
+            }
+            for s in slow
+        ],
+    }
@@ -0,0 +1,67 @@
+import logging
+
+from django.db import transaction
+from django_q.models import Schedule
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_rollups_task():
+    from src.dashboard.rollups import refresh_rollups
+
+    folded = refresh_rollups()
+    if any(folded.values()):
+        logger.info("Dashboard rollups refreshed: %s", folded)
+    return folded
+
+
+def refresh_counters_task():
+    from src.dashboard.counters import refresh_counters
+
+    return refresh_counters()
+
+
+def setup_rollup_schedule():
+    from src.settings import DASHBOARD_ROLLUP_INTERVAL_MIN
+
+    try:
+        with transaction.atomic():
+            _, created = Schedule.objects.get_or_create(
+                name="refresh_dashboard_rollups",
+                defaults={
+                    'func': 'src.dashboard.tasks.refresh_rollups_task',
+                    'schedule_type': 'I',  # interval schedule
+                    'minutes': DASHBOARD_ROLLUP_INTERVAL_MIN,
+                    'repeats': -1,  # run forever
+                }
+            )
+
+            if created:
+                logger.info("Scheduled task 'refresh_dashboard_rollups' created successfully")
+    except Exception as e:
+        logger.error(f"Error setting up dashboard rollup schedule: {str(e)}", exc_info=True)
+
+
+def setup_counter_schedule():
+    from src.settings import DASHBOARD_COUNTER_REFRESH_MIN
+
+    try:
+        with transaction.atomic():
+            _, created = Schedule.objects.get_or_create(
+                name="refresh_dashboard_counters",
+                defaults={
+                    'func': 'src.dashboard.tasks.refresh_counters_task',
+                    'schedule_type': 'I',  # interval schedule
+                    'minutes': DASHBOARD_COUNTER_REFRESH_MIN,
+                    'repeats': -1,  # run forever
+                }
+            )
+
+            if created:
+                logger.info("Scheduled task 'refresh_dashboard_counters' created successfully")
+    except Exception as e:
+        logger.error(f"Error setting up dashboard counter schedule: {str(e)}", exc_info=True)
+
+
+setup_rollup_schedule()
+setup_counter_schedule()
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.db.models.signals import post_delete, post_save
+from django.test import SimpleTestCase
+
+from src.chats.models import Chat, Message
+from src.dashboard import counters
+from src.reference_documents.models import RagSourceDocument, ReferenceDocument
+
+
+class CounterSignalsTest(SimpleTestCase):
+    def setUp(self):
+        counters._pending.deltas = None
+        patcher = mock.patch.object(counters, '_apply')
+        self.apply = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_created_rows_are_counted(self):
+        document = ReferenceDocument(id=1)
+
+        post_save.send(sender=ReferenceDocument, instance=document, created=True)
+        post_save.send(sender=ReferenceDocument, instance=document, created=False)
+        post_delete.send(sender=ReferenceDocument, instance=document)
+
+        self.assertEqual(
+            [mock.call('reference_documents', 1), mock.call('reference_documents', -1)],
+            self.apply.call_args_list,
+        )
+
+    def test_chat_and_message_deletes_keep_fast_delete(self):
+        for model in (Chat, Message):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(post_delete.has_listeners(model))
+                self.assertTrue(post_save.has_listeners(model))
+
+    def test_conditional_counter_follows_transitions(self):
+        document = RagSourceDocument(id=1, is_embedded=False)
+
+        post_save.send(sender=RagSourceDocument, instance=document, created=False)
+        document.is_embedded = True
+        post_save.send(sender=RagSourceDocument, instance=document, created=False)
+        post_save.send(sender=RagSourceDocument, instance=document, created=False)
+        post_delete.send(sender=RagSourceDocument, instance=document)
+
+        self.assertEqual(
+            [mock.call('rag_source_documents_embedded', 1), mock.call('rag_source_documents_embedded', -1)],
+            self.apply.call_args_list,
+        )
+
+    def test_one_update_per_counter_per_transaction(self):
+        with mock.patch.object(counters.transaction, 'on_commit') as on_commit, \
+                mock.patch.object(counters, '_registered', side_effect=lambda deltas: deltas is not None):
+            for i in range(3):
+                post_save.send(sender=Chat, instance=Chat(id=i), created=True)
+            post_save.send(sender=ReferenceDocument, instance=ReferenceDocument(id=1), created=True)
+            post_delete.send(sender=ReferenceDocument, instance=ReferenceDocument(id=2))
+
+        on_commit.assert_called_once()
+        on_commit.call_args[0][0]()
+        self.assertEqual([mock.call('chats', 3)], self.apply.call_args_list)
+
+    def test_rolled_back_writes_are_not_counted(self):
+        with mock.patch.object(counters.transaction, 'on_commit') as on_commit:
+            post_save.send(sender=Chat, instance=Chat(id=1), created=True)
+
+        self.apply.assert_not_called()
+        on_commit.call_args[0][0]()
+        self.apply.assert_called_once_with('chats', 1)
+
+
+class GetCountsTest(SimpleTestCase):
+    def stored(self, values):
+        patcher = mock.patch.object(counters.DashboardCounter.objects, 'filter')
+        self.addCleanup(patcher.stop)
+        patcher.start().return_value.values_list.return_value = list(values.items())
+
+    def test_served_from_counter_rows(self):
+        values = {name: i for i, name in enumerate(counters.COUNTERS)}
+        self.stored(values)
+
+        with mock.patch.object(counters, 'refresh_counters') as refresh:
+            self.assertEqual(values, counters.get_counts())
+        refresh.assert_not_called()
+
+    def test_missing_counters_use_estimates_and_queue_a_refresh(self):
+        self.stored({'users': 5})
+
+        with mock.patch.object(counters, '_estimate', side_effect=lambda name: None if 'rag' in name else 100), \
+                mock.patch.object(counters, 'refresh_counters', return_value={'rag_source_documents_embedded': 3}), \
+                mock.patch.object(counters, '_queue_refresh') as queue_refresh:
+            values = counters.get_counts()
+
+        self.assertEqual(5, values['users'])
+        self.assertEqual(100, values['messages'])
+        self.assertEqual(3, values['rag_source_documents_embedded'])
+        queue_refresh.assert_called_once()
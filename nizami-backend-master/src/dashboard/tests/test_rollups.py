@@ -0,0 +1,108 @@
+import random
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from src.dashboard import views
+from src.dashboard.models import StepLatencyRollup
+from src.dashboard import rollups
+from src.dashboard.rollups import LatencyAggregate, _merge_steps, _settled, aggregate_steps
+
+
+def at(hour, minute=0):
+    return datetime(2025, 5, 1, hour, minute, tzinfo=timezone.utc)
+
+
+class LatencyAggregateTest(SimpleTestCase):
+    def test_percentiles_within_bucket_error(self):
+        rng = random.Random(1)
+        latencies = sorted(rng.lognormvariate(0, 1) for _ in range(5000))
+        aggregate = LatencyAggregate()
+        for latency in latencies:
+            aggregate.add(latency)
+
+        for q in (0.5, 0.95, 0.99):
+            exact = latencies[int(q * len(latencies)) - 1]
+            self.assertAlmostEqual(exact, aggregate.percentile(q), delta=exact * 0.1)
+        self.assertEqual(latencies[-1], aggregate.summary()['max_sec'])
+
+    def test_hourly_rollups_merge_like_the_raw_latencies(self):
+        first, second, combined = LatencyAggregate(), LatencyAggregate(), LatencyAggregate()
+        for i, latency in enumerate([0.2, 1.5, 3.0, 0.4, 12.0, 0.9]):
+            (first if i % 2 else second).add(latency)
+            combined.add(latency)
+
+        row = StepLatencyRollup(count=0)
+        first.store(row)
+        row.count = first.count
+        merged = LatencyAggregate.of(row)
+        merged.merge(second)
+
+        self.assertEqual(combined.summary(), merged.summary())
+
+    def test_empty(self):
+        self.assertIsNone(LatencyAggregate().summary()['p95_sec'])
+
+
+class FoldTest(SimpleTestCase):
+    def test_rows_grouped_by_hour_and_step(self):
+        aggregates = aggregate_steps([
+            (1, 'router', 0.5, at(10, 5)),
+            (2, 'router', 1.5, at(10, 55)),
+            (3, 'router', 0.7, at(11, 1)),
+            (4, 'answer_legal_question', 9.0, at(10, 30)),
+        ])
+
+        self.assertEqual(2, aggregates[(at(10), 'router')].count)
+        self.assertEqual(1, aggregates[(at(11), 'router')].count)
+        self.assertEqual(9.0, aggregates[(at(10), 'answer_legal_question')].max_sec)
+
+    def test_rows_after_an_unsettled_one_wait(self):
+        rows = [(1, 'a', 1.0, at(10)), (2, 'a', 1.0, at(12)), (3, 'a', 1.0, at(10))]
+
+        self.assertEqual(rows[:1], _settled(rows, cutoff=at(11)))
+
+    def test_merge_filters_steps(self):
+        rows = [StepLatencyRollup(step_name='router', count=1, total_sec=1, max_sec=1, histogram={'0': 1}),
+                StepLatencyRollup(step_name='other', count=1, total_sec=1, max_sec=1, histogram={'0': 1})]
+
+        self.assertEqual(['router'], list(_merge_steps(rows, steps=['router'])))
+
+
+class RefreshIfStaleTest(SimpleTestCase):
+    def refresh(self, folded_at):
+        with mock.patch.object(rollups.RollupWatermark.objects, 'filter') as filter_, \
+                mock.patch.object(rollups, 'refresh_rollups', return_value={}) as refresh_rollups, \
+                mock.patch('src.settings.DASHBOARD_ROLLUP_INTERVAL_MIN', 1):
+            filter_.return_value.values_list.return_value = folded_at
+            rollups.refresh_rollups_if_stale(now=at(12))
+        return refresh_rollups
+
+    def test_fresh_rollups_are_not_refreshed(self):
+        self.refresh([at(11, 58), at(11, 40)]).assert_not_called()
+
+    def test_stale_rollups_fold_one_batch_inline(self):
+        self.refresh([at(11, 50), at(11, 40)]).assert_called_once_with(max_batches=1)
+        self.refresh([]).assert_called_once_with(max_batches=1)
+
+
+class LatencyViewTest(SimpleTestCase):
+    def get(self, **params):
+        request = APIRequestFactory().get('/api/v1/admin/dashboard/latency', params)
+        force_authenticate(request, user=mock.Mock(is_authenticated=True, is_superuser=True))
+        return views.get_latency(request)
+
+    def test_window_is_passed_as_hours(self):
+        with mock.patch.object(views, 'latency_report', return_value={}) as report, \
+                mock.patch.object(views, 'refresh_rollups_if_stale') as refresh:
+            response = self.get(window='7d', steps='router,answer_legal_question')
+
+        self.assertEqual(200, response.status_code)
+        report.assert_called_once_with(hours=168, steps=['router', 'answer_legal_question'], slowest=20)
+        refresh.assert_called_once_with()
+
+    def test_invalid_window(self):
+        self.assertEqual(400, self.get(window='2w').status_code)
+        self.assertEqual(400, self.get(hours='0').status_code)
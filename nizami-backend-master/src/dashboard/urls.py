@@ -1,7 +1,8 @@
 from django.urls import path
 
-from src.dashboard.views import get_cards
+from src.dashboard.views import get_cards, get_latency
 
 urlpatterns = [
     path('cards', get_cards),
+    path('latency', get_latency),
 ]
@@ -1,44 +1,77 @@
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from ..chats.models import Chat, Message
 from ..common.permissions import IsAdminPermission
-from ..reference_documents.models import ReferenceDocument, RagSourceDocument
+from ..dashboard.counters import get_counts
+from ..dashboard.rollups import latency_report, refresh_rollups_if_stale
 from ..settings import RAG_SOURCE
-from ..users.models import User
 
 
 @api_view(['GET'])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAdminPermission])
 def get_cards(request):
+    counts = get_counts()
     return Response([
         {
             'icon': 'heroUsers',
             'title': 'Users',
-            'body': User.objects.count(),
+            'body': counts['users'],
         },
         {
             'icon': 'heroChatBubbleOvalLeftEllipsis',
             'title': 'Chats',
-            'body': Chat.objects.count(),
+            'body': counts['chats'],
         },
         {
             'icon': 'heroDocument',
             'title': 'Documents (Reference)' if RAG_SOURCE == 'new' else 'Documents',
-            'body': ReferenceDocument.objects.count(),
+            'body': counts['reference_documents'],
         },
         *(
             [{
                 'icon': 'heroDocument',
                 'title': 'Documents (RAG Source)',
-                'body': RagSourceDocument.objects.filter(is_embedded=True).count(),
+                'body': counts['rag_source_documents_embedded'],
             }] if RAG_SOURCE == 'new' else []
         ),
         {
             'icon': 'heroChatBubbleBottomCenterText',
             'title': 'Messages',
-            'body': Message.objects.count(),
+            'body': counts['messages'],
         },
     ])
+
+
+LATENCY_WINDOWS = {'1h': 1, '6h': 6, '24h': 24, '7d': 24 * 7, '30d': 24 * 30}
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAdminPermission])
+def get_latency(request):
+    """
+    Latency percentiles per step, end-to-end message latency, hourly throughput and the slowest messages, from the
+    hourly rollups (src/dashboard/rollups.py), folding one batch of new rows first when the schedule has fallen behind.
+
+    window: 1h, 6h, 24h (default), 7d or 30d; hours: any whole number of hours instead (max 30 days)
+    steps: comma-separated step names to report (default all)
+    slowest: number of slowest messages (default 20, max 100)
+    """
+    try:
+        if 'hours' in request.query_params:
+            hours = int(request.query_params['hours'])
+        else:
+            hours = LATENCY_WINDOWS[request.query_params.get('window', '24h')]
+        slowest = int(request.query_params.get('slowest', 20))
+    except (KeyError, ValueError):
+        raise ValidationError({'window': f"Use hours=<n> or window={'/'.join(LATENCY_WINDOWS)}"})
+    if not 1 <= hours <= LATENCY_WINDOWS['30d'] or not 0 <= slowest <= 100:
+        raise ValidationError({'window': 'hours must be 1..720 and slowest 0..100'})
+
+    steps = [s for s in request.query_params.get('steps', '').split(',') if s] or None
+
+    refresh_rollups_if_stale()
+    return Response(latency_report(hours=hours, steps=steps, slowest=slowest))
@@ -4,7 +4,6 @@ import logging
 from typing import Any, Dict, Optional
 
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 
 from src import settings
@@ -36,10 +35,11 @@ def classify_with_llm(text: str, config: GibberishConfig) -> Optional[Dict[str,
         return None
     
     try:
-        # Create LLM with structured output
-        llm = ChatOpenAI(
-            openai_api_key=settings.OPENAI_API_KEY,
-            model_name='gpt-4o-mini',
+        from src.chats.utils import create_llm
+
+        # Create LLM with structured output (shared pooled client)
+        llm = create_llm(
+            'gpt-4o-mini',
             temperature=0.1,
             request_timeout=10,  # Fast timeout for this check
         )
@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.utils import timezone
+
 from .models import Prompt
+from .registry import prompt_registry
 
 
 @admin.register(Prompt)
@@ -11,6 +14,7 @@ class PromptAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['title', 'name', 'description']
     readonly_fields = ['id', 'created_at']
+    actions = ['reload_in_workers']
     
     fieldsets = (
         ('Basic Information', {
@@ -34,3 +38,12 @@ class PromptAdmin(admin.ModelAdmin):
             return list(self.readonly_fields) + ['name']
         return self.readonly_fields
 
+    @admin.action(description='Reload prompts and chat graphs in every worker')
+    def reload_in_workers(self, request, queryset):
+        """
+        Bump updated_at so every worker sees a new prompt version within PROMPT_REGISTRY_CHECK_SEC, reloads its
+        prompts and recompiles its chat graphs (this process does it on the next request).
+        """
+        updated = queryset.update(updated_at=timezone.now())
+        prompt_registry.invalidate()
+        self.message_user(request, f'{updated} prompt(s) touched; workers reload within a few seconds.')
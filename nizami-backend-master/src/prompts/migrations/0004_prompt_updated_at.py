@@ -0,0 +1,18 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0003_update_legal_advice_prompt_simple'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prompt',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 
 class Prompt(models.Model):
@@ -9,6 +11,14 @@ class Prompt(models.Model):
     value = models.TextField(null=False, blank=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.title} ({self.name})"
+
+
+@receiver([post_save, post_delete], sender=Prompt)
+def invalidate_prompt_registry(sender, instance, **kwargs):
+    from src.prompts.registry import prompt_registry
+
+    prompt_registry.invalidate()
@@ -0,0 +1,109 @@
+"""
+In-process prompt registry.
+
+Every chat message reads several prompts (ROUTER, LEGAL_ADVICE, rephrase/translate, ...). The registry loads all
+Prompt rows once per process and serves them from memory.
+
+Invalidation:
+  - in the process that saves or deletes a Prompt (admin, API, seed_prompts): immediately, via the
+    post_save/post_delete receivers in prompts.models;
+  - in every other worker: the registry re-reads the table version, (row count, max updated_at), at most once
+    every PROMPT_REGISTRY_CHECK_SEC and reloads when it changed. That is one tiny aggregate query per interval
+    instead of a query per prompt read.
+
+QuerySet.update() does not touch updated_at, so prompt changes must go through save().
+
+Callbacks registered with add_listener() run in each process after it reloaded changed prompts (not on the first
+load); the compiled chat graphs are rebuilt this way (chats.graph_registry).
+"""
+
+import logging
+import threading
+import time
+
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+
+class PromptRegistry:
+    def __init__(self, check_interval_sec=None):
+        self._check_interval_sec = check_interval_sec
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self.loads = 0
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback() whenever this process reloads prompts that changed."""
+        self._listeners.append(callback)
+
+    @property
+    def check_interval_sec(self):
+        if self._check_interval_sec is None:
+            from src.settings import PROMPT_REGISTRY_CHECK_SEC
+            return PROMPT_REGISTRY_CHECK_SEC
+        return self._check_interval_sec
+
+    def get(self, name: str) -> str:
+        from src.prompts.models import Prompt
+
+        values = self._current_values()
+        try:
+            return values[name]
+        except KeyError:
+            raise Prompt.DoesNotExist(f"Prompt matching query does not exist: {name}")
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+
+    def _current_values(self):
+        values = self._values
+        now = time.monotonic()
+        if values is not None and now - self._checked_at < self.check_interval_sec:
+            return values
+
+        changed = False
+        with self._lock:
+            if self._values is not None and now - self._checked_at < self.check_interval_sec:
+                return self._values
+
+            version = self._read_version()
+            if self._values is None or version != self._version:
+                changed = self.loads > 0
+                self._values = self._load()
+                self._version = version
+                self.loads += 1
+                logger.info('Loaded %s prompts (version %s)', len(self._values), version)
+            self._checked_at = now
+            values = self._values
+
+        if changed:
+            self._notify()
+        return values
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error('Prompt change listener %r failed: %s', callback, e, exc_info=True)
+
+    @staticmethod
+    def _read_version():
+        from src.prompts.models import Prompt
+
+        version = Prompt.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+        return version['count'], version['updated_at']
+
+    @staticmethod
+    def _load():
+        from src.prompts.models import Prompt
+
+        return dict(Prompt.objects.values_list('name', 'value'))
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from src.prompts.models import Prompt
+from src.prompts.registry import PromptRegistry
+
+
+class PromptRegistryTest(SimpleTestCase):
+    def make_registry(self, check_interval_sec=60):
+        registry = PromptRegistry(check_interval_sec=check_interval_sec)
+        self.version = (2, 'v1')
+        self.values = {'router': 'Route the input', 'legal_advice': 'You are a legal expert'}
+        load = mock.patch.object(registry, '_load', side_effect=lambda: dict(self.values))
+        read_version = mock.patch.object(registry, '_read_version', side_effect=lambda: self.version)
+        self.load = load.start()
+        self.read_version = read_version.start()
+        self.addCleanup(load.stop)
+        self.addCleanup(read_version.stop)
+        return registry
+
+    def test_serves_prompts_from_memory(self):
+        registry = self.make_registry()
+
+        self.assertEqual('Route the input', registry.get('router'))
+        self.assertEqual('You are a legal expert', registry.get('legal_advice'))
+        self.assertEqual('Route the input', registry.get('router'))
+
+        self.assertEqual(1, self.load.call_count)
+        self.assertEqual(1, self.read_version.call_count)
+
+    def test_reloads_when_another_worker_changed_a_prompt(self):
+        registry = self.make_registry(check_interval_sec=0)
+        registry.get('router')
+
+        self.values['router'] = 'Route the input (edited)'
+        self.version = (2, 'v2')
+
+        self.assertEqual('Route the input (edited)', registry.get('router'))
+        self.assertEqual(2, self.load.call_count)
+
+    def test_version_unchanged_does_not_reload(self):
+        registry = self.make_registry(check_interval_sec=0)
+        registry.get('router')
+        registry.get('router')
+
+        self.assertEqual(1, self.load.call_count)
+        self.assertEqual(2, self.read_version.call_count)
+
+    def test_invalidate_reloads_immediately(self):
+        registry = self.make_registry()
+        registry.get('router')
+
+        self.values['router'] = 'Saved in this worker'
+        registry.invalidate()
+
+        self.assertEqual('Saved in this worker', registry.get('router'))
+
+    def test_listeners_run_on_changes_only(self):
+        registry = self.make_registry(check_interval_sec=0)
+        listener = mock.Mock()
+        registry.add_listener(listener)
+
+        registry.get('router')
+        registry.get('router')
+        listener.assert_not_called()
+
+        self.version = (2, 'v2')
+        registry.get('router')
+        listener.assert_called_once_with()
+
+    def test_missing_prompt(self):
+        registry = self.make_registry()
+
+        with self.assertRaises(Prompt.DoesNotExist):
+            registry.get('unknown')
@@ -1,6 +1,6 @@
 from src.prompts.enums import PromptType
-from src.prompts.models import Prompt
+from src.prompts.registry import prompt_registry
 
 
 def get_prompt_value_by_name(name: PromptType) -> str:
-    return Prompt.objects.get(name=name.value).value
+    return prompt_registry.get(name.value)
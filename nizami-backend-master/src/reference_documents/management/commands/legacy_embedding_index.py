@@ -0,0 +1,142 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from src.common.retrievers import (
+    LEGACY_REFERENCE_DOCUMENT_ID_INDEX,
+    LEGACY_REFERENCE_DOCUMENT_ID_SQL,
+    apply_vector_search_settings,
+)
+
+RETRIEVER_SQL = f"""
+    SELECT id, 1 - (embedding <=> %s::vector) AS similarity
+    FROM langchain_pg_embedding
+    WHERE {LEGACY_REFERENCE_DOCUMENT_ID_SQL} = ANY(%s::bigint[])
+    ORDER BY embedding <=> %s::vector
+    LIMIT %s
+"""
+
+# Predicate the language update in UpdateReferenceDocumentSerializer used before it matched the index
+TEXT_FILTER_SQL = "SELECT count(*) FROM langchain_pg_embedding WHERE cmetadata->>'reference_document_id' = %s"
+INDEXED_FILTER_SQL = f"SELECT count(*) FROM langchain_pg_embedding WHERE {LEGACY_REFERENCE_DOCUMENT_ID_SQL} = %s"
+
+
+class Command(BaseCommand):
+    help = (
+        'Check the reference_document_id expression index on langchain_pg_embedding, build or repair it online '
+        '(CREATE/REINDEX ... CONCURRENTLY) with --create, and report EXPLAIN ANALYZE timings for the '
+        'document-filtered queries with and without it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--create', action='store_true',
+                            help='Create the index CONCURRENTLY if missing, REINDEX CONCURRENTLY if invalid')
+        parser.add_argument('--documents', type=int, default=10, help='Reference documents in the sample filter')
+        parser.add_argument('--k', type=int, default=8)
+        parser.add_argument('--skip-explain', action='store_true')
+
+    def handle(self, *args, **options):
+        state = self._index_state()
+        self.stdout.write(f'{LEGACY_REFERENCE_DOCUMENT_ID_INDEX}: {state}')
+
+        if options['create'] and state != 'valid':
+            self._build(state)
+            state = self._index_state()
+            self.stdout.write(self.style.SUCCESS(f'{LEGACY_REFERENCE_DOCUMENT_ID_INDEX}: {state}'))
+
+        if options['skip_explain']:
+            return
+
+        sample = self._sample(options['documents'])
+        if sample is None:
+            self.stdout.write(self.style.WARNING('langchain_pg_embedding is empty, nothing to explain'))
+            return
+        embedding, document_ids = sample
+
+        self.stdout.write(f'\nRetriever query, {len(document_ids)} documents, k={options["k"]}')
+        params = [embedding, document_ids, embedding, options['k']]
+        self._report('without index (seq scan)', self._explain(RETRIEVER_SQL, params, True, disable_indexes=True))
+        self._report('with index', self._explain(RETRIEVER_SQL, params, True))
+
+        self.stdout.write('\nChunks of one reference document (language update filter)')
+        self._report('text comparison', self._explain(TEXT_FILTER_SQL, [str(document_ids[0])]))
+        self._report('indexed expression', self._explain(INDEXED_FILTER_SQL, [document_ids[0]]))
+
+    def _index_state(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT i.indisvalid
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = %s
+            """, [LEGACY_REFERENCE_DOCUMENT_ID_INDEX])
+            row = cursor.fetchone()
+        if row is None:
+            return 'missing'
+        return 'valid' if row[0] else 'invalid'
+
+    def _build(self, state):
+        # CONCURRENTLY cannot run in a transaction block; management commands run in autocommit mode
+        with connection.cursor() as cursor:
+            if state == 'invalid':
+                self.stdout.write('Rebuilding invalid index concurrently...')
+                cursor.execute(f'REINDEX INDEX CONCURRENTLY {LEGACY_REFERENCE_DOCUMENT_ID_INDEX}')
+            else:
+                self.stdout.write('Creating index concurrently...')
+                cursor.execute(f"""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS {LEGACY_REFERENCE_DOCUMENT_ID_INDEX}
+                    ON langchain_pg_embedding USING btree (({LEGACY_REFERENCE_DOCUMENT_ID_SQL}))
+                """)
+            # Expression indexes get their own planner statistics only after ANALYZE
+            cursor.execute('ANALYZE langchain_pg_embedding')
+
+    def _sample(self, documents):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT embedding::text FROM langchain_pg_embedding TABLESAMPLE SYSTEM (1) LIMIT 1')
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute('SELECT embedding::text FROM langchain_pg_embedding LIMIT 1')
+                row = cursor.fetchone()
+            if row is None:
+                return None
+
+            cursor.execute("""
+                SELECT id FROM reference_documents_referencedocument
+                WHERE status = 'processed'
+                ORDER BY random()
+                LIMIT %s
+            """, [documents])
+            document_ids = [r[0] for r in cursor.fetchall()]
+        return (row[0], document_ids) if document_ids else None
+
+    def _explain(self, sql, params, vector_search=False, disable_indexes=False):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if vector_search:
+                apply_vector_search_settings(cursor)
+            if disable_indexes:
+                cursor.execute('SET LOCAL enable_indexscan = off')
+                cursor.execute('SET LOCAL enable_bitmapscan = off')
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]
+
+    def _report(self, label, explained):
+        plan = explained['Plan']
+        nodes = []
+
+        def walk(node):
+            name = node['Node Type']
+            if node.get('Index Name'):
+                name += f" using {node['Index Name']}"
+            nodes.append(name)
+            for child in node.get('Plans', []):
+                walk(child)
+
+        walk(plan)
+        buffers = plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0)
+        self.stdout.write(
+            f'  {label:<26} {explained["Execution Time"]:9.2f} ms  {buffers:>8} buffers  ' + ' -> '.join(nodes)
+        )
@@ -2,6 +2,7 @@ from django.db import transaction, connection
 from django_q.tasks import async_task
 from rest_framework import serializers
 
+from src.common.retrievers import LEGACY_REFERENCE_DOCUMENT_ID_SQL
 from src.reference_documents.models import ReferenceDocument
 from src.reference_documents.tasks import analyze_reference_document
 from src.reference_documents.utils import generate_description_for_ref_doc
@@ -56,10 +57,10 @@ class UpdateReferenceDocumentSerializer(serializers.ModelSerializer):
         instance.save()
 
         if not old_language or new_language.lower() != old_language.lower():
-            sql = """
+            sql = f"""
                 UPDATE langchain_pg_embedding
-                SET cmetadata = jsonb_set(COALESCE(cmetadata, '{}'), '{language}', %s, true)
-                WHERE cmetadata->>'reference_document_id' = '%s'
+                SET cmetadata = jsonb_set(COALESCE(cmetadata, '{{}}'), '{{language}}', %s, true)
+                WHERE {LEGACY_REFERENCE_DOCUMENT_ID_SQL} = %s
                 ;
             """
             with connection.cursor() as cursor:
@@ -318,18 +318,39 @@ Q_CLUSTER = {
     'queue_limit': 50,  # Limit the size of the queue
     'cpu_affinity': 1,  # Number of cores to use
     'orm': 'default',  # Use the default database as the broker
+    'daemonize_workers': False,  # Lets tasks start process pools (PDF page extraction)
 }
 
-# When the user sends a message with attachments, we poll for extraction to complete
+# PDFs with at least PDF_PARALLEL_MIN_PAGES pages are extracted by a pool of PDF_EXTRACTION_WORKERS processes
+# (src/common/pdf_pages.py); 1 extracts serially.
+PDF_EXTRACTION_WORKERS = env.int('PDF_EXTRACTION_WORKERS', default=min(4, os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = env.int('PDF_PARALLEL_MIN_PAGES', default=40)
+
+# When the user sends a message with attachments, we wait for extraction to complete
 # before returning a full answer. Increase this if the queue is often busy (e.g. 60–120 seconds).
 ATTACHMENT_EXTRACTION_WAIT_TIMEOUT_SEC = env.int('ATTACHMENT_EXTRACTION_WAIT_TIMEOUT_SEC', default=60)
+# The wait wakes on extraction status notifications (Postgres LISTEN/NOTIFY); statuses are still re-read every
+# RECHECK seconds in case one is missed, or every POLL_INTERVAL seconds when notifications are unavailable.
+ATTACHMENT_EXTRACTION_RECHECK_SEC = env.float('ATTACHMENT_EXTRACTION_RECHECK_SEC', default=5.0)
 ATTACHMENT_EXTRACTION_POLL_INTERVAL_SEC = env.float('ATTACHMENT_EXTRACTION_POLL_INTERVAL_SEC', default=0.5)
 
 # Use OpenAI LLM to extract or refine document text after library extraction (and for PDFs with no text, use vision).
 USE_OPENAI_FOR_EXTRACTION = env.bool('USE_OPENAI_FOR_EXTRACTION', default=True)
+# LLM calls of one extraction (vision OCR batches, refinement chunks) in flight at once, and retries of a rate
+# limited call (src/uploads/llm_concurrency.py)
+EXTRACTION_LLM_CONCURRENCY = env.int('EXTRACTION_LLM_CONCURRENCY', default=4)
+EXTRACTION_LLM_MAX_RETRIES = env.int('EXTRACTION_LLM_MAX_RETRIES', default=5)
+# Refined chunks are kept for retries of an interrupted extraction (Q_CLUSTER timeout/retry are 2 h); the
+# prune_refined_chunks schedule deletes the ones left by extractions that never completed
+REFINED_CHUNK_MAX_AGE_HOURS = env.int('REFINED_CHUNK_MAX_AGE_HOURS', default=24)
 
 OPENAI_API_KEY = env('OPENAI_API_KEY', default='') if not TESTING else ''
 
+# Shared keep-alive connection pool used by every ChatOpenAI client (see src/chats/utils.py)
+LLM_HTTP_MAX_CONNECTIONS = env.int('LLM_HTTP_MAX_CONNECTIONS', default=100)
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = env.int('LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS', default=20)
+LLM_HTTP_KEEPALIVE_EXPIRY_SEC = env.float('LLM_HTTP_KEEPALIVE_EXPIRY_SEC', default=30.0)
+
 # Initialize embeddings and vectorstore only if not testing and OPENAI_API_KEY is set
 try:
     embeddings = OpenAIEmbeddings(model='text-embedding-3-large', dimensions=1536, openai_api_key=OPENAI_API_KEY)
@@ -371,3 +392,59 @@ RAG_S3_REGION = env('RAG_S3_REGION', default=env('AWS_DEFAULT_REGION', default='
 # "new" = use RagSourceDocumentChunk table (S3 RAG pipeline)
 RAG_SOURCE = env('RAG_SOURCE', default='old')
 
+# Query embedding cache (src/common/retrievers.py): per-process LRU size and optional shared Postgres table
+EMBEDDING_CACHE_SIZE = env.int('EMBEDDING_CACHE_SIZE', default=2048)
+EMBEDDING_CACHE_DB = env.bool('EMBEDDING_CACHE_DB', default=False)
+# Rows of the shared table older than this are deleted by the prune_query_embeddings schedule (src/common/tasks.py)
+EMBEDDING_CACHE_DB_TTL_DAYS = env.int('EMBEDDING_CACHE_DB_TTL_DAYS', default=30)
+# Document-filtered ANN search (src/common/retrievers.py): pgvector >= 0.8 iterative HNSW scans keep walking the
+# index until k chunks of the shortlisted documents are found ('off', 'relaxed_order' or 'strict_order')
+VECTOR_SEARCH_ITERATIVE_SCAN = env('VECTOR_SEARCH_ITERATIVE_SCAN', default='relaxed_order')
+VECTOR_SEARCH_EF_SEARCH = env.int('VECTOR_SEARCH_EF_SEARCH', default=32)
+VECTOR_SEARCH_MAX_SCAN_TUPLES = env.int('VECTOR_SEARCH_MAX_SCAN_TUPLES', default=20000)
+
+# Run router / translation / speculative retrieval concurrently with history loading in the chat graph
+CHAT_GRAPH_PARALLEL = env.bool('CHAT_GRAPH_PARALLEL', default=True)
+# Speculative retrieval on the raw input in the parallel graph; wasted on the translation route and when rephrasing
+# changes the query
+CHAT_GRAPH_PREFETCH_RETRIEVAL = env.bool('CHAT_GRAPH_PREFETCH_RETRIEVAL', default=True)
+# 'separate': router, relevance, rephrase and translate are individual LLM calls
+# 'fused': one structured call (understand_query) returns all of them; compare via MessageStepLog timings
+CHAT_QUERY_UNDERSTANDING = env('CHAT_QUERY_UNDERSTANDING', default='separate')
+CHAT_QUERY_UNDERSTANDING_MODEL = env('CHAT_QUERY_UNDERSTANDING_MODEL', default='gpt-4o-mini')
+# Under ASGI, run the streamed chat flow on the event loop (async nodes, ainvoke) instead of a worker thread
+CHAT_ASYNC_PIPELINE = env.bool('CHAT_ASYNC_PIPELINE', default=True)
+# Update conversation summaries on the django-q cluster instead of before the response is returned
+CHAT_SUMMARY_ASYNC = env.bool('CHAT_SUMMARY_ASYNC', default=True) if not TESTING else False
+# Semantic answer cache (src/chats/answer_cache.py) for standalone legal questions
+ANSWER_CACHE_ENABLED = env.bool('ANSWER_CACHE_ENABLED', default=True) if not TESTING else False
+ANSWER_CACHE_SIMILARITY = env.float('ANSWER_CACHE_SIMILARITY', default=0.97)
+ANSWER_CACHE_TTL_SEC = env.int('ANSWER_CACHE_TTL_SEC', default=7 * 24 * 3600)
+ANSWER_CACHE_MAX_ENTRIES = env.int('ANSWER_CACHE_MAX_ENTRIES', default=10000)
+# Prompts are served from memory (src/prompts/registry.py); other workers pick up edits within this many seconds
+PROMPT_REGISTRY_CHECK_SEC = env.float('PROMPT_REGISTRY_CHECK_SEC', default=5.0)
+# MessageStepLog writes of a chat graph run (src/chats/step_logs.py): 'async' (background writer on the logs
+# database, bounded queue of STEP_LOG_QUEUE_SIZE batches, overflow dropped), 'batch' (one bulk_create) or 'immediate'
+STEP_LOG_WRITE_MODE = env('STEP_LOG_WRITE_MODE', default='async') if not TESTING else 'immediate'
+STEP_LOG_QUEUE_SIZE = env.int('STEP_LOG_QUEUE_SIZE', default=1000)
+# Step log / message log payloads whose JSON is larger than this are stored zstd-compressed (0: never compress)
+LOG_PAYLOAD_COMPRESS_BYTES = env.int('LOG_PAYLOAD_COMPRESS_BYTES', default=16384)
+# Chat graph node instrumentation (src/common/instrumentation.py): USD per 1M [input, output] tokens by model name
+# prefix, for the cost estimates in MessageTrace and /metrics
+LLM_TOKEN_PRICES_USD = env.json('LLM_TOKEN_PRICES_USD', default={
+    'gpt-4o-mini': [0.15, 0.60],
+    'gpt-4o': [2.50, 10.00],
+    'gpt-4.1-mini': [0.40, 1.60],
+    'gpt-5-nano': [0.05, 0.40],
+    'o3-mini': [1.10, 4.40],
+})
+# Bearer token for the Prometheus scrape endpoint /metrics (disabled when empty)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+# Dashboard latency rollups (src/dashboard/rollups.py): refresh interval, how old a log row must be before it is
+# folded in, and how many of the slowest messages are kept per hour
+DASHBOARD_ROLLUP_INTERVAL_MIN = env.int('DASHBOARD_ROLLUP_INTERVAL_MIN', default=1)
+DASHBOARD_ROLLUP_LAG_SEC = env.int('DASHBOARD_ROLLUP_LAG_SEC', default=60)
+DASHBOARD_SLOW_MESSAGES_PER_HOUR = env.int('DASHBOARD_SLOW_MESSAGES_PER_HOUR', default=20)
+# Exact recount of the dashboard card counters (src/dashboard/counters.py); signals keep them current in between
+DASHBOARD_COUNTER_REFRESH_MIN = env.int('DASHBOARD_COUNTER_REFRESH_MIN', default=60)
+
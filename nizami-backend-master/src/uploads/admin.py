@@ -1,5 +1,5 @@
 from django.contrib import admin
-from src.uploads.models import File, FileExtraction, FileSummary, UploadSession
+from src.uploads.models import ExtractionArtifact, File, FileExtraction, FileSummary, UploadSession
 
 
 @admin.register(File)
@@ -16,10 +16,20 @@ class UploadSessionAdmin(admin.ModelAdmin):
 
 @admin.register(FileExtraction)
 class FileExtractionAdmin(admin.ModelAdmin):
-    list_display = ("id", "file", "status", "extractor_version", "preview_ready_at", "ready_at", "created_at")
+    list_display = (
+        "id", "file", "status", "extractor_version", "artifact", "refine_chunks_done", "refine_chunks_total",
+        "preview_ready_at", "ready_at", "created_at",
+    )
     list_filter = ("status",)
 
 
+@admin.register(ExtractionArtifact)
+class ExtractionArtifactAdmin(admin.ModelAdmin):
+    list_display = ("id", "sha256", "extractor_version", "full_text_chars", "hit_count", "created_at", "last_used_at")
+    list_filter = ("extractor_version",)
+    search_fields = ("sha256",)
+
+
 @admin.register(FileSummary)
 class FileSummaryAdmin(admin.ModelAdmin):
     list_display = ("id", "tenant", "file", "summary_type", "prompt_version", "created_at")
@@ -5,3 +5,7 @@ class UploadsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.uploads"
     verbose_name = "Uploads"
+
+    def ready(self):
+        # Import tasks to register scheduled tasks
+        import src.uploads.tasks  # noqa: F401
@@ -0,0 +1,137 @@
+"""
+Content-addressed extraction cache shared across tenants.
+
+extract_file hashes the raw bytes while downloading them; an ExtractionArtifact with that sha256 and the current
+EXTRACTOR_VERSION (in the same bucket) holds the preview, full text, page index and summary of an earlier extraction of
+identical content, so the file goes straight to READY without extraction, LLM refinement or summarization.
+
+Only the worker-computed hash is used: the sha256 a client declares at upload init is never trusted, since a wrong one
+would otherwise expose another tenant's text. Tenant rows (FileExtraction, FileSummary) are still created per file;
+the shared part is the S3 text the FileExtraction keys point at. Empty or degraded extractions (a failed vision batch
+or refinement chunk) are not shared; extract_file keeps them under the file's own keys.
+"""
+
+import json
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from src.uploads.extraction_utils import EXTRACTOR_VERSION
+from src.uploads.models import ExtractionArtifact, FileExtraction, FileSummary
+from src.uploads.notifications import notify_extraction_status
+from src.uploads.storage import head_object, is_not_found, shared_extraction_s3_key, upload_bytes_to_s3
+
+logger = logging.getLogger(__name__)
+
+
+def find_artifact(*, sha256: str, bucket: str) -> ExtractionArtifact | None:
+    """Shared extraction of this content, if one exists and its text is still in S3."""
+    artifact = ExtractionArtifact.objects.filter(
+        sha256=sha256,
+        extractor_version=EXTRACTOR_VERSION,
+        s3_bucket=bucket,
+    ).first()
+    if artifact is None:
+        return None
+    try:
+        head_object(bucket=artifact.s3_bucket, key=artifact.full_text_s3_key)
+    except Exception as e:
+        if is_not_found(e):
+            # Text gone (e.g. bucket recreated): drop the entry, the file is extracted again
+            artifact.delete()
+        else:
+            # Throttling, 5xx, credentials: the entry is likely fine, only this file skips the cache
+            logger.warning("Could not check shared extraction %s, extracting again: %s", artifact.id, e)
+        return None
+    return artifact
+
+
+def upload_extracted_text(*, bucket: str, full_key: str, pages_key: str, full_text: str, pages: list[str]) -> str | None:
+    """Upload full.txt and, for formats with pages, pages.json; returns the pages key or None when there are no pages."""
+    upload_bytes_to_s3(
+        bucket=bucket,
+        key=full_key,
+        body=full_text.encode("utf-8", errors="replace"),
+        content_type="text/plain; charset=utf-8",
+    )
+
+    # Per-page index of the library text (PDF); formats without pages have none
+    if not pages:
+        return None
+    pages_data = [{"page": i + 1, "chars": len(text), "text": text} for i, text in enumerate(pages)]
+    upload_bytes_to_s3(
+        bucket=bucket,
+        key=pages_key,
+        body=json.dumps(pages_data, ensure_ascii=False).encode("utf-8"),
+        content_type="application/json",
+    )
+    return pages_key
+
+
+def store_artifact(*, sha256: str, bucket: str, preview_text: str, full_text: str, pages: list[str]) -> ExtractionArtifact:
+    """
+    Upload an extraction's text under the shared keys and record it. Only for complete extractions: a degraded one
+    would be served to every later upload of the same bytes until EXTRACTOR_VERSION changes.
+    """
+    full_key = shared_extraction_s3_key(sha256=sha256, extractor_version=EXTRACTOR_VERSION, name="full.txt")
+    pages_key = upload_extracted_text(
+        bucket=bucket,
+        full_key=full_key,
+        pages_key=shared_extraction_s3_key(sha256=sha256, extractor_version=EXTRACTOR_VERSION, name="pages.json"),
+        full_text=full_text,
+        pages=pages,
+    )
+
+    artifact, _ = ExtractionArtifact.objects.update_or_create(
+        sha256=sha256,
+        extractor_version=EXTRACTOR_VERSION,
+        defaults={
+            "s3_bucket": bucket,
+            "preview_text": preview_text[:65535] if preview_text else "",
+            "full_text_s3_key": full_key,
+            "pages_json_s3_key": pages_key,
+            "full_text_chars": len(full_text),
+        },
+    )
+    return artifact
+
+
+def store_summary(*, artifact: ExtractionArtifact, summary_text: str) -> None:
+    from src.uploads.final_answer import SUMMARY_PROMPT_VERSION
+
+    ExtractionArtifact.objects.filter(id=artifact.id).update(
+        summary_text=summary_text,
+        summary_prompt_version=SUMMARY_PROMPT_VERSION,
+    )
+
+
+def apply_artifact(*, extraction: FileExtraction, artifact: ExtractionArtifact, tenant_id: int) -> None:
+    """Make a file's extraction READY from a shared artifact, with the tenant's own summary row."""
+    from src.uploads.final_answer import SUMMARY_PROMPT_VERSION, SUMMARY_TYPE_DEFAULT
+
+    now = timezone.now()
+    with transaction.atomic():
+        extraction.refresh_from_db()
+        extraction.artifact = artifact
+        extraction.preview_text = artifact.preview_text
+        extraction.full_text_s3_key = artifact.full_text_s3_key
+        extraction.pages_json_s3_key = artifact.pages_json_s3_key
+        extraction.status = FileExtraction.Status.READY
+        extraction.preview_ready_at = extraction.preview_ready_at or now
+        extraction.ready_at = now
+        extraction.save(update_fields=[
+            "artifact", "preview_text", "full_text_s3_key", "pages_json_s3_key", "status", "preview_ready_at",
+            "ready_at",
+        ])
+        if artifact.summary_text and artifact.summary_prompt_version == SUMMARY_PROMPT_VERSION:
+            FileSummary.objects.get_or_create(
+                tenant_id=tenant_id,
+                file_id=extraction.file_id,
+                summary_type=SUMMARY_TYPE_DEFAULT,
+                prompt_version=SUMMARY_PROMPT_VERSION,
+                defaults={"summary_text": artifact.summary_text},
+            )
+        ExtractionArtifact.objects.filter(id=artifact.id).update(hit_count=F("hit_count") + 1, last_used_at=now)
+        notify_extraction_status(extraction.file_id, extraction.status)
@@ -15,6 +15,9 @@ logger = logging.getLogger(__name__)
 EXTRACTOR_VERSION = "2"  # Bump when extraction path changes (e.g. add LLM)
 PREVIEW_PDF_PAGES = 2
 PREVIEW_DOCX_PARAGRAPHS = 30  # roughly first sections
+# Ranged preview of linearized PDFs: bytes read to find the linearization dict, and the largest first page fetched
+PDF_LINEARIZATION_HEAD_BYTES = 1024
+PREVIEW_PDF_RANGE_MAX_BYTES = 4 * 1024 * 1024
 
 
 def _normalize_text(*, text: str) -> str:
@@ -43,21 +46,54 @@ def extract_preview_from_pdf(*, file_path: str) -> str:
         return ""
 
 
-def extract_full_from_pdf(*, file_path: str) -> str:
-    """Extract all text from PDF."""
+def pdf_first_page_end(*, head: bytes) -> int | None:
+    """
+    Byte offset where the first page ends (/E of the linearization dict) when `head`, the start of a PDF, is a
+    linearized ("fast web view") PDF; None otherwise. Only then do the first bytes hold a complete first page.
+    """
+    match = re.search(rb"/Linearized\b.*?/E\s+(\d+)", head[:PDF_LINEARIZATION_HEAD_BYTES], re.S)
+    return int(match.group(1)) if match else None
+
+
+def extract_preview_from_pdf_bytes(*, data: bytes) -> str:
+    """Extract text from the first pages of a (possibly truncated) PDF held in memory; pages that are cut off are skipped."""
     try:
         import fitz
-        doc = fitz.open(file_path)
+        doc = fitz.open(stream=data, filetype="pdf")
         parts = []
-        for page in doc:
-            parts.append(page.get_text())
+        for i in range(min(PREVIEW_PDF_PAGES, len(doc))):
+            try:
+                t = doc[i].get_text()
+            except Exception:
+                break
+            if t:
+                parts.append(t)
         doc.close()
         return _normalize_text(text="\n".join(parts))
     except Exception as e:
-        logger.warning("PDF full extraction failed for %s: %s", file_path, e)
+        logger.warning("PDF ranged preview extraction failed: %s", e)
         return ""
 
 
+def extract_pages_from_pdf(*, file_path: str) -> list[str]:
+    """Normalized text of every PDF page, in order (page-sharded over a process pool for long documents)."""
+    try:
+        from src.common.pdf_pages import extract_pdf_pages
+        return [_normalize_text(text=t) for t in extract_pdf_pages(file_path)]
+    except Exception as e:
+        logger.warning("PDF full extraction failed for %s: %s", file_path, e)
+        return []
+
+
+def extract_full_from_pdf(*, file_path: str) -> str:
+    """Extract all text from PDF."""
+    return _join_pages(pages=extract_pages_from_pdf(file_path=file_path))
+
+
+def _join_pages(*, pages: list[str]) -> str:
+    return " ".join(t for t in pages if t)
+
+
 def extract_preview_from_docx(*, file_path: str) -> str:
     """Extract first sections from DOCX."""
     try:
@@ -85,35 +121,80 @@ def extract_full_from_docx(*, file_path: str) -> str:
 
 # Chunk size for LLM extraction (chars) to stay within context
 _OPENAI_EXTRACT_CHUNK_CHARS = 60_000
+# Bump with the refinement prompt or model, so chunks refined by the old one are not reused
+_OPENAI_EXTRACT_PROMPT_VERSION = "1"
+_OPENAI_EXTRACT_SYSTEM_PROMPT = "You are a document text extractor. Extract and return all text from the document content. Preserve structure, paragraphs, headings, and content exactly. Return only the extracted document text, no commentary or metadata."
 
 
-def _extract_text_via_openai(*, raw_text: str) -> str:
-    """Send raw extracted text to OpenAI to extract/clean and return structured document text."""
+def _extract_text_via_openai(*, raw_text: str, on_progress=None) -> tuple[str, bool]:
+    """
+    Send raw extracted text to OpenAI to extract/clean and return (structured document text, every chunk refined).
+    Chunks are refined EXTRACTION_LLM_CONCURRENCY at a time (src/uploads/llm_concurrency.py). Each refined chunk is
+    saved (uploads.RefinedChunk) as it completes, so a retry after a timeout only sends the chunks still missing; the
+    rows are removed once every chunk is done. on_progress(done, total) reports refined chunks; a chunk that fails is
+    kept as raw text (and not saved), and the result is reported incomplete.
+    """
     from django.conf import settings
     if not getattr(settings, "OPENAI_API_KEY", None) or not getattr(settings, "USE_OPENAI_FOR_EXTRACTION", False):
-        return raw_text
+        return raw_text, True
+    import hashlib
     from langchain_core.messages import HumanMessage, SystemMessage
     from src.chats.utils import create_llm
+    from src.uploads.llm_concurrency import ordered_map
+    from src.uploads.models import RefinedChunk
     if not raw_text or not raw_text.strip():
-        return raw_text
+        return raw_text, True
     text = raw_text.strip()
+    chunks = [text[i : i + _OPENAI_EXTRACT_CHUNK_CHARS] for i in range(0, len(text), _OPENAI_EXTRACT_CHUNK_CHARS)]
+    hashes = [hashlib.sha256(chunk.encode("utf-8")).hexdigest() for chunk in chunks]
+
+    refined = dict(
+        RefinedChunk.objects
+        .filter(chunk_sha256__in=set(hashes), prompt_version=_OPENAI_EXTRACT_PROMPT_VERSION)
+        .values_list("chunk_sha256", "text")
+    )
+    missing = [i for i, h in enumerate(hashes) if h not in refined]
+    done = len(chunks) - len(missing)
+    if done:
+        logger.info("OpenAI extraction resumes with %s of %s chunks refined", done, len(chunks))
+    if on_progress:
+        on_progress(done, len(chunks))
+
+    llm = create_llm("gpt-4o-mini", temperature=0, max_retries=0)  # llm_concurrency owns the backoff
+
+    def refine(i):
+        response = llm.invoke([
+            SystemMessage(content=_OPENAI_EXTRACT_SYSTEM_PROMPT),
+            HumanMessage(content=chunks[i]),
+        ])
+        return (response.content or "").strip()
+
+    def save(n, out):
+        nonlocal done
+        i = missing[n]
+        done += 1
+        if out is None:
+            logger.warning("OpenAI extraction chunk %s failed, keeping raw text", i)
+        else:
+            refined[hashes[i]] = out
+            RefinedChunk.objects.get_or_create(
+                chunk_sha256=hashes[i],
+                prompt_version=_OPENAI_EXTRACT_PROMPT_VERSION,
+                defaults={"text": out},
+            )
+        if on_progress:
+            on_progress(done, len(chunks))
+
+    ordered_map(refine, missing, on_result=save)
+
     parts = []
-    for i in range(0, len(text), _OPENAI_EXTRACT_CHUNK_CHARS):
-        chunk = text[i : i + _OPENAI_EXTRACT_CHUNK_CHARS]
-        try:
-            llm = create_llm("gpt-4o-mini", temperature=0)
-            messages = [
-                SystemMessage(content="You are a document text extractor. Extract and return all text from the document content. Preserve structure, paragraphs, headings, and content exactly. Return only the extracted document text, no commentary or metadata."),
-                HumanMessage(content=chunk),
-            ]
-            response = llm.invoke(messages)
-            out = (response.content or "").strip()
-            if out:
-                parts.append(out)
-        except Exception as e:
-            logger.warning("OpenAI extraction chunk failed: %s", e)
-            parts.append(chunk)
-    return _normalize_text(text="\n\n".join(parts)) if parts else raw_text
+    for chunk, h in zip(chunks, hashes):
+        out = refined.get(h, chunk)
+        if out:
+            parts.append(out)
+    RefinedChunk.objects.filter(chunk_sha256__in=set(hashes), prompt_version=_OPENAI_EXTRACT_PROMPT_VERSION).delete()
+    complete = all(h in refined for h in hashes)
+    return (_normalize_text(text="\n\n".join(parts)) if parts else raw_text), complete
 
 
 # Image MIME types and extensions that use OpenAI Vision OCR
@@ -182,26 +263,20 @@ def _extract_image_via_openai_ocr(*, file_path: str, mime_type: str) -> str:
         return ""
 
 
-def _extract_pdf_via_openai_vision(*, file_path: str) -> str:
-    """Render PDF pages to images and extract text via OpenAI Vision (for scanned/image PDFs)."""
-    from django.conf import settings
-    if not getattr(settings, "OPENAI_API_KEY", None) or not getattr(settings, "USE_OPENAI_FOR_EXTRACTION", False):
-        return ""
+# Pages per vision request (token limits), and render resolution
+_VISION_PAGES_PER_REQUEST = 4
+_VISION_DPI = 150
+
+
+def _render_pdf_page_batches(*, file_path: str):
+    """Yield the vision message content of each batch of PDF pages, rendering a batch only when it is requested."""
     import fitz
-    from langchain_core.messages import HumanMessage
-    from src.chats.utils import create_llm
-    parts = []
-    try:
-        doc = fitz.open(file_path)
-        # Process in small batches to avoid token limits (e.g. 4 pages per request)
-        pages_per_request = 4
-        for start in range(0, len(doc), pages_per_request):
+    with fitz.open(file_path) as doc:
+        for start in range(0, len(doc), _VISION_PAGES_PER_REQUEST):
             content = []
-            for i in range(start, min(start + pages_per_request, len(doc))):
-                page = doc[i]
-                pix = page.get_pixmap(dpi=150, alpha=False)
-                img_bytes = pix.tobytes(output="png")
-                b64 = base64.standard_b64encode(img_bytes).decode("ascii")
+            for i in range(start, min(start + _VISION_PAGES_PER_REQUEST, len(doc))):
+                pix = doc[i].get_pixmap(dpi=_VISION_DPI, alpha=False)
+                b64 = base64.standard_b64encode(pix.tobytes(output="png")).decode("ascii")
                 content.append({
                     "type": "image_url",
                     "image_url": {"url": f"data:image/png;base64,{b64}"},
@@ -210,18 +285,36 @@ def _extract_pdf_via_openai_vision(*, file_path: str) -> str:
                 "type": "text",
                 "text": "Extract all text from these document pages. Preserve order and structure. Return only the extracted text, one block per page if helpful.",
             })
-            try:
-                llm = create_llm("gpt-4o-mini", temperature=0)
-                msg = HumanMessage(content=content)
-                response = llm.invoke([msg])
-                if response.content:
-                    parts.append(response.content.strip())
-            except Exception as e:
-                logger.warning("OpenAI vision extraction batch failed: %s", e)
-        doc.close()
+            yield content
+
+
+def _extract_pdf_via_openai_vision(*, file_path: str) -> tuple[str, bool]:
+    """
+    Render PDF pages to images and extract text via OpenAI Vision (for scanned/image PDFs); returns (text, every batch
+    succeeded). Batches are sent EXTRACTION_LLM_CONCURRENCY at a time while the next ones render
+    (src/uploads/llm_concurrency.py); their texts are joined in page order and failed batches are skipped.
+    """
+    from django.conf import settings
+    if not getattr(settings, "OPENAI_API_KEY", None) or not getattr(settings, "USE_OPENAI_FOR_EXTRACTION", False):
+        return "", False
+    from langchain_core.messages import HumanMessage
+    from src.chats.utils import create_llm
+    from src.uploads.llm_concurrency import ordered_map
+
+    llm = create_llm("gpt-4o-mini", temperature=0, max_retries=0)  # llm_concurrency owns the backoff
+
+    def ocr(content):
+        response = llm.invoke([HumanMessage(content=content)])
+        return (response.content or "").strip()
+
+    try:
+        parts = ordered_map(ocr, _render_pdf_page_batches(file_path=file_path))
     except Exception as e:
         logger.warning("PDF vision extraction failed for %s: %s", file_path, e)
-    return _normalize_text(text="\n\n".join(parts)) if parts else ""
+        return "", False
+    complete = None not in parts
+    parts = [p for p in parts if p]
+    return (_normalize_text(text="\n\n".join(parts)) if parts else ""), complete
 
 
 def get_preview_text(*, file_path: str, mime_type: str) -> str:
@@ -242,20 +335,33 @@ def get_preview_text(*, file_path: str, mime_type: str) -> str:
 
 def get_full_text(*, file_path: str, mime_type: str) -> str:
     """Return full extracted text. Uses library extraction first; when USE_OPENAI_FOR_EXTRACTION is True, refines via OpenAI LLM. Images use OpenAI Vision OCR."""
+    return get_full_text_and_pages(file_path=file_path, mime_type=mime_type)[0]
+
+
+def get_full_text_and_pages(*, file_path: str, mime_type: str, on_progress=None) -> tuple[str, list[str], bool]:
+    """
+    get_full_text() plus the library text of each page, for formats that have pages (PDF); otherwise [].
+    The last item is False when a vision batch or refinement chunk failed, i.e. the text is degraded.
+    on_progress(done, total) reports LLM refinement chunks.
+    """
     from django.conf import settings
     use_openai = getattr(settings, "USE_OPENAI_FOR_EXTRACTION", False)
     from_vision = False
+    complete = True
     mime = mime_type or ""
 
     raw = ""
+    pages = []
     if _is_image_file(file_path=file_path, mime_type=mime):
         raw = _extract_image_via_openai_ocr(file_path=file_path, mime_type=mime)
         from_vision = bool(raw)
     elif mime_type == "application/pdf" or (file_path or "").lower().endswith(".pdf"):
-        raw = extract_full_from_pdf(file_path=file_path)
+        pages = extract_pages_from_pdf(file_path=file_path)
+        raw = _join_pages(pages=pages)
         if use_openai and not raw.strip():
-            raw = _extract_pdf_via_openai_vision(file_path=file_path)
+            raw, complete = _extract_pdf_via_openai_vision(file_path=file_path)
             from_vision = bool(raw)
+            pages = []
     elif (
         mime_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         or (file_path or "").lower().endswith(".docx")
@@ -275,5 +381,6 @@ def get_full_text(*, file_path: str, mime_type: str) -> str:
         raw = _normalize_text(text=raw) if raw else ""
 
     if use_openai and raw and not from_vision:
-        return _extract_text_via_openai(raw_text=raw)
-    return raw or ""
+        text, complete = _extract_text_via_openai(raw_text=raw, on_progress=on_progress)
+        return text, pages, complete
+    return raw or "", pages, complete
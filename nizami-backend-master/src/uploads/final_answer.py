@@ -36,8 +36,11 @@ def _load_full_text_for_files(*, file_ids: List[str], tenant_id: int) -> str:
             file_record = File.objects.filter(id=fid, tenant_id=tenant_id).first()
             if not file_record or not file_record.s3_bucket:
                 continue
-            text = download_text_from_s3(bucket=file_record.s3_bucket, key=ext.full_text_s3_key)
             remaining = MAX_DOC_CONTEXT_CHARS - total
+            # One extra character tells whether the text was truncated
+            text = download_text_from_s3(
+                bucket=file_record.s3_bucket, key=ext.full_text_s3_key, max_chars=remaining + 1,
+            )
             if len(text) > remaining:
                 text = text[:remaining] + "\n\n[Document truncated...]"
             parts.append(f"--- Document {file_record.original_filename} ---\n{text}")
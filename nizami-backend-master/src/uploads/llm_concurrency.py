@@ -0,0 +1,115 @@
+"""
+Bounded-concurrency LLM calls for extraction (vision OCR batches, text refinement chunks).
+
+ordered_map() runs a function over items with at most `concurrency` calls in flight and returns the results in item
+order. Items are pulled from the iterable only when a slot is free (as soon as any call finishes, not just the oldest),
+so a generator that prepares them (e.g. renders PDF pages) works while earlier calls are waiting on the network, and
+at most `concurrency` prepared items are held. Results that finish early are buffered until the earlier ones arrive.
+
+Rate limits (HTTP 429) are handled across all calls: the first call that is rate limited closes a shared
+RateLimitGate for the Retry-After time (or an exponential backoff), every call waits for the gate before sending,
+and the limited call is retried up to EXTRACTION_LLM_MAX_RETRIES times. The LLM clients passed in should be created with
+max_retries=0, so the SDK does not back off on its own underneath the gate.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SEC = 1.0
+BACKOFF_MAX_SEC = 60.0
+
+
+class RateLimitGate:
+    """Shared "no calls before" time, pushed forward when a call is rate limited."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open_at = 0.0
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._open_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def close_for(self, seconds):
+        with self._lock:
+            self._open_at = max(self._open_at, time.monotonic() + seconds)
+
+
+def is_rate_limit(exc) -> bool:
+    return getattr(exc, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def retry_delay_sec(exc, attempt) -> float:
+    """Retry-After of a rate limit response when present, otherwise exponential backoff with jitter."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def call_with_backoff(func, item, *, gate: RateLimitGate, max_retries: int):
+    attempt = 0
+    while True:
+        gate.wait()
+        try:
+            return func(item)
+        except Exception as e:
+            if not is_rate_limit(e) or attempt >= max_retries:
+                raise
+            delay = retry_delay_sec(e, attempt)
+            logger.info("LLM call rate limited, retrying in %.1fs (attempt %s)", delay, attempt + 1)
+            gate.close_for(delay)
+            attempt += 1
+
+
+def ordered_map(func, items, *, concurrency=None, max_retries=None, on_result=None) -> list:
+    """
+    [func(item) for item in items], `concurrency` at a time; a failed item's result is None (logged).
+    on_result(index, result) is called in the calling thread for each item, in item order, as results arrive.
+    """
+    from src.settings import EXTRACTION_LLM_CONCURRENCY, EXTRACTION_LLM_MAX_RETRIES
+
+    concurrency = max(1, concurrency or EXTRACTION_LLM_CONCURRENCY)
+    max_retries = EXTRACTION_LLM_MAX_RETRIES if max_retries is None else max_retries
+    gate = RateLimitGate()
+    results = []
+    finished = {}
+
+    def collect(index, future):
+        try:
+            finished[index] = future.result()
+        except Exception as e:
+            logger.warning("Extraction LLM call %s failed: %s", index, e)
+            finished[index] = None
+        while len(results) in finished:
+            result = finished.pop(len(results))
+            if on_result is not None:
+                on_result(len(results), result)
+            results.append(result)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = {}
+        for index, item in enumerate(items):
+            future = executor.submit(call_with_backoff, func, item, gate=gate, max_retries=max_retries)
+            in_flight[future] = index
+            if len(in_flight) >= concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for done_future in done:
+                    collect(in_flight.pop(done_future), done_future)
+        for future in wait(in_flight).done:
+            collect(in_flight[future], future)
+    return results
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0002_rename_uploads_file_tenant_created_idx_uploads_fil_tenant__f483ac_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionArtifact',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('sha256', models.CharField(max_length=64)),
+                ('extractor_version', models.CharField(max_length=32)),
+                ('s3_bucket', models.CharField(max_length=255)),
+                ('preview_text', models.TextField(blank=True)),
+                ('full_text_s3_key', models.CharField(max_length=1024)),
+                ('pages_json_s3_key', models.CharField(blank=True, max_length=1024, null=True)),
+                ('full_text_chars', models.PositiveIntegerField(default=0)),
+                ('summary_text', models.TextField(blank=True, null=True)),
+                ('summary_prompt_version', models.CharField(blank=True, max_length=64, null=True)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'uploads_extraction_artifact',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='extractionartifact',
+            constraint=models.UniqueConstraint(fields=('sha256', 'extractor_version'), name='uploads_extraction_artifact_sha256_version_unique'),
+        ),
+        migrations.AddField(
+            model_name='fileextraction',
+            name='artifact',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='file_extractions', to='uploads.extractionartifact'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0003_extraction_artifact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefinedChunk',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('chunk_sha256', models.CharField(max_length=64)),
+                ('prompt_version', models.CharField(max_length=16)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'uploads_refined_chunk',
+            },
+        ),
+        migrations.AddField(
+            model_name='fileextraction',
+            name='refine_chunks_done',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fileextraction',
+            name='refine_chunks_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='refinedchunk',
+            constraint=models.UniqueConstraint(fields=('chunk_sha256', 'prompt_version'), name='uploads_refined_chunk_sha256_version_unique'),
+        ),
+    ]
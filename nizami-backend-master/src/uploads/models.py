@@ -70,6 +70,37 @@ class UploadSession(models.Model):
         db_table = "uploads_upload_session"
 
 
+class ExtractionArtifact(models.Model):
+    """
+    Extraction results shared by every file with the same content: keyed by the sha256 the worker computed from the
+    raw bytes (never the client-declared one) and the extractor version. Text lives in S3 under shared keys; tenants
+    reach it only through their own FileExtraction / FileSummary rows.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    sha256 = models.CharField(max_length=64)
+    extractor_version = models.CharField(max_length=32)
+    s3_bucket = models.CharField(max_length=255)
+    preview_text = models.TextField(blank=True)
+    full_text_s3_key = models.CharField(max_length=1024)
+    pages_json_s3_key = models.CharField(max_length=1024, null=True, blank=True)
+    full_text_chars = models.PositiveIntegerField(default=0)
+    summary_text = models.TextField(null=True, blank=True)
+    summary_prompt_version = models.CharField(max_length=64, null=True, blank=True)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "uploads_extraction_artifact"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sha256", "extractor_version"],
+                name="uploads_extraction_artifact_sha256_version_unique",
+            ),
+        ]
+
+
 class FileExtraction(models.Model):
     """
     Per-file extraction state. Preview text in DB; full text in S3.
@@ -96,7 +127,18 @@ class FileExtraction(models.Model):
     preview_text = models.TextField(blank=True)
     full_text_s3_key = models.CharField(max_length=1024, null=True, blank=True)
     pages_json_s3_key = models.CharField(max_length=1024, null=True, blank=True)
+    # Shared extraction the keys above point at (set for content-addressed results)
+    artifact = models.ForeignKey(
+        ExtractionArtifact,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="file_extractions",
+    )
     extractor_version = models.CharField(max_length=32, default="1")
+    # LLM refinement progress of the full text, in chunks
+    refine_chunks_done = models.PositiveIntegerField(default=0)
+    refine_chunks_total = models.PositiveIntegerField(default=0)
     error_message = models.TextField(null=True, blank=True)
     preview_ready_at = models.DateTimeField(null=True, blank=True)
     ready_at = models.DateTimeField(null=True, blank=True)
@@ -146,3 +188,26 @@ class FileSummary(models.Model):
         indexes = [
             models.Index(fields=["tenant", "file"]),
         ]
+
+
+class RefinedChunk(models.Model):
+    """
+    LLM-refined text of one chunk of extracted text, keyed by the chunk's sha256, saved as soon as it is refined so a
+    retried extraction resumes with the chunks that are still missing. Removed once the whole text is refined; rows of
+    extractions that never finish are pruned after REFINED_CHUNK_MAX_AGE_HOURS (uploads.tasks).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    chunk_sha256 = models.CharField(max_length=64)
+    prompt_version = models.CharField(max_length=16)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "uploads_refined_chunk"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chunk_sha256", "prompt_version"],
+                name="uploads_refined_chunk_sha256_version_unique",
+            ),
+        ]
@@ -0,0 +1,145 @@
+"""
+Extraction status notifications, so waiting requests wake when extract_file changes a status instead of polling.
+
+extract_file calls notify_extraction_status() in the transaction that saves the new status:
+
+  - on Postgres, `pg_notify('file_extraction', {"file_id", "status"})`, delivered to listeners when that
+    transaction commits (never for rolled back changes);
+  - after commit, a publish on the in-process `extraction_events`, for waiters in the same process.
+
+Each process has one ExtractionListener thread, started on first use. It LISTENs on its own connection and
+republishes notifications on `extraction_events`. A waiter takes a snapshot of the files it waits for, reads their
+statuses, then sleeps on extraction_events until one of them changes or a recheck interval passes. Without a
+listener (other databases, listener down), the recheck interval is the old poll interval.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'file_extraction'
+
+
+class ExtractionEvents:
+    """In-process pub/sub of "this file's extraction status changed"."""
+
+    MAX_FILES = 10000
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions = OrderedDict()
+        self._counter = 0
+
+    def publish(self, file_id):
+        file_id = str(file_id)
+        with self._condition:
+            self._counter += 1
+            self._versions[file_id] = self._counter
+            self._versions.move_to_end(file_id)
+            while len(self._versions) > self.MAX_FILES:
+                self._versions.popitem(last=False)
+            self._condition.notify_all()
+
+    def snapshot(self, file_ids) -> dict:
+        with self._condition:
+            return {str(fid): self._versions.get(str(fid), 0) for fid in file_ids}
+
+    def wait(self, since: dict, timeout) -> bool:
+        """Block until a file in `since` changed after its snapshot, or timeout; True if one did."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: any(self._versions.get(fid, 0) != version for fid, version in since.items()),
+                timeout,
+            )
+
+
+extraction_events = ExtractionEvents()
+
+
+def notify_extraction_status(file_id, status):
+    """Announce a status change of a file's extraction; call inside the transaction that saves it."""
+    file_id = str(file_id)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [CHANNEL, json.dumps({'file_id': file_id, 'status': str(status)})],
+            )
+    transaction.on_commit(lambda: extraction_events.publish(file_id))
+
+
+class ExtractionListener:
+    """
+    Thread that LISTENs for extraction notifications on a dedicated autocommit connection and republishes them on
+    extraction_events. Reconnects after errors; `active` is False while it is not listening.
+    """
+
+    RECONNECT_DELAY_SEC = 5.0
+
+    def __init__(self, events: ExtractionEvents, database='default'):
+        self.events = events
+        self.database = database
+        self.active = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self) -> bool:
+        """Start the listener in this process if the database supports it; True while it is listening."""
+        if connections[self.database].vendor != 'postgresql':
+            return False
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        # Connection.notifies(timeout=...) is psycopg 3 only; with psycopg2 waiters keep polling
+        if not is_psycopg3:
+            return False
+        # A forked worker (uvicorn, django-q) inherits the object but not the thread
+        if self._thread is None or self._pid != os.getpid():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid():
+                    self.active = False
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name='extraction-listener', daemon=True)
+                    self._thread.start()
+        return self.active
+
+    def _connect(self):
+        wrapper = connections[self.database]
+        params = wrapper.get_connection_params()
+        conn = wrapper.Database.connect(**params)
+        conn.autocommit = True
+        conn.execute(f'LISTEN {CHANNEL}')
+        return conn
+
+    def _run(self):
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                self.active = True
+                while True:
+                    for notify in conn.notifies(timeout=60):
+                        try:
+                            self.events.publish(json.loads(notify.payload)['file_id'])
+                        except (ValueError, KeyError):
+                            logger.warning("Ignoring extraction notification %r", notify.payload)
+            except Exception as e:
+                logger.warning("Extraction listener disconnected: %s", e)
+            finally:
+                self.active = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(self.RECONNECT_DELAY_SEC)
+
+
+extraction_listener = ExtractionListener(extraction_events)
@@ -3,16 +3,26 @@ Presigned S3 URLs and key conventions for chat attachments.
 S3 keys: tenants/{tenant_id}/files/{file_id}/raw/{filename}
          tenants/{tenant_id}/files/{file_id}/extracted/full.txt
          tenants/{tenant_id}/files/{file_id}/extracted/pages.json
+Content-addressed extractions shared across tenants (uploads.ExtractionArtifact):
+         shared/extractions/{sha256}/v{extractor_version}/full.txt
+         shared/extractions/{sha256}/v{extractor_version}/pages.json
 """
 
+import codecs
 import hashlib
 import logging
+import os
+import tempfile
+from contextlib import closing
 from typing import Any
 
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Downloads are streamed in chunks of this size, so memory use does not grow with the object size
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
 
 def get_s3_client(*, endpoint_url: str | None = None):
     """Return boto3 S3 client. For LocalStack uses path-style and explicit credentials. For real AWS, uses regional endpoint (required for CORS preflight when bucket is outside us-east-1)."""
@@ -66,6 +76,11 @@ def extracted_pages_json_s3_key(*, tenant_id: int, file_id: str) -> str:
     return f"tenants/{tenant_id}/files/{file_id}/extracted/pages.json"
 
 
+def shared_extraction_s3_key(*, sha256: str, extractor_version: str, name: str) -> str:
+    """S3 key of a shared extraction artifact file (full.txt, pages.json)."""
+    return f"shared/extractions/{sha256}/v{extractor_version}/{name}"
+
+
 def generate_presigned_put_url(
     *,
     bucket: str,
@@ -138,33 +153,76 @@ def upload_bytes_to_s3(*, bucket: str, key: str, body: bytes, content_type: str
     client.put_object(Bucket=bucket, Key=key, Body=body, **extra)
 
 
-def download_text_from_s3(*, bucket: str, key: str) -> str:
-    """Download object from S3 and decode as UTF-8 text."""
+def download_s3_range(*, bucket: str, key: str, start: int, end: int) -> bytes:
+    """Download bytes start..end (inclusive) of an S3 object; shorter when the object ends first."""
     client = get_s3_client()
-    response = client.get_object(Bucket=bucket, Key=key)
-    return response["Body"].read().decode("utf-8", errors="replace")
+    response = client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+    return response["Body"].read()
+
+
+def _error_code(exc) -> str | None:
+    """S3 error code of a botocore ClientError, e.g. "InvalidRange"."""
+    return (getattr(exc, "response", None) or {}).get("Error", {}).get("Code")
+
 
+def is_not_found(exc) -> bool:
+    """True for a missing key; HEAD responses have no body, so their code is the bare status "404"."""
+    return _error_code(exc) in ("404", "NoSuchKey")
 
-def download_s3_to_temp_file(*, bucket: str, key: str, suffix: str = "") -> str:
-    """Download S3 object to a temporary file; return path. Caller must unlink when done."""
-    import tempfile
+
+def download_text_from_s3(*, bucket: str, key: str, max_chars: int | None = None) -> str:
+    """
+    Download object from S3 and decode as UTF-8 text, streamed in chunks.
+    With max_chars only the first max_chars characters are returned, and only the bytes they can span are fetched.
+    """
+    client = get_s3_client()
+    params = {"Bucket": bucket, "Key": key}
+    if max_chars is not None:
+        # A UTF-8 character is at most 4 bytes
+        params["Range"] = f"bytes=0-{max(max_chars, 1) * 4 - 1}"
+    try:
+        response = client.get_object(**params)
+    except Exception as e:
+        # S3 rejects any range of an empty object (416 InvalidRange)
+        if max_chars is not None and _error_code(e) == "InvalidRange":
+            return ""
+        raise
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts = []
+    length = 0
+    # Stopping early leaves the rest of the body unread; closing it releases the pooled connection
+    with closing(response["Body"]) as body:
+        for chunk in body.iter_chunks(chunk_size=DOWNLOAD_CHUNK_BYTES):
+            text = decoder.decode(chunk)
+            parts.append(text)
+            length += len(text)
+            if max_chars is not None and length >= max_chars:
+                break
+    # A ranged read may end inside a character; only complete ones are kept
+    if max_chars is None:
+        parts.append(decoder.decode(b"", final=True))
+    text = "".join(parts)
+    return text[:max_chars] if max_chars is not None else text
+
+
+def download_s3_to_temp_file(*, bucket: str, key: str, suffix: str = "", hasher=None) -> str:
+    """
+    Stream S3 object to a temporary file in DOWNLOAD_CHUNK_BYTES chunks; return path. Caller must unlink when done.
+    A hashlib `hasher` is updated with the bytes on the way.
+    """
     client = get_s3_client()
     response = client.get_object(Bucket=bucket, Key=key)
-    body = response["Body"].read()
     fd, path = tempfile.mkstemp(suffix=suffix)
     try:
-        import os
-        os.write(fd, body)
-        os.close(fd)
+        with os.fdopen(fd, "wb") as f, closing(response["Body"]) as body:
+            for chunk in body.iter_chunks(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                f.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
         return path
     except Exception:
-        import os
-        try:
-            os.close(fd)
-        except Exception:
-            raise
         try:
             os.unlink(path)
-        except Exception:
-            raise
+        except OSError:
+            pass
         raise
@@ -1,33 +1,81 @@
 """
-Background tasks for chat attachments: extract_file, generate_final_answer.
+Background tasks for chat attachments: extract_file, generate_final_answer, and the prune_refined_chunks schedule.
 """
 
-import json
+import hashlib
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from uuid import UUID
 
 from django.db import transaction
+from django.utils import timezone
+from django_q.models import Schedule
 from django_q.tasks import async_task
 
-from src.uploads.extraction_utils import EXTRACTOR_VERSION, get_full_text, get_preview_text
+from src.uploads.extraction_utils import (
+    EXTRACTOR_VERSION,
+    PDF_LINEARIZATION_HEAD_BYTES,
+    PREVIEW_PDF_RANGE_MAX_BYTES,
+    extract_preview_from_pdf_bytes,
+    get_full_text_and_pages,
+    get_preview_text,
+    pdf_first_page_end,
+)
 from src.chats.models import PendingDocIntent
-from src.uploads.models import File, FileExtraction
+from src.uploads.artifacts import apply_artifact, find_artifact, store_artifact, store_summary, upload_extracted_text
+from src.uploads.models import File, FileExtraction, RefinedChunk
+from src.uploads.notifications import notify_extraction_status
 from src.uploads.storage import (
+    download_s3_range,
     download_s3_to_temp_file,
     extracted_full_text_s3_key,
     extracted_pages_json_s3_key,
-    upload_bytes_to_s3,
 )
 from src.prompts.enums import PendingDocIntentStatus
 logger = logging.getLogger(__name__)
 
 
+def _ranged_pdf_preview(*, bucket: str, key: str) -> str:
+    """Preview text of a linearized PDF from ranged reads of its first page; "" when not linearized or on errors."""
+    try:
+        head = download_s3_range(bucket=bucket, key=key, start=0, end=PDF_LINEARIZATION_HEAD_BYTES - 1)
+        first_page_end = pdf_first_page_end(head=head)
+        if not first_page_end or first_page_end > PREVIEW_PDF_RANGE_MAX_BYTES:
+            return ""
+        if first_page_end > len(head):
+            head += download_s3_range(bucket=bucket, key=key, start=len(head), end=first_page_end - 1)
+        return extract_preview_from_pdf_bytes(data=head[:first_page_end])
+    except Exception as e:
+        logger.warning("Ranged PDF preview failed for %s: %s", key, e)
+        return ""
+
+
+def _save_preview(extraction: FileExtraction, preview_text: str) -> None:
+    with transaction.atomic():
+        extraction.refresh_from_db()
+        extraction.preview_text = preview_text[:65535] if preview_text else ""
+        extraction.status = FileExtraction.Status.PREVIEW_READY
+        extraction.preview_ready_at = datetime.utcnow()
+        extraction.save(update_fields=["preview_text", "status", "preview_ready_at"])
+        notify_extraction_status(extraction.file_id, extraction.status)
+
+
+def _enqueue_pending_intents(*, file_id: str) -> None:
+    # Find intents that reference this file (file_ids is a JSON list of UUID strings)
+    pending = PendingDocIntent.objects.filter(
+        status=PendingDocIntentStatus.PENDING,
+        file_ids__contains=[file_id],
+    ).values_list("id", flat=True)
+    for intent_id in pending:
+        async_task(generate_final_answer, intent_id)
+
+
 def extract_file(*, file_id: str) -> None:
     """
     Idempotent extraction: if READY, exit. If EXTRACTING with same version, continue.
     Preview first (PREVIEW_READY), then full extraction (READY). Enqueue generate_final_answer for pending intents.
+    Content extracted before (same sha256 of the raw bytes) goes straight to READY from the shared artifact.
     """
     try:
         file_uuid = UUID(file_id)
@@ -69,68 +117,90 @@ def extract_file(*, file_id: str) -> None:
         extraction.status = FileExtraction.Status.FAILED
         extraction.error_message = "Missing S3 location"
         extraction.save(update_fields=["status", "error_message"])
+        notify_extraction_status(extraction.file_id, extraction.status)
         return
 
     suffix = os.path.splitext(file_record.original_filename)[-1] or ".bin"
     temp_path = None
     try:
-        temp_path = download_s3_to_temp_file(bucket=bucket, key=key_raw, suffix=suffix)
         mime = file_record.mime_type or ""
+        preview_text = ""
+        if mime == "application/pdf" or suffix.lower() == ".pdf":
+            # Linearized PDFs: preview from the first page's bytes, before the full download
+            preview_text = _ranged_pdf_preview(bucket=bucket, key=key_raw)
+            if preview_text:
+                _save_preview(extraction, preview_text)
 
-        preview_text = get_preview_text(file_path=temp_path, mime_type=mime)
-        with transaction.atomic():
-            extraction.refresh_from_db()
-            extraction.preview_text = preview_text[:65535] if preview_text else ""
-            extraction.status = FileExtraction.Status.PREVIEW_READY
-            extraction.preview_ready_at = datetime.utcnow()
-            extraction.save(update_fields=["preview_text", "status", "preview_ready_at"])
-
-        full_text = get_full_text(file_path=temp_path, mime_type=mime)
+        hasher = hashlib.sha256()
+        temp_path = download_s3_to_temp_file(bucket=bucket, key=key_raw, suffix=suffix, hasher=hasher)
+        content_sha256 = hasher.hexdigest()
         tenant_id = file_record.tenant_id
-        full_key = extracted_full_text_s3_key(tenant_id=tenant_id, file_id=str(file_record.id))
-        upload_bytes_to_s3(
-            bucket=bucket,
-            key=full_key,
-            body=full_text.encode("utf-8", errors="replace"),
-            content_type="text/plain; charset=utf-8",
-        )
 
-        pages_data = [{"page": i + 1, "text_preview": full_text[i : i + 200]} for i in range(0, min(len(full_text), 2000), 200)]
-        pages_key = extracted_pages_json_s3_key(tenant_id=tenant_id, file_id=str(file_record.id))
-        upload_bytes_to_s3(
-            bucket=bucket,
-            key=pages_key,
-            body=json.dumps(pages_data, ensure_ascii=False).encode("utf-8"),
-            content_type="application/json",
+        artifact = find_artifact(sha256=content_sha256, bucket=bucket)
+        if artifact:
+            logger.info("extract_file: %s reuses shared extraction %s", file_id, artifact.id)
+            apply_artifact(extraction=extraction, artifact=artifact, tenant_id=tenant_id)
+            _enqueue_pending_intents(file_id=str(file_record.id))
+            return
+
+        if not preview_text:
+            preview_text = get_preview_text(file_path=temp_path, mime_type=mime)
+            _save_preview(extraction, preview_text)
+
+        full_text, pages, complete = get_full_text_and_pages(
+            file_path=temp_path,
+            mime_type=mime,
+            on_progress=lambda done, total: FileExtraction.objects.filter(id=extraction.id).update(
+                refine_chunks_done=done, refine_chunks_total=total,
+            ),
         )
+        artifact = None
+        if complete and full_text.strip():
+            artifact = store_artifact(
+                sha256=content_sha256,
+                bucket=bucket,
+                preview_text=preview_text,
+                full_text=full_text,
+                pages=pages,
+            )
+            full_key, pages_key = artifact.full_text_s3_key, artifact.pages_json_s3_key
+        else:
+            # Empty or degraded (failed OCR batch or refinement chunk): kept to this file, not shared
+            logger.info("extract_file: %s extraction incomplete, not shared", file_id)
+            full_key = extracted_full_text_s3_key(tenant_id=tenant_id, file_id=str(file_record.id))
+            pages_key = upload_extracted_text(
+                bucket=bucket,
+                full_key=full_key,
+                pages_key=extracted_pages_json_s3_key(tenant_id=tenant_id, file_id=str(file_record.id)),
+                full_text=full_text,
+                pages=pages,
+            )
 
         with transaction.atomic():
             extraction.refresh_from_db()
+            extraction.artifact = artifact
             extraction.full_text_s3_key = full_key
             extraction.pages_json_s3_key = pages_key
             extraction.status = FileExtraction.Status.READY
             extraction.ready_at = datetime.utcnow()
-            extraction.save(update_fields=["full_text_s3_key", "pages_json_s3_key", "status", "ready_at"])
+            extraction.save(update_fields=["artifact", "full_text_s3_key", "pages_json_s3_key", "status", "ready_at"])
+            notify_extraction_status(extraction.file_id, extraction.status)
 
         # Generate and cache summary for PDF/DOCX/image so message content uses summary instead of full text
         if full_text and full_text.strip():
             try:
                 from src.uploads.final_answer import _generate_and_cache_summary
-                _generate_and_cache_summary(
+                summary_text = _generate_and_cache_summary(
                     tenant_id=tenant_id,
                     file_id=str(file_record.id),
                     full_text=full_text,
                 )
+                if summary_text and artifact:
+                    store_summary(artifact=artifact, summary_text=summary_text)
             except Exception as summary_exc:
                 logger.warning("Could not cache summary for file %s: %s", file_id, summary_exc)
 
-        # Find intents that reference this file (file_ids is a JSON list of UUID strings)
-        pending = PendingDocIntent.objects.filter(
-            status=PendingDocIntentStatus.PENDING,
-            file_ids__contains=[str(file_record.id)],
-        ).values_list("id", flat=True)
-        for intent_id in pending:
-            async_task(generate_final_answer, intent_id)
+        _enqueue_pending_intents(file_id=str(file_record.id))
 
     except Exception as e:
         logger.exception("extract_file failed for %s: %s", file_id, e)
@@ -139,6 +209,7 @@ def extract_file(*, file_id: str) -> None:
             extraction.status = FileExtraction.Status.FAILED
             extraction.error_message = str(e)[:1024]
             extraction.save(update_fields=["status", "error_message"])
+            notify_extraction_status(extraction.file_id, extraction.status)
     finally:
         if temp_path and os.path.exists(temp_path):
             try:
@@ -154,3 +225,38 @@ def generate_final_answer(*, pending_intent_id: int) -> None:
     """
     from src.uploads.final_answer import run_generate_final_answer
     run_generate_final_answer(pending_intent_id=pending_intent_id)
+
+
+def prune_refined_chunks_task() -> int:
+    """
+    Delete RefinedChunk rows older than REFINED_CHUNK_MAX_AGE_HOURS. A completed extraction removes its own rows;
+    these are left by extractions that failed or were killed and not retried.
+    """
+    from src.settings import REFINED_CHUNK_MAX_AGE_HOURS
+
+    cutoff = timezone.now() - timedelta(hours=REFINED_CHUNK_MAX_AGE_HOURS)
+    deleted, _ = RefinedChunk.objects.filter(created_at__lt=cutoff).delete()
+    if deleted:
+        logger.info("Pruned %s refined chunks created before %s", deleted, cutoff)
+    return deleted
+
+
+def setup_refined_chunk_prune_schedule():
+    try:
+        with transaction.atomic():
+            _, created = Schedule.objects.get_or_create(
+                name="prune_refined_chunks",
+                defaults={
+                    'func': 'src.uploads.tasks.prune_refined_chunks_task',
+                    'schedule_type': 'H',  # hourly
+                    'repeats': -1,  # run forever
+                }
+            )
+
+            if created:
+                logger.info("Scheduled task 'prune_refined_chunks' created successfully")
+    except Exception as e:
+        logger.error(f"Error setting up refined chunk prune schedule: {str(e)}", exc_info=True)
+
+
+setup_refined_chunk_prune_schedule()
@@ -0,0 +1,132 @@
+import json
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.test import SimpleTestCase
+
+from src.uploads import artifacts, tasks
+from src.uploads.extraction_utils import EXTRACTOR_VERSION
+from src.uploads.models import ExtractionArtifact
+
+SHA = 'a' * 64
+
+
+class StoreArtifactTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(artifacts, 'upload_bytes_to_s3')
+        self.upload_bytes_to_s3 = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ExtractionArtifact.objects, 'update_or_create',
+                                    side_effect=lambda **kwargs: (ExtractionArtifact(**kwargs['defaults']), True))
+        self.update_or_create = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_text_goes_to_content_addressed_keys(self):
+        artifact = artifacts.store_artifact(sha256=SHA, bucket='b', preview_text='Preview', full_text='Full text',
+                                            pages=['Page one', 'Page two'])
+
+        prefix = f'shared/extractions/{SHA}/v{EXTRACTOR_VERSION}/'
+        self.assertEqual(artifact.full_text_s3_key, prefix + 'full.txt')
+        self.assertEqual(artifact.pages_json_s3_key, prefix + 'pages.json')
+        self.assertEqual(artifact.full_text_chars, 9)
+        uploads = {c.kwargs['key']: c.kwargs['body'] for c in self.upload_bytes_to_s3.call_args_list}
+        self.assertEqual(uploads[prefix + 'full.txt'], b'Full text')
+        self.assertEqual(json.loads(uploads[prefix + 'pages.json'])[1], {'page': 2, 'chars': 8, 'text': 'Page two'})
+        self.assertEqual(self.update_or_create.call_args.kwargs['sha256'], SHA)
+        self.assertEqual(self.update_or_create.call_args.kwargs['extractor_version'], EXTRACTOR_VERSION)
+
+    def test_no_page_index_without_pages(self):
+        artifact = artifacts.store_artifact(sha256=SHA, bucket='b', preview_text='', full_text='Docx text', pages=[])
+
+        self.assertIsNone(artifact.pages_json_s3_key)
+        self.upload_bytes_to_s3.assert_called_once()
+
+
+class FindArtifactTest(SimpleTestCase):
+    def setUp(self):
+        self.artifact = ExtractionArtifact(id=1, sha256=SHA, s3_bucket='b', full_text_s3_key='shared/full.txt')
+        self.artifact.delete = mock.Mock()
+        patcher = mock.patch.object(ExtractionArtifact.objects, 'filter')
+        self.filter = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.filter.return_value.first.return_value = self.artifact
+
+    def test_matches_content_version_and_bucket(self):
+        with mock.patch.object(artifacts, 'head_object'):
+            self.assertIs(artifacts.find_artifact(sha256=SHA, bucket='b'), self.artifact)
+
+        self.filter.assert_called_once_with(sha256=SHA, extractor_version=EXTRACTOR_VERSION, s3_bucket='b')
+
+    def test_entry_whose_text_is_gone_is_dropped(self):
+        not_found = ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        with mock.patch.object(artifacts, 'head_object', side_effect=not_found):
+            self.assertIsNone(artifacts.find_artifact(sha256=SHA, bucket='b'))
+
+        self.artifact.delete.assert_called_once()
+
+    def test_transient_s3_errors_keep_the_entry(self):
+        for code in ('SlowDown', 'InternalError', 'ExpiredToken'):
+            with self.subTest(code=code):
+                error = ClientError({'Error': {'Code': code}}, 'HeadObject')
+                with mock.patch.object(artifacts, 'head_object', side_effect=error):
+                    self.assertIsNone(artifacts.find_artifact(sha256=SHA, bucket='b'))
+
+        self.artifact.delete.assert_not_called()
+
+
+class ExtractFileSharingTest(SimpleTestCase):
+    def setUp(self):
+        self.file = mock.Mock(id='6f1c2a9e-3b4d-4e5f-8a7b-9c0d1e2f3a4b', tenant_id=7, s3_bucket='b', s3_key_raw='raw',
+                              original_filename='contract.docx', mime_type='')
+        self.extraction = mock.Mock(status='EXTRACTING', extractor_version=EXTRACTOR_VERSION)
+        patches = {
+            'transaction': mock.DEFAULT,
+            'File': mock.DEFAULT,
+            'FileExtraction': mock.DEFAULT,
+            'download_s3_to_temp_file': mock.DEFAULT,
+            'find_artifact': mock.DEFAULT,
+            'get_preview_text': mock.DEFAULT,
+            '_save_preview': mock.DEFAULT,
+            'get_full_text_and_pages': mock.DEFAULT,
+            'store_artifact': mock.DEFAULT,
+            'upload_extracted_text': mock.DEFAULT,
+            'notify_extraction_status': mock.DEFAULT,
+            '_enqueue_pending_intents': mock.DEFAULT,
+        }
+        patcher = mock.patch.multiple(tasks, **patches)
+        self.mocks = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mocks['File'].objects.select_for_update.return_value.filter.return_value.first.return_value = self.file
+        self.mocks['FileExtraction'].objects.get_or_create.return_value = (self.extraction, False)
+        self.mocks['FileExtraction'].Status.READY = 'READY'
+        self.mocks['download_s3_to_temp_file'].return_value = '/nonexistent/contract.docx'
+        self.mocks['find_artifact'].return_value = None
+        self.mocks['get_preview_text'].return_value = 'Preview'
+        self.mocks['upload_extracted_text'].return_value = None
+
+    def run_extract(self, full_text, complete):
+        self.mocks['get_full_text_and_pages'].return_value = (full_text, [], complete)
+        with mock.patch('src.uploads.final_answer._generate_and_cache_summary', return_value=''):
+            tasks.extract_file(file_id=str(self.file.id))
+
+    def test_complete_extraction_is_shared(self):
+        self.run_extract('Full text', complete=True)
+
+        self.mocks['store_artifact'].assert_called_once()
+        self.mocks['upload_extracted_text'].assert_not_called()
+        self.assertIs(self.extraction.artifact, self.mocks['store_artifact'].return_value)
+
+    def test_degraded_or_empty_extraction_stays_with_the_file(self):
+        for full_text, complete in (('Partly refined text', False), ('  ', True)):
+            with self.subTest(full_text=full_text):
+                self.mocks['upload_extracted_text'].reset_mock()
+                self.extraction.status = 'EXTRACTING'
+                self.run_extract(full_text, complete)
+
+                self.mocks['store_artifact'].assert_not_called()
+                self.assertEqual(
+                    self.mocks['upload_extracted_text'].call_args.kwargs['full_key'],
+                    f'tenants/7/files/{self.file.id}/extracted/full.txt',
+                )
+                self.assertIsNone(self.extraction.artifact)
+                self.assertEqual(self.extraction.status, 'READY')
@@ -0,0 +1,125 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from src.uploads import llm_concurrency
+from src.uploads.llm_concurrency import RateLimitGate, call_with_backoff, ordered_map, retry_delay_sec
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__('rate limited')
+        self.response = mock.Mock(headers={'retry-after': retry_after} if retry_after else {})
+
+
+class OrderedMapTest(SimpleTestCase):
+    def test_results_keep_item_order(self):
+        def slow_for_small(n):
+            time.sleep(0.02 * (5 - n))
+            return n * 10
+
+        self.assertEqual(ordered_map(slow_for_small, range(5), concurrency=3, max_retries=0), [0, 10, 20, 30, 40])
+
+    def test_calls_run_concurrently_up_to_the_limit(self):
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def call(n):
+            with lock:
+                active.append(n)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(n)
+            return n
+
+        ordered_map(call, range(8), concurrency=3, max_retries=0)
+
+        self.assertEqual(max(peak), 3)
+
+    def test_items_are_pulled_only_when_a_slot_frees(self):
+        pulled = []
+
+        def items():
+            for n in range(6):
+                pulled.append(n)
+                yield n
+
+        def call(n):
+            time.sleep(0.01)
+            return len(pulled) - n
+
+        # Each call sees at most `concurrency` items prepared ahead of and including its own
+        self.assertLessEqual(max(ordered_map(call, items(), concurrency=2, max_retries=0)), 2)
+
+    def test_slow_item_does_not_hold_back_the_other_slots(self):
+        started = []
+        first_done = threading.Event()
+
+        def call(n):
+            started.append((n, first_done.is_set()))
+            if n == 0:
+                time.sleep(0.2)
+                first_done.set()
+            else:
+                time.sleep(0.01)
+            return n
+
+        seen = []
+        results = ordered_map(call, range(6), concurrency=2, max_retries=0, on_result=lambda i, r: seen.append(i))
+
+        self.assertEqual(results, list(range(6)))
+        self.assertEqual(seen, list(range(6)))
+        self.assertFalse(any(after_first for n, after_first in started))
+
+    def test_failed_items_are_none_and_reported_in_order(self):
+        def call(n):
+            if n == 1:
+                raise ValueError('bad page')
+            return n
+
+        seen = []
+        results = ordered_map(call, range(3), concurrency=2, max_retries=0, on_result=lambda i, r: seen.append((i, r)))
+
+        self.assertEqual(results, [0, None, 2])
+        self.assertEqual(seen, [(0, 0), (1, None), (2, 2)])
+
+
+class BackoffTest(SimpleTestCase):
+    def test_rate_limited_call_is_retried_after_the_gate(self):
+        gate = RateLimitGate()
+        calls = []
+
+        def call(item):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise RateLimited(retry_after='0.05')
+            return item
+
+        self.assertEqual(call_with_backoff(call, 'x', gate=gate, max_retries=2), 'x')
+        self.assertGreaterEqual(calls[1] - calls[0], 0.04)
+
+    def test_gives_up_after_max_retries(self):
+        call = mock.Mock(side_effect=RateLimited(retry_after='0'))
+
+        with self.assertRaises(RateLimited):
+            call_with_backoff(call, 'x', gate=RateLimitGate(), max_retries=2)
+        self.assertEqual(call.call_count, 3)
+
+    def test_other_errors_are_not_retried(self):
+        call = mock.Mock(side_effect=ValueError('bad'))
+
+        with self.assertRaises(ValueError):
+            call_with_backoff(call, 'x', gate=RateLimitGate(), max_retries=3)
+        call.assert_called_once()
+
+    def test_delay_without_retry_after_backs_off_exponentially(self):
+        with mock.patch.object(llm_concurrency.random, 'uniform', return_value=1.0):
+            self.assertEqual(retry_delay_sec(RateLimited(), 0), 1.0)
+            self.assertEqual(retry_delay_sec(RateLimited(), 3), 8.0)
+            self.assertEqual(retry_delay_sec(RateLimited(), 10), llm_concurrency.BACKOFF_MAX_SEC)
@@ -0,0 +1,91 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from src.chats import attachment_flow
+from src.uploads import notifications
+from src.uploads.notifications import ExtractionEvents
+
+
+class ExtractionEventsTest(SimpleTestCase):
+    def test_wait_times_out_without_change(self):
+        events = ExtractionEvents()
+        since = events.snapshot(['a'])
+
+        self.assertFalse(events.wait(since, 0.01))
+
+    def test_change_after_snapshot_wakes_waiter(self):
+        events = ExtractionEvents()
+        since = events.snapshot(['a', 'b'])
+        threading.Timer(0.05, events.publish, args=['b']).start()
+
+        started = time.monotonic()
+        self.assertTrue(events.wait(since, 5))
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_change_before_wait_is_not_missed(self):
+        events = ExtractionEvents()
+        since = events.snapshot(['a'])
+        events.publish('a')
+
+        self.assertTrue(events.wait(since, 0))
+
+    def test_other_files_do_not_wake_waiter(self):
+        events = ExtractionEvents()
+        since = events.snapshot(['a'])
+        events.publish('b')
+
+        self.assertFalse(events.wait(since, 0.01))
+
+    def test_notify_publishes_outside_transaction(self):
+        events = ExtractionEvents()
+        since = events.snapshot(['a'])
+
+        with mock.patch.object(notifications, 'extraction_events', events):
+            notifications.notify_extraction_status('a', 'READY')
+
+        self.assertTrue(events.wait(since, 0))
+
+
+class WaitForExtractionStatusesTest(SimpleTestCase):
+    def setUp(self):
+        self.events = ExtractionEvents()
+        for target, value in (
+            ('extraction_events', self.events),
+            ('SOFT_WAIT_TIMEOUT_SEC', 5),
+            ('SOFT_WAIT_POLL_INTERVAL_SEC', 5),
+        ):
+            patcher = mock.patch.object(attachment_flow, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(attachment_flow.extraction_listener, 'ensure_started', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_returns_without_waiting_when_done(self):
+        with mock.patch.object(attachment_flow, '_extraction_statuses', return_value=('READY', {'a': 'READY'})) as read:
+            self.assertEqual(attachment_flow._wait_for_extraction_statuses(file_ids=['a'], user_id=1)[0], 'READY')
+        read.assert_called_once()
+
+    def test_status_change_wakes_the_wait(self):
+        results = iter([('PROCESSING', {'a': 'EXTRACTING'}), ('PREVIEW_READY', {'a': 'PREVIEW_READY'})])
+        threading.Timer(0.05, self.events.publish, args=['a']).start()
+
+        started = time.monotonic()
+        with mock.patch.object(attachment_flow, '_extraction_statuses', side_effect=lambda **kwargs: next(results)):
+            overall, statuses = attachment_flow._wait_for_extraction_statuses(file_ids=['a'], user_id=1)
+
+        self.assertEqual(overall, 'PREVIEW_READY')
+        self.assertEqual(statuses, {'a': 'PREVIEW_READY'})
+        # Woken by the notification, not the 5 s poll interval
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_gives_up_at_timeout(self):
+        with mock.patch.object(attachment_flow, 'SOFT_WAIT_TIMEOUT_SEC', 0.05), \
+                mock.patch.object(attachment_flow, '_extraction_statuses',
+                                  return_value=('PROCESSING', {'a': 'EXTRACTING'})):
+            overall, _ = attachment_flow._wait_for_extraction_statuses(file_ids=['a'], user_id=1)
+
+        self.assertEqual(overall, 'PROCESSING')
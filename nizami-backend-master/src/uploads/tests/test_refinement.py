@@ -0,0 +1,73 @@
+import hashlib
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from langchain_core.messages import AIMessage
+
+from src.uploads import extraction_utils
+from src.uploads.models import RefinedChunk
+
+
+def _sha(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+@override_settings(OPENAI_API_KEY='test', USE_OPENAI_FOR_EXTRACTION=True)
+class RefinementTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(extraction_utils, '_OPENAI_EXTRACT_CHUNK_CHARS', 5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(RefinedChunk, 'objects')
+        self.objects = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.objects.filter.return_value.values_list.return_value = []
+        patcher = mock.patch('src.chats.utils.create_llm')
+        self.llm = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.llm.invoke.side_effect = lambda messages: AIMessage(content=messages[1].content.upper())
+
+    def test_chunks_are_refined_in_order(self):
+        self.assertEqual(extraction_utils._extract_text_via_openai(raw_text='aaaaabbbbbccccc'), ('AAAAA BBBBB CCCCC', True))
+
+    def test_resumes_with_saved_chunks(self):
+        self.objects.filter.return_value.values_list.return_value = [(_sha('bbbbb'), 'saved b')]
+        progress = []
+
+        text, complete = extraction_utils._extract_text_via_openai(
+            raw_text='aaaaabbbbbccccc', on_progress=lambda done, total: progress.append((done, total)),
+        )
+
+        self.assertEqual(text, 'AAAAA saved b CCCCC')
+        self.assertTrue(complete)
+        self.assertEqual([c.args[0][1].content for c in self.llm.invoke.call_args_list], ['aaaaa', 'ccccc'])
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+        saved = {c.kwargs['chunk_sha256']: c.kwargs['defaults']['text'] for c in self.objects.get_or_create.call_args_list}
+        self.assertEqual(saved, {_sha('aaaaa'): 'AAAAA', _sha('ccccc'): 'CCCCC'})
+        # Saved chunks are dropped once the whole text is refined
+        self.objects.filter.return_value.delete.assert_called_once()
+
+    def test_failed_chunk_keeps_raw_text_is_not_saved_and_reports_incomplete(self):
+        def invoke(messages):
+            if messages[1].content == 'bbbbb':
+                raise ValueError('bad chunk')
+            return AIMessage(content=messages[1].content.upper())
+
+        self.llm.invoke.side_effect = invoke
+
+        self.assertEqual(extraction_utils._extract_text_via_openai(raw_text='aaaaabbbbb'), ('AAAAA bbbbb', False))
+        self.assertEqual(self.objects.get_or_create.call_count, 1)
+
+
+class PruneRefinedChunksTest(SimpleTestCase):
+    def test_deletes_chunks_older_than_the_max_age(self):
+        from django.utils import timezone
+        from src.uploads.tasks import prune_refined_chunks_task
+
+        with mock.patch('src.settings.REFINED_CHUNK_MAX_AGE_HOURS', 24), \
+                mock.patch.object(RefinedChunk.objects, 'filter') as filter_:
+            filter_.return_value.delete.return_value = (2, {'uploads.RefinedChunk': 2})
+            self.assertEqual(2, prune_refined_chunks_task())
+
+        cutoff = filter_.call_args.kwargs['created_at__lt']
+        self.assertAlmostEqual(24 * 3600, (timezone.now() - cutoff).total_seconds(), delta=60)
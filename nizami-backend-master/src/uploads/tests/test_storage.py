@@ -0,0 +1,143 @@
+import os
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.test import SimpleTestCase
+
+from src.uploads import storage, tasks
+from src.uploads.extraction_utils import extract_preview_from_pdf_bytes, pdf_first_page_end
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+        self.chunk_sizes = []
+        self.closed = False
+
+    def iter_chunks(self, chunk_size):
+        self.chunk_sizes.append(chunk_size)
+        for i in range(0, len(self.data), 3):
+            yield self.data[i:i + 3]
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        self.closed = True
+
+
+class FakeS3:
+    def __init__(self, data):
+        self.data = data
+        self.requests = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.requests.append(Range)
+        data = self.data
+        if Range:
+            if not data:
+                raise ClientError({'Error': {'Code': 'InvalidRange'}}, 'GetObject')
+            start, end = Range.removeprefix('bytes=').split('-')
+            data = data[int(start):int(end) + 1]
+        self.body = FakeBody(data)
+        return {'Body': self.body}
+
+
+class StreamingDownloadTest(SimpleTestCase):
+    def patch_client(self, data):
+        client = FakeS3(data)
+        patcher = mock.patch.object(storage, 'get_s3_client', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return client
+
+    def test_download_to_temp_file_streams_chunks(self):
+        self.patch_client(b'%PDF-1.7 body bytes')
+
+        path = storage.download_s3_to_temp_file(bucket='b', key='k', suffix='.pdf')
+        self.addCleanup(os.unlink, path)
+
+        self.assertTrue(path.endswith('.pdf'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.7 body bytes')
+
+    def test_download_to_temp_file_hashes_the_bytes(self):
+        import hashlib
+
+        self.patch_client(b'raw upload bytes')
+        hasher = hashlib.sha256()
+
+        path = storage.download_s3_to_temp_file(bucket='b', key='k', hasher=hasher)
+        self.addCleanup(os.unlink, path)
+
+        self.assertEqual(hasher.hexdigest(), hashlib.sha256(b'raw upload bytes').hexdigest())
+
+    def test_download_text_decodes_characters_split_across_chunks(self):
+        text = 'نص عربي كامل'
+        self.patch_client(text.encode('utf-8'))
+
+        self.assertEqual(storage.download_text_from_s3(bucket='b', key='k'), text)
+
+    def test_download_text_with_max_chars_reads_a_range(self):
+        text = 'نص عربي كامل'
+        client = self.patch_client(text.encode('utf-8'))
+
+        self.assertEqual(storage.download_text_from_s3(bucket='b', key='k', max_chars=4), text[:4])
+        self.assertEqual(client.requests, ['bytes=0-15'])
+
+    def test_download_text_closes_a_body_it_stops_reading(self):
+        client = self.patch_client(b'a long object read only in part')
+
+        self.assertEqual(storage.download_text_from_s3(bucket='b', key='k', max_chars=2), 'a ')
+        self.assertTrue(client.body.closed)
+
+    def test_download_text_of_empty_object(self):
+        self.patch_client(b'')
+
+        self.assertEqual(storage.download_text_from_s3(bucket='b', key='k', max_chars=100), '')
+        self.assertEqual(storage.download_text_from_s3(bucket='b', key='k'), '')
+
+    def test_download_text_with_max_chars_returns_short_objects_whole(self):
+        self.patch_client(b'short')
+
+        self.assertEqual(storage.download_text_from_s3(bucket='b', key='k', max_chars=100), 'short')
+
+
+def _pdf(pages, linear):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f'Page {i + 1} text')
+    return doc.tobytes(linear=linear)
+
+
+class RangedPdfPreviewTest(SimpleTestCase):
+    def test_first_page_end_of_linearized_pdf(self):
+        data = _pdf(20, linear=True)
+
+        end = pdf_first_page_end(head=data[:1024])
+
+        self.assertIsNotNone(end)
+        self.assertIn('Page 1 text', extract_preview_from_pdf_bytes(data=data[:end]))
+
+    def test_regular_pdf_is_not_linearized(self):
+        self.assertIsNone(pdf_first_page_end(head=_pdf(2, linear=False)[:1024]))
+
+    def test_ranged_preview_fetches_only_the_first_page(self):
+        data = _pdf(20, linear=True)
+        client = FakeS3(data)
+
+        with mock.patch.object(storage, 'get_s3_client', return_value=client):
+            preview = tasks._ranged_pdf_preview(bucket='b', key='k')
+
+        self.assertIn('Page 1 text', preview)
+        ranges = [r.removeprefix('bytes=').split('-') for r in client.requests]
+        self.assertLess(sum(int(end) - int(start) + 1 for start, end in ranges), len(data))
+
+    def test_ranged_preview_skips_regular_pdfs(self):
+        client = FakeS3(_pdf(2, linear=False))
+
+        with mock.patch.object(storage, 'get_s3_client', return_value=client):
+            self.assertEqual(tasks._ranged_pdf_preview(bucket='b', key='k'), '')
+        self.assertEqual(len(client.requests), 1)
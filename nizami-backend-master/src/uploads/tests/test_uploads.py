@@ -8,7 +8,7 @@ from unittest.mock import patch
 from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 
-from src.chats.attachment_flow import _infer_intent,_poll_extraction_statuses
+from src.chats.attachment_flow import _infer_intent, _wait_for_extraction_statuses
 from src.chats.models import Chat, Message, PendingDocIntent
 from src.uploads.models import File, FileExtraction, FileSummary
 from src.users.models import User
@@ -75,7 +75,7 @@ class InferIntentTest(TestCase):
 
 
 class SoftWaitBranchingTest(TestCase):
-    """Soft-wait: _poll_extraction_statuses returns READY / PREVIEW_READY / PROCESSING."""
+    """Soft-wait: _wait_for_extraction_statuses returns READY / PREVIEW_READY / PROCESSING."""
 
     def setUp(self):
         self.user = User.objects.create_user(email="u@t.com", password="pw")
@@ -105,7 +105,7 @@ class SoftWaitBranchingTest(TestCase):
             file=self.file2,
             status=FileExtraction.Status.READY,
         )
-        status, _ = _poll_extraction_statuses(
+        status, _ = _wait_for_extraction_statuses(
             file_ids=[str(self.file1.id), str(self.file2.id)],
             user_id=self.user.id,
         )
@@ -116,7 +116,7 @@ class SoftWaitBranchingTest(TestCase):
             file=self.file1,
             status=FileExtraction.Status.PREVIEW_READY,
         )
-        status, _ = _poll_extraction_statuses(
+        status, _ = _wait_for_extraction_statuses(
             file_ids=[str(self.file1.id), str(self.file2.id)],
             user_id=self.user.id,
         )
@@ -127,7 +127,7 @@ class SoftWaitBranchingTest(TestCase):
             file=self.file1,
             status=FileExtraction.Status.EXTRACTING,
         )
-        status, _ = _poll_extraction_statuses(
+        status, _ = _wait_for_extraction_statuses(
             file_ids=[str(self.file1.id), str(self.file2.id)],
             user_id=self.user.id,
         )
@@ -19,9 +19,11 @@ from django.contrib import admin
 from django.urls import path, include
 
 from src import settings
+from src.common.instrumentation import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view),
 
     path('api/v1/auth/', include('src.authentication.urls')),
     path('api/v1/admin/users/', include('src.users.urls')),
@@ -18,3 +18,8 @@ load_env()
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.settings')
 
 application = get_wsgi_application()
+
+# Compile the chat graph once per worker process instead of on the first message
+from src.chats.flow import chat_graph  # noqa: E402
+
+chat_graph.get()